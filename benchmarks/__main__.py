@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Benchmarks de backup y restauración contra un servidor PostgreSQL desechable:
+#
+#   python -m benchmarks run --provider docker --size 100 -o resultados.json
+#   python -m benchmarks compare anterior.json resultados.json
+
+import argparse
+import json
+import sys
+import tempfile
+from datetime import datetime
+
+from benchmarks.cluster import PROVIDERS
+from benchmarks.datasets import SHAPES
+from benchmarks.runner import BenchmarkRunner, run_case, compare_reports
+from config.settings import (
+    BACKUP_FORMATS, COMPRESSION_METHODS, BENCHMARK_SIZE_MB, BENCHMARK_SHAPES, BENCHMARK_PORT
+)
+
+def build_parser():
+    """Construye el analizador de argumentos de los benchmarks"""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmarks reproducibles de backup y restauración"
+    )
+    subparsers = parser.add_subparsers(dest="command", metavar="COMANDO")
+    subparsers.required = True
+
+    run = subparsers.add_parser("run", help="medir todos los modos de backup y restauración")
+    run.add_argument("--provider", choices=list(PROVIDERS), default="docker",
+                     help="cómo crear el servidor de pruebas (por defecto: %(default)s)")
+    run.add_argument("--port", type=int, default=BENCHMARK_PORT,
+                     help="puerto del servidor de pruebas (por defecto: %(default)s)")
+    run.add_argument("--size", type=int, default=BENCHMARK_SIZE_MB,
+                     help="tamaño aproximado de cada conjunto de datos en MB (por defecto: %(default)s)")
+    run.add_argument("--shapes", nargs="+", choices=list(SHAPES), default=BENCHMARK_SHAPES,
+                     help="conjuntos de datos (por defecto: todos)")
+    run.add_argument("--formats", nargs="+", choices=list(BACKUP_FORMATS), help="formatos de backup")
+    run.add_argument("--compressions", nargs="+", choices=COMPRESSION_METHODS, help="compresiones")
+    run.add_argument("--methods", nargs="+", choices=["local", "docker"],
+                     help="cómo ejecutar pg_dump (por defecto, el que usaría la aplicación)")
+    run.add_argument("--restore-modes", nargs="+", choices=["url", "container"],
+                     help="modos de restauración (por defecto: url y, con Docker, container)")
+    run.add_argument("--no-repository", action="store_true", help="no medir el repositorio deduplicado")
+    run.add_argument("--repeat", type=int, default=1, help="repeticiones de cada caso (por defecto: %(default)s)")
+    run.add_argument("--work-dir", help="directorio de trabajo (por defecto, uno temporal)")
+    run.add_argument("-o", "--output", help="archivo JSON de resultados (por defecto, benchmark_<fecha>.json)")
+
+    compare = subparsers.add_parser("compare", help="comparar dos archivos de resultados")
+    compare.add_argument("old", help="resultados anteriores")
+    compare.add_argument("new", help="resultados nuevos")
+    return parser
+
+def command_run(args):
+    """Arranca el servidor, ejecuta el benchmark y guarda los resultados"""
+    cluster = PROVIDERS[args.provider](port=args.port)
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="pg_backup_tool_bench_")
+    output = args.output or f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json"
+
+    try:
+        if not cluster.start():
+            print("✗ El servidor de pruebas no aceptó conexiones", file=sys.stderr)
+            return False
+
+        runner = BenchmarkRunner(cluster, work_dir)
+        restore_modes = args.restore_modes or (["url", "container"] if args.provider == "docker" else ["url"])
+        cases = runner.backup_cases(args.formats, args.compressions, args.methods, not args.no_repository)
+        report = runner.run(args.shapes, args.size, cases, restore_modes, max(1, args.repeat))
+    finally:
+        cluster.stop()
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    failed = sum(1 for result in report["results"] if not result["success"])
+    print(f"\n{len(report['results']) - failed} de {len(report['results'])} casos correctos; "
+          f"resultados en {output} (registros en {work_dir})")
+    return failed == 0
+
+def command_compare(args):
+    """Muestra la variación de la duración de cada caso entre dos ejecuciones"""
+    with open(args.old, 'r', encoding='utf-8') as f:
+        old = json.load(f)
+    with open(args.new, 'r', encoding='utf-8') as f:
+        new = json.load(f)
+
+    for dataset, operation, mode, before, after, change in compare_reports(old, new):
+        before_text = f"{before:8.2f} s" if before is not None else "       -  "
+        after_text = f"{after:8.2f} s" if after is not None else "       -  "
+        change_text = f"{change:+6.1f}%" if change is not None else ""
+        print(f"{dataset:<12} {operation:<8} {mode:<40} {before_text} {after_text} {change_text}")
+    return True
+
+def command_case(case_file):
+    """Ejecuta un caso en este proceso (lo invoca BenchmarkRunner) y guarda su resultado"""
+    with open(case_file, 'r', encoding='utf-8') as f:
+        case = json.load(f)
+    result = run_case(case)
+    with open(case["result_path"], 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+    return result["success"]
+
+def main(argv=None):
+    """Ejecuta los benchmarks; devuelve el código de salida"""
+    argv = sys.argv[1:] if argv is None else argv
+    # Subcomando interno (python -m benchmarks case <archivo>): no pasa por
+    # argparse para que no aparezca en la ayuda
+    if len(argv) == 2 and argv[0] == "case":
+        return 0 if command_case(argv[1]) else 1
+    args = build_parser().parse_args(argv)
+    commands = {"run": command_run, "compare": command_compare}
+    return 0 if commands[args.command](args) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import abc
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from core.pg_client import build_client_command, build_container_command
+from config.settings import (
+    POSTGRES_DOCKER_IMAGE, BENCHMARK_PORT, BENCHMARK_PASSWORD, BENCHMARK_STARTUP_TIMEOUT
+)
+
+# Usuario administrador del servidor de pruebas
+SUPERUSER = "postgres"
+
+class BenchmarkCluster(abc.ABC):
+    """
+    Servidor PostgreSQL desechable para los benchmarks
+
+    Las subclases lo arrancan en un contenedor Docker o con initdb
+    implementando start(), stop() y _psql_command(). Las consultas de
+    preparación se ejecutan directamente contra el servidor; los backups y
+    restauraciones que se miden usan la URL de url().
+    """
+
+    provider = None
+
+    def __init__(self, port=BENCHMARK_PORT, logger_callback=None):
+        self.port = port
+        self.host = "localhost"
+        self.logger = logger_callback if logger_callback else print
+
+    def log(self, message):
+        """Registra un mensaje usando el callback configurado"""
+        if self.logger:
+            self.logger(message)
+
+    def conn_info(self, database):
+        """Componentes de conexión a una base de datos del servidor"""
+        return {
+            "username": SUPERUSER,
+            "password": BENCHMARK_PASSWORD,
+            "host": self.host,
+            "port": str(self.port),
+            "database": database
+        }
+
+    def url(self, database):
+        """URL de conexión a una base de datos del servidor"""
+        return f"postgresql://{SUPERUSER}:{BENCHMARK_PASSWORD}@{self.host}:{self.port}/{database}"
+
+    def execute(self, sql, database="postgres"):
+        """
+        Ejecuta una sentencia y devuelve sus filas
+
+        Returns:
+            list: Filas como listas de columnas (texto)
+
+        Raises:
+            RuntimeError: Si la sentencia falla
+        """
+        command, env = self._psql_command(
+            ["-X", "-A", "-t", "-F", "\t", "-v", "ON_ERROR_STOP=1", "-c", sql], database
+        )
+        process = subprocess.run(command, env=env, capture_output=True, text=True, encoding='utf-8')
+        if process.returncode != 0:
+            raise RuntimeError(process.stderr.strip() or f"psql terminó con código {process.returncode}")
+        return [line.split("\t") for line in process.stdout.splitlines() if line]
+
+    def recreate_database(self, database):
+        """Elimina (si existe) y crea una base de datos vacía"""
+        # CREATE DATABASE no admite ejecutarse en la misma transacción que otra sentencia
+        self.execute(f'DROP DATABASE IF EXISTS "{database}"')
+        self.execute(f'CREATE DATABASE "{database}"')
+
+    def database_size(self, database):
+        """Tamaño en bytes de una base de datos"""
+        return int(self.execute(f"SELECT pg_database_size('{database}')")[0][0])
+
+    def server_version(self):
+        """Versión del servidor"""
+        return self.execute("SHOW server_version")[0][0]
+
+    def wait_ready(self):
+        """Espera a que el servidor acepte conexiones; devuelve False si no lo hace a tiempo"""
+        deadline = time.monotonic() + BENCHMARK_STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            try:
+                self.execute("SELECT 1")
+                return True
+            except (RuntimeError, OSError):
+                time.sleep(1)
+        return False
+
+    @abc.abstractmethod
+    def start(self):
+        """Arranca el servidor; devuelve True si acepta conexiones"""
+
+    @abc.abstractmethod
+    def stop(self):
+        """Detiene el servidor y elimina sus datos"""
+
+    @abc.abstractmethod
+    def _psql_command(self, args, database):
+        """Comando de psql contra el servidor"""
+
+class DockerCluster(BenchmarkCluster):
+    """Servidor en un contenedor Docker (imagen POSTGRES_DOCKER_IMAGE)"""
+
+    provider = "docker"
+
+    def __init__(self, port=BENCHMARK_PORT, image=POSTGRES_DOCKER_IMAGE, logger_callback=None):
+        super().__init__(port, logger_callback)
+        self.image = image
+        self.container_name = f"pg_backup_tool_bench_{os.getpid()}"
+
+    def start(self):
+        self.log(f"→ Arrancando {self.image} en el contenedor {self.container_name}...")
+        process = subprocess.run(
+            ["docker", "run", "-d", "--rm", "--name", self.container_name,
+             "-e", f"POSTGRES_PASSWORD={BENCHMARK_PASSWORD}",
+             "-p", f"{self.port}:5432", self.image],
+            capture_output=True, text=True
+        )
+        if process.returncode != 0:
+            self.log(f"✗ No se pudo arrancar el contenedor: {process.stderr.strip()}")
+            return False
+
+        # En Linux, la IP del contenedor es accesible desde el equipo y desde los
+        # contenedores auxiliares de las herramientas (docker run)
+        if sys.platform.startswith("linux"):
+            inspect = subprocess.run(
+                ["docker", "inspect", "-f", "{{range .NetworkSettings.Networks}}{{.IPAddress}}{{end}}",
+                 self.container_name],
+                capture_output=True, text=True
+            )
+            if inspect.returncode == 0 and inspect.stdout.strip():
+                self.host = inspect.stdout.strip()
+                self.port = 5432
+        return self.wait_ready()
+
+    def stop(self):
+        subprocess.run(["docker", "rm", "-f", self.container_name], capture_output=True)
+
+    def _psql_command(self, args, database):
+        return build_container_command(self.container_name, database, SUPERUSER, "psql", args), None
+
+class InitdbCluster(BenchmarkCluster):
+    """Servidor local creado con initdb en un directorio temporal"""
+
+    provider = "initdb"
+
+    def __init__(self, port=BENCHMARK_PORT, logger_callback=None):
+        super().__init__(port, logger_callback)
+        self.data_dir = None
+
+    def start(self):
+        if not shutil.which("initdb") or not shutil.which("pg_ctl"):
+            self.log("✗ initdb y pg_ctl deben estar en el PATH (p. ej. /usr/lib/postgresql/16/bin)")
+            return False
+
+        self.data_dir = tempfile.mkdtemp(prefix="pg_backup_tool_bench_")
+        password_file = os.path.join(self.data_dir, "password")
+        cluster_dir = os.path.join(self.data_dir, "data")
+        with open(password_file, 'w', encoding='utf-8') as f:
+            f.write(BENCHMARK_PASSWORD)
+
+        self.log(f"→ Creando un servidor con initdb en {cluster_dir}...")
+        steps = [
+            ["initdb", "-D", cluster_dir, "-U", SUPERUSER, "--auth=scram-sha-256",
+             f"--pwfile={password_file}", "-E", "UTF8"],
+            ["pg_ctl", "-D", cluster_dir, "-l", os.path.join(self.data_dir, "server.log"), "-w",
+             "-o", f"-p {self.port} -k {self.data_dir} -c listen_addresses=localhost", "start"]
+        ]
+        for command in steps:
+            process = subprocess.run(command, capture_output=True, text=True)
+            if process.returncode != 0:
+                self.log(f"✗ Error en {command[0]}: {process.stderr.strip()}")
+                return False
+        return self.wait_ready()
+
+    def stop(self):
+        if not self.data_dir:
+            return
+        subprocess.run(
+            ["pg_ctl", "-D", os.path.join(self.data_dir, "data"), "-m", "immediate", "stop"],
+            capture_output=True
+        )
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+        self.data_dir = None
+
+    def _psql_command(self, args, database):
+        return build_client_command(self.conn_info(database), "psql", args)
+
+# Servidores disponibles por nombre
+PROVIDERS = {
+    "docker": DockerCluster,
+    "initdb": InitdbCluster
+}
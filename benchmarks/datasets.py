@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Conjuntos de datos sintéticos. Los datos se generan en el servidor con
+# generate_series, de modo que cargarlos no depende de la red ni del cliente.
+# El tamaño es aproximado: la relación entre filas y bytes de cada forma se
+# ha calculado para PostgreSQL 16 sin TOAST comprimido.
+
+MB = 1024 * 1024
+
+# Columnas de la tabla ancha: enteros y textos de 32 caracteres
+WIDE_INT_COLUMNS = 20
+WIDE_TEXT_COLUMNS = 20
+
+def wide_sql(size_mb):
+    """Una tabla de 41 columnas con muchas filas cortas"""
+    rows = max(1000, size_mb * MB // 900)
+    columns = ["id bigint PRIMARY KEY"]
+    values = ["g"]
+    for i in range(1, WIDE_INT_COLUMNS + 1):
+        columns.append(f"n{i} integer")
+        values.append(f"(g * {i}) % 100000")
+    for i in range(1, WIDE_TEXT_COLUMNS + 1):
+        columns.append(f"t{i} text")
+        values.append(f"md5(g::text || '{i}')")
+    return [
+        f"CREATE TABLE wide ({', '.join(columns)})",
+        f"INSERT INTO wide SELECT {', '.join(values)} FROM generate_series(1, {rows}) g"
+    ]
+
+def many_small_sql(size_mb):
+    """Muchas tablas pequeñas: mide el coste por objeto del catálogo"""
+    tables = max(10, size_mb * 20)
+    return [
+        "DO $$ BEGIN "
+        f"FOR i IN 1..{tables} LOOP "
+        "EXECUTE format('CREATE TABLE small_%s (id integer PRIMARY KEY, name text, value numeric)', i); "
+        "EXECUTE format('INSERT INTO small_%s SELECT g, md5(g::text), g * 1.5 "
+        "FROM generate_series(1, 100) g', i); "
+        "END LOOP; END $$"
+    ]
+
+def bytea_sql(size_mb):
+    """Filas de 4 KB de bytea aleatorio (incompresible, en TOAST)"""
+    rows = max(100, size_mb * 256)
+    # La subconsulta depende de g para que se evalúe en cada fila
+    return [
+        "CREATE TABLE blobs (id integer PRIMARY KEY, payload bytea)",
+        "ALTER TABLE blobs ALTER COLUMN payload SET STORAGE EXTERNAL",
+        "INSERT INTO blobs SELECT g, (SELECT decode(string_agg(md5(random()::text || g || j), ''), 'hex') "
+        f"FROM generate_series(1, 256) j) FROM generate_series(1, {rows}) g"
+    ]
+
+def index_heavy_sql(size_mb):
+    """Una tabla con seis índices: el tiempo de restauración lo dominan los índices"""
+    rows = max(1000, size_mb * MB // 400)
+    return [
+        "CREATE TABLE events (id bigint PRIMARY KEY, account integer, kind text, "
+        "created timestamptz, amount numeric, tags text[])",
+        "INSERT INTO events SELECT g, g % 5000, 'tipo_' || (g % 50), "
+        "now() - (g || ' seconds')::interval, (g % 10000) / 100.0, "
+        f"ARRAY['a' || (g % 7), 'b' || (g % 11)] FROM generate_series(1, {rows}) g",
+        "CREATE INDEX events_account ON events (account)",
+        "CREATE INDEX events_kind_created ON events (kind, created)",
+        "CREATE INDEX events_created ON events (created DESC)",
+        "CREATE INDEX events_amount ON events (amount) WHERE amount > 50",
+        "CREATE INDEX events_tags ON events USING gin (tags)"
+    ]
+
+# Formas disponibles: nombre -> (descripción, generador de sentencias SQL)
+SHAPES = {
+    "wide": ("tabla ancha", wide_sql),
+    "many_small": ("muchas tablas pequeñas", many_small_sql),
+    "bytea": ("bytea incompresible", bytea_sql),
+    "index_heavy": ("tabla con muchos índices", index_heavy_sql)
+}
+
+def dataset_sql(shape, size_mb):
+    """
+    Sentencias que crean un conjunto de datos en una base de datos vacía
+
+    Args:
+        shape (str): Forma del conjunto (clave de SHAPES)
+        size_mb (int): Tamaño aproximado en MB
+
+    Returns:
+        list: Sentencias SQL, que se ejecutan por separado
+
+    Raises:
+        KeyError: Si la forma no existe
+    """
+    _, generator = SHAPES[shape]
+    return generator(size_mb) + ["ANALYZE"]
@@ -0,0 +1,380 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from benchmarks.datasets import SHAPES, dataset_sql
+from core.compression import is_compression_available
+from core.system_utils import get_available_tools
+from config.settings import (
+    BACKUP_FORMATS, COMPRESSION_METHODS, PGDUMP_PARAMS, PGRESTORE_PARAMS, POSTGRES_DOCKER_IMAGE
+)
+
+# Directorio raíz del proyecto, desde el que se ejecuta cada caso
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MB = 1024 * 1024
+
+def run_case(case):
+    """
+    Ejecuta un caso de benchmark en el proceso actual
+
+    Se invoca en un proceso hijo (python -m benchmarks case), de modo que el
+    consumo de CPU y memoria del caso se mide sin mezclarse con el de otros.
+
+    Args:
+        case (dict): action ("backup" o "restore") y sus parámetros
+
+    Returns:
+        dict: success, duration (segundos) y, en los backups, method, size y final_backup
+    """
+    from core.backup_manager import BackupManager
+    from core.restore_manager import RestoreManager
+
+    start_time = time.monotonic()
+    if case["action"] == "backup":
+        tools = get_available_tools()
+        if case["method"] == "docker":
+            # Sin pg_dump local, BackupManager usa Docker
+            tools = dict(tools, has_pg_dump=False)
+        manager = BackupManager()
+        result = manager.run_backup(
+            manager.parse_connection_url(case["url"]), case["format"], None, case["compression"],
+            output_dir=case["output_dir"], tools=tools, repository=case.get("repository")
+        )
+        return {
+            "success": result["success"],
+            "duration": time.monotonic() - start_time,
+            "method": result["method"],
+            "size": result["size"],
+            "final_backup": result["final_backup"]
+        }
+
+    manager = RestoreManager()
+    if case["mode"] == "repository":
+        success = manager.restore_from_repository(case["repository"], case["backup"], connection_url=case["url"])
+    elif case["mode"] == "container":
+        success = manager.restore_to_container(case["backup"], case["container"], case["database"], "postgres")
+    else:
+        success = manager.restore_with_connection_url(case["backup"], case["url"])
+    return {"success": success, "duration": time.monotonic() - start_time}
+
+class BenchmarkRunner:
+    """
+    Mide todos los modos de backup y restauración contra un servidor desechable
+
+    Para cada conjunto de datos sintético se hace un backup por cada método,
+    formato y compresión (y en un repositorio deduplicado), y cada backup se
+    restaura en una base de datos vacía por cada modo de restauración. Cada
+    caso se ejecuta en su propio proceso para medir su CPU y su memoria máxima
+    (incluidas las herramientas locales que lanza; con Docker, solo el cliente).
+    """
+
+    def __init__(self, cluster, work_dir, logger_callback=None):
+        """
+        Inicializa el benchmark
+
+        Args:
+            cluster (BenchmarkCluster): Servidor ya arrancado
+            work_dir (str): Directorio para los backups y los registros de cada caso
+            logger_callback (callable): Función para registrar mensajes
+        """
+        self.cluster = cluster
+        self.work_dir = os.path.abspath(work_dir)
+        self.logger = logger_callback if logger_callback else print
+
+    def log(self, message):
+        """Registra un mensaje usando el callback configurado"""
+        if self.logger:
+            self.logger(message)
+
+    def backup_cases(self, formats=None, compressions=None, methods=None, repository=True):
+        """
+        Combinaciones de backup a medir
+
+        Args:
+            formats (list): Formatos (por defecto, todos)
+            compressions (list): Compresiones (por defecto, las disponibles)
+            methods (list): "local" y/o "docker" (por defecto, el disponible que usaría la aplicación)
+            repository (bool): Incluir un backup plain en un repositorio deduplicado
+
+        Returns:
+            list: Casos con label, method, format y compression
+        """
+        tools = get_available_tools()
+        if methods is None:
+            methods = ["local"] if tools["has_pg_dump"] else ["docker"]
+        formats = formats or list(BACKUP_FORMATS)
+        compressions = compressions or [method for method in COMPRESSION_METHODS if is_compression_available(method)]
+
+        cases = []
+        for method in methods:
+            for backup_format in formats:
+                # El formato directorio se comprime con pg_dump
+                for compression in (["none"] if backup_format == "directory" else compressions):
+                    cases.append({
+                        "label": f"{method}/{backup_format}/{compression}",
+                        "method": method,
+                        "format": backup_format,
+                        "compression": compression
+                    })
+            if repository:
+                cases.append({
+                    "label": f"{method}/repository",
+                    "method": method,
+                    "format": "plain",
+                    "compression": "none",
+                    "repository": True
+                })
+        return cases
+
+    def run(self, shapes, size_mb, backup_cases, restore_modes, repeat=1):
+        """
+        Ejecuta el benchmark completo
+
+        Args:
+            shapes (list): Conjuntos de datos (claves de SHAPES)
+            size_mb (int): Tamaño aproximado de cada conjunto
+            backup_cases (list): Casos de backup_cases()
+            restore_modes (list): "url" y/o "container"
+            repeat (int): Repeticiones de cada caso
+
+        Returns:
+            dict: Informe con el entorno, los conjuntos de datos y los resultados
+        """
+        report = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "environment": self._environment(),
+            "settings": {
+                "size_mb": size_mb,
+                "repeat": repeat,
+                "pg_dump_params": PGDUMP_PARAMS,
+                "pg_restore_params": PGRESTORE_PARAMS
+            },
+            "datasets": [],
+            "results": []
+        }
+
+        for shape in shapes:
+            dataset = self._load_dataset(shape, size_mb)
+            report["datasets"].append(dataset)
+            if dataset["error"]:
+                continue
+
+            for case in backup_cases:
+                for iteration in range(1, repeat + 1):
+                    backup = self._run_backup(dataset, case, iteration)
+                    report["results"].append(backup)
+                    if backup["success"]:
+                        for mode in self._restore_modes_for(case, restore_modes):
+                            report["results"].append(self._run_restore(dataset, case, backup, mode, iteration))
+                    # Los registros se conservan; los backups se eliminan para no llenar el disco
+                    shutil.rmtree(self._data_dir(dataset, case), ignore_errors=True)
+
+            for database in (dataset["database"], dataset["database"] + "_restore"):
+                self.cluster.execute(f'DROP DATABASE IF EXISTS "{database}"')
+        return report
+
+    def _environment(self):
+        """Datos del equipo, del servidor y de las herramientas para comparar ejecuciones"""
+        tools = get_available_tools()
+        return {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "provider": self.cluster.provider,
+            "server_version": self.cluster.server_version(),
+            "pg_dump": tools["details"]["pg_dump"]["version"],
+            "pg_restore": tools["details"]["pg_restore"]["version"],
+            "docker_image": POSTGRES_DOCKER_IMAGE,
+            "git_commit": self._git_commit()
+        }
+
+    def _git_commit(self):
+        """Commit del proyecto, o None si no es un repositorio git"""
+        try:
+            process = subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR, capture_output=True, text=True
+            )
+        except OSError:
+            return None
+        return process.stdout.strip() if process.returncode == 0 else None
+
+    def _load_dataset(self, shape, size_mb):
+        """Crea la base de datos de un conjunto de datos y mide la carga"""
+        database = f"bench_{shape}"
+        description, _ = SHAPES[shape]
+        dataset = {"shape": shape, "description": description, "database": database,
+                   "size": 0, "load_time": 0.0, "error": None}
+
+        self.log(f"\n→ Cargando {shape} ({description}, ~{size_mb} MB)...")
+        start_time = time.monotonic()
+        try:
+            self.cluster.recreate_database(database)
+            for statement in dataset_sql(shape, size_mb):
+                self.cluster.execute(statement, database)
+            dataset["size"] = self.cluster.database_size(database)
+        except RuntimeError as e:
+            self.log(f"✗ Error al cargar {shape}: {e}")
+            dataset["error"] = str(e)
+            return dataset
+
+        dataset["load_time"] = time.monotonic() - start_time
+        self.log(f"✓ {dataset['size'] / MB:.1f} MB en {dataset['load_time']:.1f} s")
+        return dataset
+
+    def _case_dir(self, dataset, case):
+        """Directorio de los backups de un caso"""
+        return os.path.join(self.work_dir, dataset["shape"], case["label"].replace("/", "_"))
+
+    def _data_dir(self, dataset, case):
+        """Directorio de los archivos de backup de un caso (se elimina tras medirlo)"""
+        return os.path.join(self._case_dir(dataset, case), "data")
+
+    def _restore_modes_for(self, case, restore_modes):
+        """Modos de restauración aplicables a un backup"""
+        if case.get("repository"):
+            return ["repository"]
+        return restore_modes
+
+    def _run_backup(self, dataset, case, iteration):
+        """Mide un backup"""
+        output_dir = self._data_dir(dataset, case)
+        os.makedirs(output_dir, exist_ok=True)
+        params = {
+            "action": "backup",
+            "url": self.cluster.url(dataset["database"]),
+            "method": case["method"],
+            "format": case["format"],
+            "compression": case["compression"],
+            "output_dir": output_dir,
+            "repository": os.path.join(output_dir, "repo") if case.get("repository") else None
+        }
+        result = self._measure(params, os.path.join(self._case_dir(dataset, case), f"backup_{iteration}"))
+        result.update({
+            "dataset": dataset["shape"],
+            "operation": "backup",
+            "mode": case["label"],
+            "iteration": iteration,
+            "throughput_mb_s": dataset["size"] / MB / result["duration"] if result["duration"] else None
+        })
+        self._log_result(result)
+        return result
+
+    def _run_restore(self, dataset, case, backup, mode, iteration):
+        """Mide la restauración de un backup en una base de datos vacía"""
+        database = dataset["database"] + "_restore"
+        output_dir = self._data_dir(dataset, case)
+        self.cluster.recreate_database(database)
+        params = {
+            "action": "restore",
+            "mode": mode,
+            "backup": backup["final_backup"],
+            "url": self.cluster.url(database),
+            "container": getattr(self.cluster, "container_name", None),
+            "database": database,
+            "repository": os.path.join(output_dir, "repo") if mode == "repository" else None
+        }
+        result = self._measure(params, os.path.join(self._case_dir(dataset, case), f"restore_{mode}_{iteration}"))
+        result.update({
+            "dataset": dataset["shape"],
+            "operation": "restore",
+            "mode": f"{mode} <- {case['label']}",
+            "iteration": iteration,
+            "throughput_mb_s": dataset["size"] / MB / result["duration"] if result["duration"] else None
+        })
+        self._log_result(result)
+        return result
+
+    def _measure(self, params, base_path):
+        """
+        Ejecuta un caso en un proceso hijo y mide su CPU y su memoria máxima
+
+        El proceso se espera con os.wait4, que devuelve el uso de recursos del
+        hijo y de los procesos que este ha esperado (pg_dump, psql...). En
+        Windows no está disponible y solo se mide el tiempo.
+
+        Returns:
+            dict: Resultado de run_case con cpu_user, cpu_system y peak_rss_mb
+        """
+        case_path = base_path + ".json"
+        result_path = base_path + ".result.json"
+        with open(case_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(params, result_path=result_path), f)
+
+        with open(base_path + ".log", 'w', encoding='utf-8') as log:
+            process = subprocess.Popen(
+                [sys.executable, "-m", "benchmarks", "case", case_path],
+                cwd=PROJECT_DIR, stdout=log, stderr=subprocess.STDOUT
+            )
+            usage = None
+            if hasattr(os, "wait4"):
+                _, _, usage = os.wait4(process.pid, 0)
+                # El proceso ya se ha esperado; evita que Popen lo espere de nuevo
+                process.returncode = 0
+            else:
+                process.wait()
+
+        try:
+            with open(result_path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            result = {"success": False, "duration": 0.0}
+        result["log"] = base_path + ".log"
+
+        if usage is not None:
+            # ru_maxrss está en KB en Linux y en bytes en macOS
+            rss_bytes = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+            result.update({
+                "cpu_user": usage.ru_utime,
+                "cpu_system": usage.ru_stime,
+                "peak_rss_mb": rss_bytes / MB
+            })
+        else:
+            result.update({"cpu_user": None, "cpu_system": None, "peak_rss_mb": None})
+        return result
+
+    def _log_result(self, result):
+        """Registra una línea con el resultado de un caso"""
+        if not result["success"]:
+            self.log(f"  ✗ {result['operation']:<8} {result['mode']:<40} falló (ver {result['log']})")
+            return
+        cpu = ""
+        if result["cpu_user"] is not None:
+            cpu = (f", CPU {result['cpu_user'] + result['cpu_system']:.1f} s, "
+                   f"RSS {result['peak_rss_mb']:.0f} MB")
+        self.log(f"  ✓ {result['operation']:<8} {result['mode']:<40} {result['duration']:7.2f} s, "
+                 f"{result['throughput_mb_s']:.1f} MB/s{cpu}")
+
+def compare_reports(old, new):
+    """
+    Compara la duración media de cada caso entre dos informes
+
+    Returns:
+        list: Filas (dataset, operation, mode, duración anterior, nueva y
+            variación en %), con None donde un caso falta en alguno
+    """
+    def averages(report):
+        durations = {}
+        for result in report["results"]:
+            if result["success"]:
+                key = (result["dataset"], result["operation"], result["mode"])
+                durations.setdefault(key, []).append(result["duration"])
+        return {key: sum(values) / len(values) for key, values in durations.items()}
+
+    old_averages = averages(old)
+    new_averages = averages(new)
+    rows = []
+    for key in sorted(set(old_averages) | set(new_averages)):
+        before = old_averages.get(key)
+        after = new_averages.get(key)
+        change = (after - before) / before * 100.0 if before and after is not None else None
+        rows.append(key + (before, after, change))
+    return rows
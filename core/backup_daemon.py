@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from core.backup_manager import BackupManager
+from core.cron import CronExpression
+from core.retention import prune_backups
+from config.settings import (
+    DEFAULT_BACKUP_FORMAT, DEFAULT_BACKUP_JOBS, DEFAULT_COMPRESSION,
+    DAEMON_MAX_WORKERS, DAEMON_POLL_INTERVAL, RETENTION_POLICY, SCHEDULER_OUTPUT_DIR
+)
+
+class BackupDaemon:
+    """
+    Servicio residente que ejecuta los backups según su programación cron
+
+    Cada perfil indica su expresión cron en "schedule" y, opcionalmente, su
+    política de retención en "retention". Tras cada backup correcto se aplica
+    la retención en el directorio del perfil (salvo si el perfil guarda sus
+    backups en un repositorio deduplicado con "repository"). Si un backup sigue en curso cuando
+    vuelve a tocar, esa ejecución se omite en lugar de solaparse.
+    """
+
+    def __init__(self, profiles, output_dir=SCHEDULER_OUTPUT_DIR, max_workers=DAEMON_MAX_WORKERS,
+                 logger_callback=None):
+        """
+        Inicializa el servicio
+
+        Args:
+            profiles (list): Perfiles (ver job_scheduler.load_profiles) con "schedule"
+            output_dir (str): Directorio base; cada perfil usa un subdirectorio
+            max_workers (int): Backups simultáneos
+            logger_callback (callable): Función para registrar mensajes
+
+        Raises:
+            ValueError: Si un perfil no tiene programación o esta no es válida
+        """
+        self.output_dir = output_dir
+        self.max_workers = max(1, max_workers)
+        self.logger = logger_callback if logger_callback else print
+
+        self._entries = []
+        for profile in profiles:
+            if not profile.get("schedule"):
+                raise ValueError(f"El perfil {profile.get('name') or profile['url']} no tiene programación")
+            self._entries.append({
+                "profile": profile,
+                "cron": CronExpression(profile["schedule"]),
+                "next_run": None,
+                "running": False
+            })
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._managers = set()
+
+    def log(self, message):
+        """Registra un mensaje usando el callback configurado"""
+        if self.logger:
+            self.logger(message)
+
+    def run(self):
+        """Ejecuta el servicio hasta que se llama a stop()"""
+        now = datetime.now()
+        for entry in self._entries:
+            entry["next_run"] = entry["cron"].next_after(now)
+            self.log(f"{self._profile_name(entry['profile'])}: '{entry['cron'].expression}', "
+                     f"próxima ejecución {entry['next_run']:%Y-%m-%d %H:%M}")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while not self._stop_event.is_set():
+                now = datetime.now()
+                for entry in self._entries:
+                    if entry["next_run"] > now:
+                        continue
+                    # Las ejecuciones perdidas no se recuperan: se programa la siguiente
+                    entry["next_run"] = entry["cron"].next_after(now)
+                    self._submit(executor, entry)
+
+                # Esperar hasta la próxima ejecución (acotado para tolerar cambios de hora)
+                wait = min(entry["next_run"] for entry in self._entries) - datetime.now()
+                self._stop_event.wait(max(1.0, min(wait.total_seconds(), DAEMON_POLL_INTERVAL)))
+
+        self.log("Servicio de backups detenido")
+
+    def stop(self):
+        """Detiene el servicio y cancela los backups en curso"""
+        self._stop_event.set()
+        with self._lock:
+            managers = list(self._managers)
+        for manager in managers:
+            manager.cancel()
+
+    def cancel(self):
+        """Equivalente a stop(), para usarlo como cualquier otro gestor cancelable"""
+        self.stop()
+
+    def _submit(self, executor, entry):
+        """Lanza el backup de un perfil si no hay otro en curso"""
+        name = self._profile_name(entry["profile"])
+        with self._lock:
+            if entry["running"]:
+                self.log(f"Advertencia: [{name}] el backup anterior sigue en curso; se omite esta ejecución")
+                return
+            entry["running"] = True
+        executor.submit(self._run_entry, entry)
+
+    def _run_entry(self, entry):
+        """Ejecuta el backup de un perfil y aplica su retención"""
+        profile = entry["profile"]
+        name = self._profile_name(profile)
+        manager = BackupManager(logger_callback=lambda message: self.log(f"[{name}] {message}"))
+        with self._lock:
+            self._managers.add(manager)
+
+        try:
+            conn_info = manager.parse_connection_url(profile["url"])
+            if not conn_info:
+                return
+
+            output_dir = os.path.join(self.output_dir, re.sub(r'[^\w.-]+', '_', name))
+            os.makedirs(output_dir, exist_ok=True)
+
+            self.log(f"→ [{name}] Iniciando backup programado")
+            result = manager.run_backup(
+                conn_info,
+                profile.get("format", DEFAULT_BACKUP_FORMAT),
+                profile.get("jobs", DEFAULT_BACKUP_JOBS),
+                profile.get("compression", DEFAULT_COMPRESSION),
+                profile.get("compression_level"),
+                output_dir=output_dir,
+                repository=profile.get("repository"),
+                incremental=profile.get("incremental", False),
+                keep_timestamped=True
+            )
+
+            if not result["success"]:
+                self.log(f"✗ [{name}] Backup programado fallido; próxima ejecución {entry['next_run']:%Y-%m-%d %H:%M}")
+                return
+
+            self.log(f"✓ [{name}] Backup completado en {result['duration']:.1f} s: {result['final_backup']}")
+            if profile.get("repository"):
+                return
+            prune_backups(
+                output_dir,
+                profile.get("retention", RETENTION_POLICY),
+                logger_callback=lambda message: self.log(f"[{name}] {message}")
+            )
+        except Exception as e:
+            self.log(f"✗ [{name}] Error inesperado: {e}")
+        finally:
+            with self._lock:
+                self._managers.discard(manager)
+                entry["running"] = False
+
+    def _profile_name(self, profile):
+        """Nombre con el que se identifica un perfil en los mensajes"""
+        if profile.get("name"):
+            return profile["name"]
+        match = re.match(r'postgresql://[^@]+@([^:/]+)[^/]*/(.+)', profile["url"])
+        return f"{match.group(1)}_{match.group(2)}" if match else profile["url"]
@@ -1,30 +1,77 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import atexit
+import functools
 import os
 import re
-import subprocess
+import shutil
+import threading
+import time
 from datetime import datetime
 
-from core.system_utils import get_system_info
-from config.settings import PGDUMP_PARAMS, POSTGRES_DOCKER_IMAGE, DEFAULT_BACKUP_FILENAME
+from core.system_utils import (
+    get_system_info, get_available_tools, get_install_instructions, is_pg_dump_compatible
+)
+from core.pg_client import build_client_command, run_query
+from core.compression import COMPRESSION_EXTENSIONS, create_compressor, is_compression_available
+from core.client_container import ClientContainer
+from core.process_runner import ProcessRunner
+from core.dedup_repository import DedupRepository
+from core.checksums import create_hasher, hash_directory, write_manifest
+from core.sql_splitter import PlainDumpScanner
+from core.dump_index import write_index
+from core.incremental import get_table_fingerprints, load_state, plan_backup, exclude_data_args, record_backup
+from core.progress import ProgressTracker, estimate_backup_size, format_event, track_table_line, is_verbose_info
+from core.tracing import trace_span
+from config.settings import (
+    PGDUMP_PARAMS, DEFAULT_BACKUP_FILENAME, BACKUP_FORMATS, DEFAULT_BACKUP_FORMAT,
+    DEFAULT_BACKUP_JOBS, DEFAULT_COMPRESSION, DEFAULT_COMPRESSION_THREADS,
+    DOCKER_CLIENT_REUSE, KEEP_TIMESTAMPED_BACKUPS, PARTIAL_SUFFIX,
+    CHECKSUM_ALGORITHM, POSTGRES_DOCKER_IMAGE, PLAIN_INDEX_ON_BACKUP
+)
 
 class BackupManager:
-    def __init__(self, logger_callback=None):
+    def __init__(self, logger_callback=None, progress_callback=None):
         """
         Inicializa el gestor de backups
         
         Args:
             logger_callback (callable): Función para registrar mensajes
+            progress_callback (callable): Recibe los eventos de progreso (ver
+                ProgressTracker); se invoca desde los hilos del backup
         """
         self.logger = logger_callback if logger_callback else print
+        self.progress_callback = progress_callback
         self.system_info = get_system_info()
+        
+        # Traza por fases del trabajo en curso (ver core/tracing.py), o None
+        self.tracer = None
+        
+        # Contenedor cliente reutilizable para los backups con Docker
+        self.reuse_container = DOCKER_CLIENT_REUSE
+        self.client_container = None
+        self._startup_times = {}
+        
+        # Procesos en curso, para poder cancelarlos
+        self._active_runners = set()
+        self._runners_lock = threading.Lock()
+        # Marcado al cancelar: los procesos que se lancen después ya no arrancan
+        self._cancel_event = threading.Event()
     
     def log(self, message):
         """Registra un mensaje usando el callback configurado"""
         if self.logger:
             self.logger(message)
     
+    def _on_progress_event(self, event):
+        """Registra un evento de progreso y lo entrega al callback de progreso"""
+        message = format_event(event)
+        if message:
+            self.log(message)
+        if self.progress_callback:
+            self.progress_callback(event)
+    
     def parse_connection_url(self, connection_url):
         """Analiza una URL de conexión PostgreSQL y devuelve sus componentes"""
         pattern = r'postgresql://([^:]+):([^@]+)@([^:]+):(\d+)/(.+)'
@@ -42,87 +89,778 @@ class BackupManager:
             "database": match.group(5)
         }
     
-    def create_backup_filename(self, database_name):
+    def get_server_major(self, conn_info, use_docker=None):
+        """
+        Obtiene la versión mayor del servidor PostgreSQL
+        
+        Returns:
+            int: Versión mayor (p. ej. 16), o None si no se pudo consultar
+        """
+        rows = run_query(conn_info, "SHOW server_version_num", use_docker=use_docker)
+        if not rows:
+            return None
+        return int(rows[0][0]) // 10000
+    
+    def create_backup_filename(self, database_name, backup_format=DEFAULT_BACKUP_FORMAT,
+                               compression=DEFAULT_COMPRESSION):
         """Crea un nombre de archivo de backup con timestamp"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        return f"{database_name}_backup_{timestamp}.sql"
-    
-    def backup_with_docker(self, conn_info, backup_file, final_backup):
-        """Ejecuta el backup usando Docker"""
-        docker_command = [
-            "docker", "run", "--rm",
-            "-e", f"PGPASSWORD={conn_info['password']}",
-            POSTGRES_DOCKER_IMAGE,
-            "pg_dump",
-            "-h", conn_info['host'],
-            "-p", conn_info['port'],
-            "-U", conn_info['username'],
-            "-d", conn_info['database']
-        ] + PGDUMP_PARAMS
+        extension = self._backup_extension(backup_format, compression)
+        return f"{database_name}_backup_{timestamp}{extension}"
+    
+    def get_final_backup_name(self, backup_format=DEFAULT_BACKUP_FORMAT, compression=DEFAULT_COMPRESSION):
+        """Devuelve el nombre final del backup según el formato"""
+        base_name = os.path.splitext(DEFAULT_BACKUP_FILENAME)[0]
+        return base_name + self._backup_extension(backup_format, compression)
+    
+    def _backup_extension(self, backup_format, compression):
+        """Devuelve la extensión del backup según el formato y la compresión"""
+        extension = BACKUP_FORMATS[backup_format]["extension"]
+        if backup_format != "directory":
+            extension += COMPRESSION_EXTENSIONS[compression]
+        return extension
+    
+    def resolve_jobs(self, conn_info, backup_format, jobs=None, use_docker=False):
+        """
+        Determina el número de procesos paralelos de pg_dump
+        
+        Args:
+            conn_info (dict): Componentes de la URL de conexión
+            backup_format (str): Formato del backup
+            jobs (int): Número de procesos solicitado, o None para calcularlo
+            use_docker (bool): Consultar el servidor usando Docker
+        
+        Returns:
+            int: Número de procesos a usar (1 si el formato no admite paralelismo)
+        """
+        if backup_format != "directory":
+            if jobs and jobs > 1:
+                self.log("Advertencia: pg_dump solo admite procesos paralelos en formato directorio")
+            return 1
+        
+        if jobs:
+            return max(1, int(jobs))
+        
+        # Automático: un proceso por núcleo, sin superar el número de tablas
+        cpu_count = os.cpu_count() or 1
+        rows = run_query(
+            conn_info,
+            "SELECT count(*) FROM pg_catalog.pg_tables "
+            "WHERE schemaname NOT IN ('pg_catalog', 'information_schema')",
+            use_docker=use_docker
+        )
+        if rows:
+            table_count = int(rows[0][0])
+            self.log(f"Tablas detectadas: {table_count}, núcleos: {cpu_count}")
+            return max(1, min(cpu_count, table_count))
+        
+        return cpu_count
+    
+    def _build_pg_dump_args(self, backup_format, jobs, compression=DEFAULT_COMPRESSION, output_path=None,
+                            raw_output=False, extra_args=None):
+        """
+        Construye los parámetros de pg_dump para el formato y procesos indicados
+        
+        raw_output desactiva la compresión interna del formato custom, para que la
+        salida pueda comprimirse o deduplicarse después. extra_args se añaden al
+        final (p. ej. las tablas que omite un backup incremental).
+        """
+        args = list(PGDUMP_PARAMS) + BACKUP_FORMATS[backup_format]["params"]
+        if backup_format == "custom" and (compression != "none" or raw_output):
+            # La compresión externa sustituye a la interna de pg_dump
+            args.append("-Z0")
+        if jobs > 1:
+            args += ["-j", str(jobs)]
+        if output_path:
+            args += ["-f", output_path]
+        return args + (extra_args or [])
+    
+    def select_backup_method(self, conn_info, tools=None):
+        """
+        Elige cómo ejecutar pg_dump según las herramientas disponibles
+        
+        El pg_dump local solo se usa si es compatible con la versión del servidor.
+        
+        Args:
+            conn_info (dict): Componentes de la URL de conexión
+            tools (dict): Resultado de get_available_tools (None = consultarlo)
+        
+        Returns:
+            str: "local", "docker" o None si no hay herramientas disponibles
+        """
+        if tools is None:
+            tools = get_available_tools()
+        
+        use_local = tools['has_pg_dump'] and not self.system_info["is_windows"]
+        if use_local and tools['has_docker']:
+            server_major = self.get_server_major(conn_info)
+            if not is_pg_dump_compatible(server_major, tools):
+                local_major = tools['details']['pg_dump']['major']
+                self.log(f"pg_dump local ({local_major}) es anterior al servidor ({server_major}); se usará Docker")
+                use_local = False
+        
+        if use_local:
+            return "local"
+        if tools['has_docker']:
+            return "docker"
+        return None
+    
+    def run_backup(self, conn_info, backup_format=DEFAULT_BACKUP_FORMAT, jobs=DEFAULT_BACKUP_JOBS,
+                   compression=DEFAULT_COMPRESSION, compression_level=None,
+                   output_dir=None, tools=None, repository=None, incremental=False,
+                   keep_timestamped=None):
+        """
+        Realiza un backup completo con la herramienta disponible
+        
+        Args:
+            conn_info (dict): Componentes de la URL de conexión
+            backup_format (str): Formato del backup
+            jobs (int): Procesos paralelos de pg_dump (None = automático)
+            compression (str): Método de compresión
+            compression_level (int): Nivel de compresión (None = por defecto)
+            output_dir (str): Directorio donde se guarda el backup (por defecto, el actual)
+            tools (dict): Resultado de get_available_tools (None = consultarlo)
+            repository (str): Repositorio deduplicado donde guardar el backup en
+                lugar de un archivo (ver DedupRepository)
+            incremental (bool): Volcar solo los datos de las tablas modificadas
+                desde el backup anterior del mismo directorio (formatos custom y
+                directorio)
+            keep_timestamped (bool): Conservar el nombre con timestamp en lugar de
+                renombrar el backup a DEFAULT_BACKUP_FILENAME (None =
+                KEEP_TIMESTAMPED_BACKUPS). Los servicios programados lo activan
+                siempre, porque su retención se basa en esos nombres
+        
+        Returns:
+            dict: success, method, final_backup, size (bytes) y duration (segundos).
+                En un repositorio, final_backup es el nombre del backup y size su
+                tamaño sin deduplicar
+        """
+        # Descarta la cancelación de un backup anterior
+        self._cancel_event.clear()
+        if repository:
+            return self._run_repository_backup(
+                conn_info, backup_format, compression, repository, tools
+            )
+        
+        output_dir = output_dir or os.getcwd()
+        start_time = time.monotonic()
+        plan = None
+        if incremental:
+            if compression != "none":
+                # pg_restore debe poder leer cada backup de la cadena por secciones
+                self.log("Advertencia: los backups incrementales usan la compresión interna de pg_dump; "
+                         "se omite la compresión del flujo")
+                compression = "none"
+            with trace_span(self.tracer, "plan_incremental"):
+                plan = self._plan_incremental_backup(conn_info, backup_format, output_dir)
+            if plan is None:
+                return {"success": False, "method": None, "final_backup": None, "size": 0, "duration": 0.0}
+        extra_args = exclude_data_args(plan) if plan else None
+        with trace_span(self.tracer, "estimate") as span:
+            estimate = self._estimate_backup(conn_info, plan)
+            span.set(bytes=estimate["total"] if estimate else None)
+        
+        if keep_timestamped is None:
+            keep_timestamped = KEEP_TIMESTAMPED_BACKUPS
+        backup_name = self.create_backup_filename(conn_info['database'], backup_format, compression)
+        # Mientras se escribe, el backup lleva un sufijo que la retención ignora
+        backup_file = os.path.join(output_dir, backup_name + PARTIAL_SUFFIX)
+        # La cadena incremental necesita que cada backup conserve su nombre
+        if keep_timestamped or incremental:
+            final_backup = os.path.join(output_dir, backup_name)
+        else:
+            final_backup = os.path.join(output_dir, self.get_final_backup_name(backup_format, compression))
+        
+        with trace_span(self.tracer, "select_method") as span:
+            method = self.select_backup_method(conn_info, tools)
+            span.set(method=method)
+        # Las consultas previas no se pueden interrumpir; si se canceló mientras, no se lanza pg_dump
+        if self._check_cancelled():
+            return {"success": False, "method": method, "final_backup": None, "size": 0,
+                    "duration": time.monotonic() - start_time}
+        success = False
+        
+        if method == "local":
+            self.log(f"\n→ Usando pg_dump local...")
+            success = self.backup_with_local_pg_dump(
+                conn_info, backup_file, final_backup, backup_format, jobs,
+                compression, compression_level, extra_args, estimate
+            )
+        elif method == "docker":
+            self.log(f"\n→ Usando Docker...")
+            success = self.backup_with_docker(
+                conn_info, backup_file, final_backup, backup_format, jobs,
+                compression, compression_level, extra_args, estimate
+            )
+        else:
+            self.log("\n✗ No hay herramientas disponibles para crear el backup.")
+            self.log("\n" + get_install_instructions())
+        
+        if success and plan:
+            with trace_span(self.tracer, "record_incremental"):
+                record_backup(output_dir, conn_info['database'], os.path.basename(final_backup), plan)
         
+        return {
+            "success": success,
+            "method": method,
+            "final_backup": final_backup,
+            "size": self._backup_size(final_backup) if success else 0,
+            "duration": time.monotonic() - start_time
+        }
+    
+    def _plan_incremental_backup(self, conn_info, backup_format, output_dir):
+        """Decide qué tablas vuelca un backup incremental, o devuelve None si no es posible"""
+        if backup_format == "plain":
+            # La cadena se restaura por secciones con pg_restore
+            self.log("✗ Error: los backups incrementales requieren el formato custom o directorio")
+            return None
+        
+        state = load_state(output_dir, conn_info['database'])
+        plan = plan_backup(state, get_table_fingerprints(conn_info), output_dir)
+        if plan["full"]:
+            self.log(f"Backup incremental: se hace un backup completo ({plan['reason']})")
+        else:
+            self.log(f"Backup incremental: {len(plan['changed'])} tablas modificadas, "
+                     f"{len(plan['unchanged'])} sin cambios (sus datos se toman de backups anteriores)")
+        return plan
+    
+    def _estimate_backup(self, conn_info, plan=None):
+        """
+        Estima el volumen del backup para calcular el porcentaje y el tiempo restante
+        
+        Returns:
+            dict: Resultado de estimate_backup_size, o None si no se pudo consultar
+        """
+        estimate = estimate_backup_size(conn_info, exclude=plan["unchanged"] if plan else None)
+        if estimate is None:
+            self.log("Advertencia: no se pudo estimar el tamaño de la base de datos; "
+                     "el progreso se mostrará sin tiempo restante")
+            return None
+        
+        self.log(f"Tamaño estimado: {estimate['total'] / (1024 * 1024):.1f} MB en "
+                 f"{len(estimate['tables'])} tablas (base de datos: "
+                 f"{estimate['database_size'] / (1024 * 1024):.1f} MB con índices)")
+        return estimate
+    
+    def _new_tracker(self, estimate=None, jobs=1):
+        """Crea el seguimiento del progreso de un backup"""
+        return ProgressTracker(
+            "backup", self._on_progress_event,
+            total=estimate["total"] if estimate else None,
+            table_sizes=estimate["tables"] if estimate else None,
+            sequential=jobs <= 1
+        )
+    
+    def _log_stderr(self, stderr):
+        """Registra la salida de error de pg_dump sin los mensajes informativos de --verbose"""
+        self.log("\n".join(line for line in stderr.splitlines() if not is_verbose_info(line)))
+    
+    def _run_repository_backup(self, conn_info, backup_format, compression, repository, tools):
+        """Realiza un backup en un repositorio deduplicado (ver run_backup)"""
+        start_time = time.monotonic()
+        result = {"success": False, "method": None, "final_backup": None, "size": 0, "duration": 0.0}
+        
+        if backup_format == "directory":
+            self.log("✗ Error: el repositorio deduplicado admite los formatos plain y custom")
+            return result
+        if compression != "none":
+            # Comprimir el flujo completo impediría encontrar fragmentos repetidos
+            self.log("Advertencia: el repositorio comprime cada fragmento; se omite la compresión del flujo")
+        
+        repository = DedupRepository(repository, logger_callback=self.log)
+        backup_name = self.create_backup_filename(conn_info['database'], backup_format, "none")
+        with trace_span(self.tracer, "select_method") as span:
+            result["method"] = self.select_backup_method(conn_info, tools)
+            span.set(method=result["method"])
+        
+        if result["method"] == "local":
+            self.log(f"\n→ Usando pg_dump local...")
+            command, env = build_client_command(
+                conn_info, "pg_dump", self._build_pg_dump_args(backup_format, 1, raw_output=True)
+            )
+        elif result["method"] == "docker":
+            self.log(f"\n→ Usando Docker...")
+            command, env = build_client_command(
+                conn_info, "pg_dump", self._build_pg_dump_args(backup_format, 1, raw_output=True),
+                use_docker=True
+            )
+        else:
+            self.log("\n✗ No hay herramientas disponibles para crear el backup.")
+            self.log("\n" + get_install_instructions())
+            return result
+        if self._check_cancelled():
+            return result
+        
+        self.log(f"Formato: {backup_format}, repositorio: {repository.path}")
         try:
-            with open(backup_file, 'w', encoding='utf-8') as f:
-                process = subprocess.run(
-                    docker_command,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    encoding='utf-8'
+            writer = repository.create_writer(backup_name, {
+                "database": conn_info['database'],
+                "host": conn_info['host'],
+                "format": backup_format
+            })
+        except FileExistsError as e:
+            self.log(f"✗ Error: {e}")
+            return result
+        
+        with trace_span(self.tracer, "estimate") as span:
+            estimate = self._estimate_backup(conn_info)
+            span.set(bytes=estimate["total"] if estimate else None)
+        tracker = self._new_tracker(estimate)
+        tracker.start(format=backup_format, compression="none", jobs=1)
+        state = {"bytes_read": 0}
+        
+        def write_chunk(chunk):
+            writer.write(chunk)
+            state["bytes_read"] += len(chunk)
+            tracker.update(state["bytes_read"])
+        
+        runner = self._new_runner()
+        try:
+            with trace_span(self.tracer, "pg_dump", method=result["method"], format=backup_format) as span:
+                process = runner.run(
+                    command, env, stdout_sink=write_chunk,
+                    on_stderr_line=functools.partial(track_table_line, tracker)
                 )
-                f.write(process.stdout)
+                span.set(bytes_in=process["bytes_out"], returncode=process["returncode"])
+                span.mark("first_byte", process["first_byte"])
+            if process["cancelled"] or process["returncode"] != 0:
+                writer.abort()
+                tracker.finish(False)
+                if process["cancelled"]:
+                    self.log("✗ Backup cancelado")
+                else:
+                    self.log(f"✗ Error al crear el backup:")
+                    self._log_stderr(process["stderr"])
+                return result
             
-            if process.returncode == 0:
-                self.log(f"✓ Backup creado exitosamente: {backup_file}")
-                os.rename(backup_file, final_backup)
-                self.log(f"✓ Archivo renombrado a: {final_backup}")
-                return True
-            else:
-                self.log(f"✗ Error al crear el backup:")
-                self.log(process.stderr)
-                return False
-                
+            with trace_span(self.tracer, "repository_commit") as span:
+                stats = writer.commit()
+                span.set(bytes=stats["new_bytes"], chunks=stats["chunks"], new_chunks=stats["new_chunks"])
         except Exception as e:
+            writer.abort()
+            tracker.finish(False)
             self.log(f"✗ Error al ejecutar el comando: {e}")
+            return result
+        finally:
+            self._release_runner(runner)
+        
+        tracker.finish(True)
+        
+        self._log_dedup_summary(stats)
+        self.log(f"✓ Backup guardado en el repositorio: {backup_name}")
+        result.update({
+            "success": True,
+            "final_backup": backup_name,
+            "size": stats["bytes_in"],
+            "duration": time.monotonic() - start_time
+        })
+        return result
+    
+    def _log_dedup_summary(self, stats):
+        """Registra la deduplicación y la velocidad de ingesta de un backup"""
+        mb_in = stats["bytes_in"] / (1024 * 1024)
+        mb_new = stats["new_bytes"] / (1024 * 1024)
+        mb_stored = stats["bytes_stored"] / (1024 * 1024)
+        self.log(f"  {mb_in:.1f} MB en {stats['chunks']} fragmentos, "
+                 f"{stats['new_chunks']} nuevos ({mb_new:.1f} MB, {mb_stored:.1f} MB comprimidos)")
+        
+        dedup = f"{stats['dedup_ratio']:.1f}:1" if stats["dedup_ratio"] else "total"
+        storage = f"{stats['storage_ratio']:.1f}:1" if stats["storage_ratio"] else "sin datos nuevos"
+        self.log(f"  Deduplicación: {dedup}, almacenamiento: {storage}, "
+                 f"ingesta: {stats['throughput']:.1f} MB/s en {stats['duration']:.1f} s")
+    
+    def _backup_size(self, path):
+        """Devuelve el tamaño en bytes de un backup (archivo o directorio)"""
+        if not os.path.isdir(path):
+            return os.path.getsize(path)
+        
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                total += os.path.getsize(os.path.join(root, name))
+        return total
+    
+    def _finalize_backup(self, backup_file, final_backup):
+        """Renombra el backup terminado a su nombre final"""
+        self.log(f"✓ Backup creado exitosamente: {backup_file}")
+        with trace_span(self.tracer, "rename"):
+            if os.path.isdir(final_backup):
+                shutil.rmtree(final_backup)
+            os.rename(backup_file, final_backup)
+        self.log(f"✓ Archivo renombrado a: {final_backup}")
+    
+    def backup_with_docker(self, conn_info, backup_file, final_backup,
+                           backup_format=DEFAULT_BACKUP_FORMAT, jobs=DEFAULT_BACKUP_JOBS,
+                           compression=DEFAULT_COMPRESSION, compression_level=None, extra_args=None,
+                           estimate=None):
+        """Ejecuta el backup usando Docker (estimate: ver _estimate_backup)"""
+        with trace_span(self.tracer, "resolve_jobs"):
+            jobs = self.resolve_jobs(conn_info, backup_format, jobs, use_docker=True)
+        compression = self._resolve_compression(backup_format, compression)
+        if compression is None:
             return False
+        self.log(f"Formato: {backup_format}, procesos: {jobs}, compresión: {compression}")
+        
+        # Con un contenedor cliente reutilizable, pg_dump se ejecuta con docker exec
+        container = None
+        if self.reuse_container:
+            with trace_span(self.tracer, "client_container"):
+                container = self._get_client_container()
+        if container:
+            docker_command = self._build_client_container_command(
+                container, conn_info, backup_file, backup_format, jobs, compression, extra_args
+            )
+            if docker_command:
+                container.job_started()
+                try:
+                    return self._run_pg_dump(
+                        docker_command, None, backup_file, final_backup,
+                        backup_format, compression, compression_level, "docker exec", conn_info,
+                        jobs, estimate
+                    )
+                finally:
+                    container.job_finished()
+        
+        if backup_format == "directory":
+            # pg_dump escribe el directorio en un volumen montado
+            output_dir = os.path.dirname(os.path.abspath(backup_file))
+            docker_command, env = build_client_command(
+                conn_info, "pg_dump",
+                self._build_pg_dump_args(
+                    backup_format, jobs, compression, f"/backup/{os.path.basename(backup_file)}",
+                    extra_args=extra_args
+                ),
+                use_docker=True,
+                volumes=[(output_dir, "/backup")]
+            )
+        else:
+            docker_command, env = build_client_command(
+                conn_info, "pg_dump",
+                self._build_pg_dump_args(backup_format, jobs, compression, extra_args=extra_args),
+                use_docker=True
+            )
+        
+        return self._run_pg_dump(
+            docker_command, env, backup_file, final_backup,
+            backup_format, compression, compression_level, "docker run", conn_info,
+            jobs, estimate
+        )
+    
+    def _get_client_container(self):
+        """Devuelve el contenedor cliente reutilizable, arrancándolo si es necesario"""
+        if self.client_container is None:
+            self.client_container = ClientContainer(logger_callback=self.log)
+            atexit.register(self.client_container.stop)
+        
+        if not self.client_container.ensure_running():
+            self.log("Advertencia: no se pudo usar el contenedor cliente, usando docker run")
+            return None
+        return self.client_container
     
-    def backup_with_local_pg_dump(self, conn_info, backup_file, final_backup):
-        """Ejecuta el backup usando pg_dump local"""
-        # Configurar variable de entorno para la contraseña
-        env = os.environ.copy()
-        env['PGPASSWORD'] = conn_info['password']
-        
-        pg_dump_command = [
-            "pg_dump",
-            "-h", conn_info['host'],
-            "-p", conn_info['port'],
-            "-U", conn_info['username'],
-            "-d", conn_info['database'],
-            "-f", backup_file
-        ] + PGDUMP_PARAMS
+    def _build_client_container_command(self, container, conn_info, backup_file,
+                                        backup_format, jobs, compression, extra_args=None):
+        """Construye el comando de pg_dump en el contenedor cliente, o None si no es posible"""
+        output_path = None
+        if backup_format == "directory":
+            # El directorio de salida debe estar dentro del volumen del contenedor
+            output_path = container.container_path(backup_file)
+            if output_path is None:
+                self.log("Advertencia: el directorio de salida no está montado en el contenedor cliente, usando docker run")
+                return None
         
+        return container.build_command(
+            conn_info, "pg_dump",
+            self._build_pg_dump_args(backup_format, jobs, compression, output_path, extra_args=extra_args)
+        )
+    
+    def _log_startup_time(self, startup_label, first_byte_time):
+        """Registra el tiempo hasta el primer byte y lo compara entre modos de Docker"""
+        if startup_label is None or first_byte_time is None:
+            return
+        
+        self._startup_times.setdefault(startup_label, []).append(first_byte_time)
+        self.log(f"  Tiempo hasta el primer byte ({startup_label}): {first_byte_time:.2f} s")
+        
+        averages = {
+            label: sum(times) / len(times)
+            for label, times in self._startup_times.items() if times
+        }
+        if len(averages) > 1:
+            comparison = ", ".join(f"{label}: {avg:.2f} s" for label, avg in averages.items())
+            saving = averages["docker run"] - averages["docker exec"]
+            self.log(f"  Media hasta el primer byte: {comparison} (ahorro por trabajo: {saving:.2f} s)")
+    
+    def backup_with_local_pg_dump(self, conn_info, backup_file, final_backup,
+                                  backup_format=DEFAULT_BACKUP_FORMAT, jobs=DEFAULT_BACKUP_JOBS,
+                                  compression=DEFAULT_COMPRESSION, compression_level=None, extra_args=None,
+                                  estimate=None):
+        """Ejecuta el backup usando pg_dump local (estimate: ver _estimate_backup)"""
+        with trace_span(self.tracer, "resolve_jobs"):
+            jobs = self.resolve_jobs(conn_info, backup_format, jobs)
+        compression = self._resolve_compression(backup_format, compression)
+        if compression is None:
+            return False
+        self.log(f"Formato: {backup_format}, procesos: {jobs}, compresión: {compression}")
+        
+        # Solo el formato directorio escribe directamente en disco; el resto
+        # pasa por la salida estándar para poder comprimirse en streaming
+        output_path = backup_file if backup_format == "directory" else None
+        
+        # El comando incluye la variable de entorno para la contraseña
+        pg_dump_command, env = build_client_command(
+            conn_info, "pg_dump",
+            self._build_pg_dump_args(backup_format, jobs, compression, output_path, extra_args=extra_args)
+        )
+        
+        return self._run_pg_dump(
+            pg_dump_command, env, backup_file, final_backup,
+            backup_format, compression, compression_level, conn_info=conn_info,
+            jobs=jobs, estimate=estimate
+        )
+    
+    def _resolve_compression(self, backup_format, compression):
+        """Valida el método de compresión para el formato indicado (None si no está disponible)"""
+        if backup_format == "directory" and compression != "none":
+            self.log("Advertencia: el formato directorio se comprime con pg_dump; se omite la compresión adicional")
+            return "none"
+        if not is_compression_available(compression):
+            self.log(f"✗ Error: La compresión {compression} no está disponible.")
+            if compression == "zstd":
+                self.log("  - Instala el módulo con: pip install zstandard")
+            return None
+        return compression
+    
+    def _run_pg_dump(self, command, env, backup_file, final_backup,
+                     backup_format, compression, compression_level, startup_label=None, conn_info=None,
+                     jobs=1, estimate=None):
+        """
+        Ejecuta pg_dump, renombra el backup si termina correctamente y escribe su manifiesto
+        
+        El progreso se sigue con las tablas que pg_dump --verbose anuncia en
+        stderr y, salvo en formato directorio, con los bytes de su salida. Los
+        backups plain sin comprimir se analizan mientras se escriben para
+        guardar su índice (ver core/dump_index.py).
+        """
+        scanner = None
+        if backup_format == "plain" and compression == "none" and PLAIN_INDEX_ON_BACKUP:
+            scanner = PlainDumpScanner()
+        tracker = self._new_tracker(estimate, jobs)
+        tracker.start(format=backup_format, compression=compression, jobs=jobs)
+        success = False
+        runner = self._new_runner()
         try:
-            process = subprocess.run(
-                pg_dump_command,
-                env=env,
-                capture_output=True,
-                text=True
-            )
+            with trace_span(self.tracer, "pg_dump", method=startup_label or "local", format=backup_format,
+                            compression=compression, jobs=jobs) as span:
+                if backup_format == "directory":
+                    result = runner.run(command, env, on_stderr_line=functools.partial(track_table_line, tracker))
+                else:
+                    result = self._stream_to_file(
+                        runner, command, backup_file, env, compression, compression_level, tracker, scanner
+                    )
+                    self._log_startup_time(startup_label, result["first_byte"])
+                # En formato directorio pg_dump escribe los archivos y no hay bytes de salida
+                span.set(bytes_in=result["bytes_out"] if backup_format != "directory" else None,
+                         bytes_out=result.get("bytes_written"), returncode=result["returncode"])
+                # Hasta el primer byte: arranque de pg_dump (o del contenedor) y conexión al servidor
+                span.mark("first_byte", result["first_byte"])
+            
+            if result["cancelled"]:
+                self.log("✗ Backup cancelado")
+                self._remove_partial_backup(backup_file)
+                return False
             
-            if process.returncode == 0:
-                self.log(f"✓ Backup creado exitosamente: {backup_file}")
-                os.rename(backup_file, final_backup)
-                self.log(f"✓ Archivo renombrado a: {final_backup}")
+            if result["returncode"] == 0:
+                success = True
+                tracker.finish(True)
+                self._finalize_backup(backup_file, final_backup)
+                with trace_span(self.tracer, "manifest"):
+                    self._write_backup_manifest(final_backup, result, backup_format, compression, command, conn_info)
+                if scanner:
+                    with trace_span(self.tracer, "index"):
+                        self._write_backup_index(final_backup, scanner)
                 return True
             else:
                 self.log(f"✗ Error al crear el backup:")
-                self.log(process.stderr)
+                self._log_stderr(result["stderr"])
+                self._remove_partial_backup(backup_file)
                 return False
                 
         except Exception as e:
             self.log(f"✗ Error al ejecutar el comando: {e}")
             return False
+        finally:
+            if not success:
+                tracker.finish(False)
+            self._release_runner(runner)
     
-    def get_restore_instructions(self, conn_info, final_backup):
+    def _write_backup_manifest(self, final_backup, result, backup_format, compression, command, conn_info):
+        """
+        Escribe el manifiesto con la suma de comprobación y el origen del backup
+        
+        En los backups de un archivo, la suma se calculó mientras se escribía
+        (ver _stream_to_file). pg_dump escribe directamente los archivos del
+        formato directorio, por lo que estos se leen una vez al terminar.
+        """
+        try:
+            if backup_format == "directory":
+                files = hash_directory(final_backup)
+            else:
+                files = {os.path.basename(final_backup): {
+                    "size": result["bytes_written"],
+                    "checksum": result["checksum"]
+                }}
+            
+            rows = run_query(conn_info, "SHOW server_version") if conn_info else None
+            path = write_manifest(final_backup, files, {
+                "format": backup_format,
+                "compression": compression,
+                "pg_dump_version": self._pg_dump_version(command),
+                "server_version": rows[0][0] if rows else None,
+                "duration": round(result["duration"], 3)
+            })
+        except OSError as e:
+            self.log(f"Advertencia: no se pudo escribir el manifiesto del backup: {e}")
+            return
+        self.log(f"✓ Manifiesto ({CHECKSUM_ALGORITHM}, {len(files)} archivos): {path}")
+    
+    def _write_backup_index(self, final_backup, scanner):
+        """Guarda el índice de objetos de un backup plain analizado mientras se escribía"""
+        dump = scanner.finish()
+        if not dump["entries"]:
+            return
+        try:
+            path = write_index(final_backup, dump)
+        except OSError as e:
+            self.log(f"Advertencia: no se pudo escribir el índice del backup: {e}")
+            return
+        self.log(f"✓ Índice ({len(dump['entries'])} objetos): {path}")
+    
+    def _pg_dump_version(self, command):
+        """Versión del pg_dump que ejecuta un comando (local o imagen de Docker)"""
+        if command[0] == "docker":
+            return POSTGRES_DOCKER_IMAGE
+        return get_available_tools()['details']['pg_dump']['version']
+    
+    def _stream_to_file(self, runner, command, backup_file, env=None,
+                        compression=DEFAULT_COMPRESSION, compression_level=None, tracker=None, scanner=None):
+        """
+        Ejecuta un comando y escribe su salida estándar en un archivo por bloques
+        
+        La salida se copia en binario, sin decodificar, para que el uso de memoria
+        no dependa del tamaño del dump. El ProcessRunner lee la salida del proceso
+        en una cola acotada mientras el hilo actual comprime y escribe, de modo que
+        la lectura, la compresión y la escritura se solapan.
+        
+        Args:
+            runner (ProcessRunner): Ejecutor del proceso
+            command (list): Comando a ejecutar
+            backup_file (str): Archivo de destino
+            env (dict): Variables de entorno para el proceso
+            compression (str): Método de compresión ("none", "gzip" o "zstd")
+            compression_level (int): Nivel de compresión (None = por defecto)
+            tracker (ProgressTracker): Seguimiento del progreso (None = crear uno sin estimación)
+            scanner (PlainDumpScanner): Recibe la salida sin comprimir, para el índice
+        
+        Returns:
+            dict: Resultado de ProcessRunner.run con, además, bytes_written y
+                checksum (suma CHECKSUM_ALGORITHM de los bytes escritos)
+        """
+        compressor = create_compressor(
+            compression, compression_level, DEFAULT_COMPRESSION_THREADS
+        )
+        # La suma se calcula sobre lo que se escribe, sin volver a leer el archivo
+        hasher = create_hasher()
+        tracker = tracker or self._new_tracker()
+        
+        state = {"bytes_read": 0, "bytes_written": 0}
+        
+        with open(backup_file, 'wb') as f:
+            def write_chunk(chunk):
+                state["bytes_read"] += len(chunk)
+                if scanner:
+                    scanner.feed(chunk)
+                data = compressor.compress(chunk)
+                if data:
+                    f.write(data)
+                    hasher.update(data)
+                    state["bytes_written"] += len(data)
+                tracker.update(state["bytes_read"], state["bytes_written"])
+            
+            result = runner.run(
+                command, env, stdout_sink=write_chunk,
+                on_stderr_line=functools.partial(track_table_line, tracker)
+            )
+            
+            data = compressor.flush()
+            f.write(data)
+            hasher.update(data)
+            state["bytes_written"] += len(data)
+        
+        self._log_summary(state["bytes_read"], state["bytes_written"], result["duration"], compression)
+        result["bytes_written"] = state["bytes_written"]
+        result["checksum"] = hasher.hexdigest()
+        return result
+    
+    def _remove_partial_backup(self, backup_file):
+        """Elimina un backup incompleto"""
+        try:
+            if os.path.isdir(backup_file):
+                shutil.rmtree(backup_file)
+            elif os.path.exists(backup_file):
+                os.remove(backup_file)
+        except OSError as e:
+            self.log(f"Advertencia: no se pudo eliminar el backup incompleto {backup_file}: {e}")
+    
+    def cancel(self):
+        """
+        Cancela los procesos en curso de este gestor (y sus procesos hijos)
+        
+        La cancelación dura hasta que empieza el siguiente backup, de modo que
+        también detiene los procesos que aún no se habían lanzado.
+        """
+        with self._runners_lock:
+            self._cancel_event.set()
+            runners = list(self._active_runners)
+        for runner in runners:
+            runner.cancel()
+    
+    def _check_cancelled(self):
+        """Registra la cancelación entre fases; devuelve True si se canceló"""
+        if not self._cancel_event.is_set():
+            return False
+        self.log("✗ Backup cancelado")
+        return True
+    
+    def _new_runner(self):
+        """Crea un ProcessRunner registrado para poder cancelarlo (ya cancelado si se canceló el gestor)"""
+        runner = ProcessRunner()
+        with self._runners_lock:
+            if self._cancel_event.is_set():
+                runner.cancel()
+            self._active_runners.add(runner)
+        return runner
+    
+    def _release_runner(self, runner):
+        """Deja de seguir un ProcessRunner terminado"""
+        with self._runners_lock:
+            self._active_runners.discard(runner)
+    
+    def _log_progress(self, bytes_read, bytes_written, elapsed):
+        """Registra los bytes procesados y la velocidad de lectura"""
+        mb_read = bytes_read / (1024 * 1024)
+        mb_written = bytes_written / (1024 * 1024)
+        throughput = mb_read / elapsed if elapsed > 0 else 0.0
+        self.log(f"  {mb_read:.1f} MB leídos, {mb_written:.1f} MB escritos ({throughput:.1f} MB/s)")
+    
+    def _log_summary(self, bytes_read, bytes_written, elapsed, compression):
+        """Registra el resumen del backup: tamaño, ratio de compresión y velocidad"""
+        self._log_progress(bytes_read, bytes_written, elapsed)
+        if compression != "none" and bytes_written:
+            ratio = bytes_read / bytes_written
+            self.log(f"  Compresión {compression}: ratio {ratio:.2f}:1 en {elapsed:.1f} s")
+    
+    def get_restore_instructions(self, conn_info, final_backup, backup_format=DEFAULT_BACKUP_FORMAT,
+                                 compression=DEFAULT_COMPRESSION):
         """Genera instrucciones de restauración según el SO"""
         is_windows = self.system_info["is_windows"]
         is_macos = self.system_info["is_macos"]
@@ -132,20 +870,48 @@ class BackupManager:
         instructions.append("INSTRUCCIONES DE RESTAURACIÓN")
         instructions.append("=" * 50)
         
-        if is_windows:
-            instructions.append("\nPara PowerShell:")
-            instructions.append(f"Get-Content -Raw {final_backup} -Encoding UTF8 | docker exec -i nexus_db psql -U postgres -d NexusPlataformaDb")
-            instructions.append("\nO alternativamente, usando el script PowerShell:")
-            instructions.append(f".\\restore_database.ps1 -BackupFile {final_backup}")
+        # Los backups comprimidos se descomprimen al vuelo, sin dejar una copia descomprimida en disco
+        reader = None
+        if compression != "none" and backup_format != "directory":
+            reader = f"{'gzip' if compression == 'gzip' else 'zstd'} -dc {final_backup}"
+            instructions.append(f"\nEl backup está comprimido con {compression}; estos comandos lo descomprimen al vuelo.")
+        
+        if backup_format != "plain":
+            # Los formatos de archivo se restauran con pg_restore (admite -j)
+            pg_restore = (f"PGPASSWORD={conn_info['password']} pg_restore -h {conn_info['host']} -p {conn_info['port']} "
+                          f"-U {conn_info['username']} -d {conn_info['database']} -c --if-exists --no-owner")
+            if reader:
+                # Desde stdin, pg_restore no admite procesos paralelos
+                instructions.append("\nUsando pg_restore:")
+                instructions.append(f"{reader} | {pg_restore}")
+            else:
+                jobs = os.cpu_count() or 1
+                instructions.append("\nUsando pg_restore con procesos paralelos:")
+                instructions.append(f"{pg_restore} -j {jobs} {final_backup}")
+        elif is_windows:
+            if reader:
+                # cmd pasa los bytes sin convertirlos; la tubería de PowerShell los recodificaría
+                instructions.append("\nPara PowerShell (con gzip o zstd en el PATH):")
+                instructions.append(f'cmd /c "{reader} | docker exec -i nexus_db psql -U postgres -d NexusPlataformaDb"')
+            else:
+                instructions.append("\nPara PowerShell:")
+                instructions.append(f"Get-Content -Raw {final_backup} -Encoding UTF8 | docker exec -i nexus_db psql -U postgres -d NexusPlataformaDb")
+                instructions.append("\nO alternativamente, usando el script PowerShell:")
+                instructions.append(f".\\restore_database.ps1 -BackupFile {final_backup}")
         elif is_macos:
+            psql = (f"PGPASSWORD={conn_info['password']} psql -h {conn_info['host']} -p {conn_info['port']} "
+                    f"-U {conn_info['username']} -d {conn_info['database']}")
             instructions.append("\nOpción 1 - Si tienes PostgreSQL instalado localmente:")
-            instructions.append(f"PGPASSWORD={conn_info['password']} psql -h {conn_info['host']} -p {conn_info['port']} -U {conn_info['username']} -d {conn_info['database']} < {final_backup}")
+            instructions.append(f"{reader} | {psql}" if reader else f"{psql} < {final_backup}")
             instructions.append("\nOpción 2 - Usando Docker:")
-            instructions.append(f"cat {final_backup} | docker exec -i nexus_db psql -U postgres -d NexusPlataformaDb")
+            instructions.append(f"{reader or f'cat {final_backup}'} | docker exec -i nexus_db psql -U postgres -d NexusPlataformaDb")
             instructions.append("\nSi necesitas corregir problemas de codificación:")
-            instructions.append(f"iconv -f UTF-8 -t UTF-8 {final_backup} | docker exec -i nexus_db psql -U postgres -d NexusPlataformaDb")
+            if reader:
+                instructions.append(f"{reader} | iconv -f UTF-8 -t UTF-8 | docker exec -i nexus_db psql -U postgres -d NexusPlataformaDb")
+            else:
+                instructions.append(f"iconv -f UTF-8 -t UTF-8 {final_backup} | docker exec -i nexus_db psql -U postgres -d NexusPlataformaDb")
         else:
             instructions.append("\nPara restaurar en Linux/Unix:")
-            instructions.append(f"cat {final_backup} | docker exec -i nexus_db psql -U postgres -d NexusPlataformaDb")
+            instructions.append(f"{reader or f'cat {final_backup}'} | docker exec -i nexus_db psql -U postgres -d NexusPlataformaDb")
         
         return instructions
\ No newline at end of file
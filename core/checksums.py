@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from config.settings import CHECKSUM_ALGORITHM, BACKUP_MANIFEST_SUFFIX, VERIFY_WORKERS
+
+def manifest_path(backup_path):
+    """Ruta del manifiesto de un backup (archivo o directorio)"""
+    return os.path.normpath(backup_path) + BACKUP_MANIFEST_SUFFIX
+
+def is_manifest(name):
+    """Indica si un nombre de archivo corresponde a un manifiesto de backup"""
+    return name.endswith(BACKUP_MANIFEST_SUFFIX)
+
+def create_hasher(algorithm=CHECKSUM_ALGORITHM):
+    """Crea un objeto hashlib para calcular la suma de comprobación en streaming"""
+    return hashlib.new(algorithm)
+
+def hash_file(path, algorithm=CHECKSUM_ALGORITHM):
+    """
+    Calcula la suma de comprobación de un archivo
+
+    El archivo se proyecta en memoria (mmap) y se pasa entero a hashlib, que
+    libera el GIL mientras calcula: varios archivos se comprueban en paralelo
+    con hilos sin copiar su contenido.
+
+    Returns:
+        tuple: (tamaño en bytes, suma en hexadecimal)
+    """
+    hasher = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        # Un archivo vacío no se puede proyectar en memoria
+        if size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                hasher.update(mapped)
+    return size, hasher.hexdigest()
+
+def hash_directory(path, algorithm=CHECKSUM_ALGORITHM, workers=VERIFY_WORKERS):
+    """
+    Calcula la suma de comprobación de cada archivo de un backup en formato directorio
+
+    Returns:
+        dict: Ruta relativa -> size y checksum
+    """
+    relative_paths = [
+        os.path.relpath(os.path.join(root, name), path).replace(os.sep, "/")
+        for root, _, names in os.walk(path) for name in names
+    ]
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        results = executor.map(lambda relative: hash_file(os.path.join(path, relative), algorithm), relative_paths)
+        return {
+            relative: {"size": size, "checksum": checksum}
+            for relative, (size, checksum) in zip(relative_paths, results)
+        }
+
+def write_manifest(backup_path, files, metadata=None, algorithm=CHECKSUM_ALGORITHM):
+    """
+    Escribe el manifiesto de un backup terminado
+
+    Args:
+        backup_path (str): Ruta final del backup
+        files (dict): Ruta relativa -> size y checksum (el nombre del archivo para
+            un backup de un solo archivo)
+        metadata (dict): Datos adicionales (formato, versiones, duración...)
+        algorithm (str): Algoritmo de las sumas de comprobación
+
+    Returns:
+        str: Ruta del manifiesto
+    """
+    manifest = {
+        "backup": os.path.basename(os.path.normpath(backup_path)),
+        "type": "directory" if os.path.isdir(backup_path) else "file",
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "algorithm": algorithm,
+        "size": sum(info["size"] for info in files.values()),
+        "files": files
+    }
+    manifest.update(metadata or {})
+
+    path = manifest_path(backup_path)
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(temp_path, path)
+    return path
+
+def load_manifest(backup_path):
+    """
+    Carga el manifiesto de un backup, o devuelve None si no tiene
+
+    Raises:
+        ValueError: Si el manifiesto está truncado o no es JSON válido
+    """
+    try:
+        with open(manifest_path(backup_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        raise ValueError(f"manifiesto dañado {manifest_path(backup_path)}: {e}")
+
+def find_manifests(directory, recursive=True):
+    """
+    Busca los backups con manifiesto de un directorio
+
+    Returns:
+        list: Rutas de los backups (sin el sufijo del manifiesto)
+    """
+    backups = []
+    for root, dirs, names in os.walk(directory):
+        backups += [
+            os.path.join(root, name[:-len(BACKUP_MANIFEST_SUFFIX)])
+            for name in sorted(names) if is_manifest(name)
+        ]
+        if not recursive:
+            break
+    return backups
+
+def verify_backups(backup_paths, workers=VERIFY_WORKERS):
+    """
+    Comprueba los backups contra sus manifiestos
+
+    Los archivos de todos los backups se reparten entre los hilos, de modo que
+    un directorio con muchos backups se comprueba en paralelo.
+
+    Args:
+        backup_paths (list): Rutas de los backups
+        workers (int): Hilos de verificación (None = uno por núcleo)
+
+    Returns:
+        dict: Backup -> lista de problemas encontrados (vacía si es correcto,
+            con el error si el manifiesto está dañado), o None si el backup no
+            tiene manifiesto
+    """
+    results = {}
+    tasks = []
+    for backup_path in backup_paths:
+        try:
+            manifest = load_manifest(backup_path)
+            if manifest is None:
+                results[backup_path] = None
+                continue
+            algorithm = manifest["algorithm"]
+            # hashlib.new fallaría después, en los hilos; los shake_ necesitan además una longitud
+            if algorithm not in hashlib.algorithms_available or algorithm.startswith("shake_"):
+                raise ValueError(f"manifiesto dañado {manifest_path(backup_path)}: "
+                                 f"algoritmo desconocido {algorithm!r}")
+            base = backup_path if manifest["type"] == "directory" else os.path.dirname(os.path.abspath(backup_path))
+            backup_tasks = [
+                (backup_path, os.path.join(base, relative),
+                 {"size": info["size"], "checksum": info["checksum"]}, algorithm)
+                for relative, info in manifest["files"].items()
+            ]
+        except ValueError as e:
+            results[backup_path] = [str(e)]
+            continue
+        except (KeyError, TypeError, AttributeError) as e:
+            results[backup_path] = [f"manifiesto dañado {manifest_path(backup_path)}: formato inesperado ({e!r})"]
+            continue
+        results[backup_path] = []
+        tasks += backup_tasks
+
+    def check(task):
+        backup_path, path, expected, algorithm = task
+        try:
+            size, checksum = hash_file(path, algorithm)
+        except FileNotFoundError:
+            return backup_path, f"falta {path}"
+        except OSError as e:
+            return backup_path, f"no se pudo leer {path}: {e}"
+        if size != expected["size"]:
+            return backup_path, f"{path}: {size} bytes en lugar de {expected['size']}"
+        if checksum != expected["checksum"]:
+            return backup_path, f"{path}: la suma {algorithm} no coincide"
+        return backup_path, None
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        for backup_path, problem in executor.map(check, tasks):
+            if problem:
+                results[backup_path].append(problem)
+    return results
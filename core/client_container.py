@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import threading
+import time
+import uuid
+
+from core.pg_client import connection_args
+from config.settings import (
+    POSTGRES_DOCKER_IMAGE, DOCKER_CLIENT_IDLE_TIMEOUT, DOCKER_CLIENT_HEALTH_INTERVAL
+)
+
+class ClientContainer:
+    """
+    Contenedor cliente de PostgreSQL de larga duración
+
+    Mantiene en marcha un contenedor de POSTGRES_DOCKER_IMAGE y ejecuta las
+    herramientas cliente dentro de él con docker exec, evitando el coste de
+    crear, arrancar y eliminar un contenedor en cada backup. El contenedor se
+    detiene automáticamente tras un periodo de inactividad.
+    """
+
+    def __init__(self, volume_dir=None, idle_timeout=DOCKER_CLIENT_IDLE_TIMEOUT, logger_callback=None):
+        """
+        Inicializa el contenedor cliente (no lo arranca)
+
+        Args:
+            volume_dir (str): Directorio local montado en /backup (por defecto, el actual)
+            idle_timeout (int): Segundos de inactividad antes de detenerlo
+            logger_callback (callable): Función para registrar mensajes
+        """
+        # Un proceso puede tener varios (la interfaz y el planificador, p. ej.)
+        self.name = f"pgbackup_client_{os.getpid()}_{uuid.uuid4().hex[:8]}"
+        self.volume_dir = os.path.abspath(volume_dir or os.getcwd())
+        self.idle_timeout = idle_timeout
+        self.logger = logger_callback if logger_callback else print
+        self.start_duration = None
+
+        self._lock = threading.Lock()
+        self._running = False
+        self._active_jobs = 0
+        self._last_health_check = 0.0
+        self._idle_timer = None
+
+    def log(self, message):
+        """Registra un mensaje usando el callback configurado"""
+        if self.logger:
+            self.logger(message)
+
+    def ensure_running(self):
+        """
+        Arranca el contenedor si no está en marcha o no responde
+
+        Returns:
+            bool: True si el contenedor está listo para ejecutar comandos
+        """
+        with self._lock:
+            self._cancel_idle_timer()
+
+            if self._running and self._is_healthy():
+                return True
+
+            if self._running:
+                self.log("Advertencia: el contenedor cliente no responde, reiniciándolo...")
+                self._remove()
+
+            return self._start()
+
+    def build_command(self, conn_info, tool, args=None, interactive=False):
+        """
+        Construye el comando docker exec para una herramienta cliente
+
+        Args:
+            conn_info (dict): Componentes de la URL de conexión
+            tool (str): Herramienta a ejecutar (pg_dump, psql...)
+            args (list): Argumentos adicionales para la herramienta
+            interactive (bool): Mantener stdin abierto (-i)
+
+        Returns:
+            list: Comando listo para subprocess
+        """
+        command = ["docker", "exec"]
+        if interactive:
+            command.append("-i")
+        command += ["-e", f"PGPASSWORD={conn_info['password']}", self.name, tool]
+        return command + connection_args(conn_info) + (args or [])
+
+    def container_path(self, path):
+        """Devuelve la ruta en el contenedor de un archivo del directorio montado, o None"""
+        path = os.path.abspath(path)
+        if os.path.dirname(path) != self.volume_dir:
+            return None
+        return f"/backup/{os.path.basename(path)}"
+
+    def job_started(self):
+        """Marca el inicio de un trabajo (el contenedor no se detiene mientras dure)"""
+        with self._lock:
+            self._active_jobs += 1
+            self._cancel_idle_timer()
+
+    def job_finished(self):
+        """Marca el fin de un trabajo y programa la parada por inactividad"""
+        with self._lock:
+            self._active_jobs = max(0, self._active_jobs - 1)
+            if self._active_jobs == 0 and self._running:
+                self._idle_timer = threading.Timer(self.idle_timeout, self._on_idle)
+                self._idle_timer.daemon = True
+                self._idle_timer.start()
+
+    def stop(self):
+        """Detiene y elimina el contenedor"""
+        with self._lock:
+            self._cancel_idle_timer()
+            if self._running:
+                self._remove()
+
+    def _start(self):
+        """Arranca el contenedor en segundo plano; debe llamarse con el lock tomado"""
+        command = [
+            "docker", "run", "-d", "--rm",
+            "--name", self.name,
+            "-v", f"{self.volume_dir}:/backup"
+        ]
+        # Evitar que los archivos generados en el volumen queden a nombre de root
+        if hasattr(os, "getuid"):
+            command += ["--user", f"{os.getuid()}:{os.getgid()}"]
+        command += ["--entrypoint", "sleep", POSTGRES_DOCKER_IMAGE, "infinity"]
+
+        start_time = time.monotonic()
+        try:
+            process = subprocess.run(command, capture_output=True, text=True)
+        except OSError as e:
+            self.log(f"✗ Error al arrancar el contenedor cliente: {e}")
+            return False
+
+        if process.returncode != 0:
+            self.log(f"✗ Error al arrancar el contenedor cliente: {process.stderr.strip()}")
+            return False
+
+        self.start_duration = time.monotonic() - start_time
+        self._running = True
+        self._last_health_check = time.monotonic()
+        self.log(f"✓ Contenedor cliente {self.name} iniciado en {self.start_duration:.2f} s")
+        return True
+
+    def _is_healthy(self):
+        """Comprueba que el contenedor responde; se limita a una comprobación por intervalo"""
+        if time.monotonic() - self._last_health_check < DOCKER_CLIENT_HEALTH_INTERVAL:
+            return True
+
+        try:
+            process = subprocess.run(
+                ["docker", "exec", self.name, "pg_dump", "--version"],
+                capture_output=True,
+                timeout=30
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return False
+
+        self._last_health_check = time.monotonic()
+        return process.returncode == 0
+
+    def _remove(self):
+        """Elimina el contenedor; debe llamarse con el lock tomado"""
+        subprocess.run(["docker", "rm", "-f", self.name], capture_output=True)
+        self._running = False
+        self.log(f"Contenedor cliente {self.name} detenido")
+
+    def _on_idle(self):
+        """Detiene el contenedor cuando vence el tiempo de inactividad"""
+        with self._lock:
+            self._idle_timer = None
+            if self._running and self._active_jobs == 0:
+                self._remove()
+
+    def _cancel_idle_timer(self):
+        """Cancela la parada programada por inactividad"""
+        if self._idle_timer:
+            self._idle_timer.cancel()
+            self._idle_timer = None
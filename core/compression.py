@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import gzip
+import os
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zstd es opcional
+    zstandard = None
+
+from config.settings import COMPRESSION_LEVELS
+
+# Extensión añadida al nombre del backup según el método de compresión
+COMPRESSION_EXTENSIONS = {
+    "none": "",
+    "gzip": ".gz",
+    "zstd": ".zst"
+}
+
+# Números mágicos para detectar backups comprimidos
+COMPRESSION_MAGIC = {
+    "gzip": b"\x1f\x8b",
+    "zstd": b"\x28\xb5\x2f\xfd"
+}
+
+class _NoCompressor:
+    """Compresor nulo: devuelve los datos sin modificar"""
+
+    def compress(self, data):
+        return data
+
+    def flush(self):
+        return b""
+
+def is_compression_available(method):
+    """Indica si el método de compresión puede usarse en este sistema"""
+    if method == "zstd":
+        return zstandard is not None
+    return method in COMPRESSION_EXTENSIONS
+
+def create_compressor(method, level=None, threads=None):
+    """
+    Crea un compresor en streaming con la interfaz compress()/flush()
+
+    Args:
+        method (str): "none", "gzip" o "zstd"
+        level (int): Nivel de compresión (por defecto, el de COMPRESSION_LEVELS)
+        threads (int): Hilos de trabajo para zstd (None o 0 = uno por núcleo)
+
+    Returns:
+        object: Compresor con los métodos compress(bytes) y flush()
+    """
+    if method == "none":
+        return _NoCompressor()
+
+    if level is None:
+        level = COMPRESSION_LEVELS[method]
+
+    if method == "gzip":
+        # wbits=31 genera cabecera y cola gzip, compatibles con gunzip
+        return zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    if method == "zstd":
+        if zstandard is None:
+            raise RuntimeError("El módulo 'zstandard' no está instalado (pip install zstandard)")
+        threads = threads or os.cpu_count() or 1
+        compressor = zstandard.ZstdCompressor(level=level, threads=threads)
+        return compressor.compressobj()
+
+    raise ValueError(f"Método de compresión desconocido: {method}")
+
+def detect_compression(path):
+    """
+    Detecta la compresión de un archivo por sus bytes iniciales
+
+    Args:
+        path (str): Ruta al archivo
+
+    Returns:
+        str: "gzip", "zstd" o "none"
+    """
+    with open(path, 'rb') as f:
+        header = f.read(4)
+
+    for method, magic in COMPRESSION_MAGIC.items():
+        if header.startswith(magic):
+            return method
+    return "none"
+
+def open_decompressed(path, compression=None):
+    """
+    Abre un archivo y devuelve un flujo binario con su contenido descomprimido
+
+    La descompresión se hace bajo demanda a medida que se lee, por lo que el uso
+    de memoria no depende del tamaño del archivo.
+
+    Args:
+        path (str): Ruta al archivo
+        compression (str): Compresión del archivo (None = detectarla)
+
+    Returns:
+        file: Objeto de archivo binario de solo lectura
+    """
+    if compression is None:
+        compression = detect_compression(path)
+
+    return wrap_decompressed(open(path, 'rb'), compression)
+
+def wrap_decompressed(fileobj, compression):
+    """
+    Envuelve un archivo binario abierto con un flujo que lo descomprime
+
+    Cerrar el flujo devuelto cierra también el archivo original. Mientras se lee,
+    fileobj.tell() indica cuántos bytes comprimidos se han consumido.
+
+    Args:
+        fileobj (file): Archivo binario abierto para lectura
+        compression (str): "gzip", "zstd" o "none"
+
+    Returns:
+        file: Objeto de archivo binario de solo lectura
+    """
+    if compression == "gzip":
+        # GzipFile admite archivos con varios miembros concatenados
+        return _ClosingGzipFile(fileobj)
+
+    if compression == "zstd":
+        if zstandard is None:
+            fileobj.close()
+            raise RuntimeError("El módulo 'zstandard' no está instalado (pip install zstandard)")
+        return zstandard.ZstdDecompressor().stream_reader(fileobj, read_across_frames=True, closefd=True)
+
+    return fileobj
+
+class _ClosingGzipFile(gzip.GzipFile):
+    """GzipFile que cierra también el archivo subyacente"""
+
+    def __init__(self, fileobj):
+        super().__init__(fileobj=fileobj, mode='rb')
+        self._source = fileobj
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._source.close()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from datetime import datetime, timedelta
+
+# Límites de cada campo: minuto, hora, día del mes, mes y día de la semana
+CRON_FIELDS = [
+    ("minuto", 0, 59),
+    ("hora", 0, 23),
+    ("día del mes", 1, 31),
+    ("mes", 1, 12),
+    ("día de la semana", 0, 7)
+]
+
+CRON_MONTH_NAMES = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12
+}
+
+CRON_DAY_NAMES = {"sun": 0, "mon": 1, "tue": 2, "wed": 3, "thu": 4, "fri": 5, "sat": 6}
+
+CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *"
+}
+
+class CronExpression:
+    """
+    Expresión cron de cinco campos (minuto hora día-del-mes mes día-de-la-semana)
+
+    Admite *, listas (1,15), rangos (1-5), pasos (*/15, 8-18/2), nombres de mes
+    y de día en inglés (jan, mon) y los alias @hourly, @daily, @weekly,
+    @monthly y @yearly. Como en cron, si se restringen el día del mes y el de
+    la semana, basta con que se cumpla uno de los dos; si uno de ellos empieza
+    por * (también */n), deben cumplirse los dos.
+    """
+
+    def __init__(self, expression):
+        """
+        Analiza una expresión cron
+
+        Args:
+            expression (str): Expresión cron
+
+        Raises:
+            ValueError: Si la expresión no es válida
+        """
+        self.expression = expression.strip()
+        text = CRON_ALIASES.get(self.expression.lower(), self.expression)
+
+        parts = text.split()
+        if len(parts) != 5:
+            raise ValueError(f"La expresión cron debe tener 5 campos: '{expression}'")
+
+        values = []
+        for part, (name, low, high) in zip(parts, CRON_FIELDS):
+            names = CRON_MONTH_NAMES if name == "mes" else CRON_DAY_NAMES if name == "día de la semana" else {}
+            values.append(self._parse_field(part.lower(), name, low, high, names))
+
+        self.minutes, self.hours, self.days, self.months, weekdays = values
+        # El 7 también representa el domingo
+        self.weekdays = {day % 7 for day in weekdays}
+        # Como en cron, los días se combinan con "o" solo si ningún campo de día
+        # empieza por * (*/2 en el día del mes sigue restringiéndolo)
+        self.any_day = parts[2].startswith("*")
+        self.any_weekday = parts[4].startswith("*")
+
+    def _parse_field(self, field, name, low, high, names):
+        """Convierte un campo en el conjunto de valores que representa"""
+        values = set()
+        for item in field.split(","):
+            step = 1
+            if "/" in item:
+                item, step_text = item.split("/", 1)
+                step = self._parse_value(step_text, name, 1, high, {})
+
+            if item == "*":
+                start, end = low, high
+            elif "-" in item:
+                start_text, end_text = item.split("-", 1)
+                start = self._parse_value(start_text, name, low, high, names)
+                end = self._parse_value(end_text, name, low, high, names)
+            else:
+                start = self._parse_value(item, name, low, high, names)
+                # "5/10" equivale a "5-máximo/10"
+                end = high if step > 1 else start
+
+            if start > end:
+                raise ValueError(f"Rango inválido en el campo {name}: '{field}'")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _parse_value(self, text, name, low, high, names):
+        """Convierte un valor numérico o un nombre, comprobando sus límites"""
+        if text in names:
+            return names[text]
+        if not text.isdigit():
+            raise ValueError(f"Valor inválido en el campo {name}: '{text}'")
+        value = int(text)
+        if not low <= value <= high:
+            raise ValueError(f"Valor fuera de rango en el campo {name}: {value} ({low}-{high})")
+        return value
+
+    def matches_day(self, moment):
+        """Indica si la fecha cumple las condiciones de día del mes y de la semana"""
+        in_days = moment.day in self.days
+        # datetime.weekday(): lunes = 0; en cron, domingo = 0
+        in_weekdays = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def matches(self, moment):
+        """Indica si la expresión se cumple en el minuto indicado"""
+        return (
+            moment.minute in self.minutes
+            and moment.hour in self.hours
+            and moment.month in self.months
+            and self.matches_day(moment)
+        )
+
+    def next_after(self, moment):
+        """
+        Calcula la siguiente ejecución posterior a un instante
+
+        Los campos que no se cumplen se saltan completos (meses, días, horas), de
+        modo que el cálculo no recorre minuto a minuto.
+
+        Args:
+            moment (datetime): Instante de referencia
+
+        Returns:
+            datetime: Siguiente minuto en que se cumple la expresión
+
+        Raises:
+            ValueError: Si la expresión no se cumple nunca (p. ej. 30 de febrero)
+        """
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=5 * 366)
+
+        while candidate < limit:
+            if candidate.month not in self.months:
+                year = candidate.year + (1 if candidate.month == 12 else 0)
+                month = 1 if candidate.month == 12 else candidate.month + 1
+                candidate = datetime(year, month, 1)
+                continue
+            if not self.matches_day(candidate):
+                candidate = datetime(candidate.year, candidate.month, candidate.day) + timedelta(days=1)
+                continue
+            if candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+                continue
+            if candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+                continue
+            return candidate
+
+        raise ValueError(f"La expresión cron no se cumple nunca: '{self.expression}'")
+
+    def __repr__(self):
+        return f"CronExpression('{self.expression}')"
@@ -0,0 +1,397 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from config.settings import (
+    DEDUP_MIN_CHUNK, DEDUP_MAX_CHUNK, DEDUP_BOUNDARY_BITS, DEDUP_COMPRESSION_LEVEL, DEDUP_WORKERS,
+    PARTIAL_SUFFIX
+)
+
+class DedupRepository:
+    """
+    Repositorio de backups deduplicado por contenido
+
+    Los backups se dividen en fragmentos definidos por su contenido, de modo que
+    un cambio en una parte del volcado solo altera los fragmentos cercanos. Cada
+    fragmento se guarda una sola vez, comprimido con zlib, en chunks/ con su
+    sha256 como nombre. Cada backup se describe con un manifiesto JSON en
+    manifests/ que enumera sus fragmentos en orden.
+    """
+
+    def __init__(self, path, logger_callback=None):
+        """
+        Abre (o crea) un repositorio
+
+        Args:
+            path (str): Directorio del repositorio
+            logger_callback (callable): Función para registrar mensajes
+        """
+        self.path = path
+        self.chunks_dir = os.path.join(path, "chunks")
+        self.manifests_dir = os.path.join(path, "manifests")
+        self.logger = logger_callback if logger_callback else print
+
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        os.makedirs(self.manifests_dir, exist_ok=True)
+
+    def log(self, message):
+        """Registra un mensaje usando el callback configurado"""
+        if self.logger:
+            self.logger(message)
+
+    def create_writer(self, name, metadata=None):
+        """
+        Crea un escritor para un nuevo backup
+
+        Args:
+            name (str): Nombre del backup (p. ej. el de create_backup_filename)
+            metadata (dict): Datos adicionales para el manifiesto (formato, base de datos...)
+
+        Returns:
+            DedupWriter: Escritor con write(), commit() y abort()
+        """
+        if os.path.exists(self._manifest_path(name)):
+            raise FileExistsError(f"Ya existe un backup con el nombre {name}")
+        return DedupWriter(self, name, metadata or {})
+
+    def list_backups(self):
+        """
+        Lista los backups del repositorio
+
+        Returns:
+            list: Manifiestos sin la lista de fragmentos, del más antiguo al más reciente
+        """
+        backups = []
+        with os.scandir(self.manifests_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".json"):
+                    continue
+                manifest = self.load_manifest(entry.name[:-len(".json")])
+                manifest.pop("chunks", None)
+                backups.append(manifest)
+        return sorted(backups, key=lambda manifest: manifest["created"])
+
+    def load_manifest(self, name):
+        """Carga el manifiesto de un backup"""
+        with open(self._manifest_path(name), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def open_backup(self, name, verify=True):
+        """
+        Abre un backup para leerlo en streaming
+
+        Args:
+            name (str): Nombre del backup
+            verify (bool): Comprobar el sha256 de cada fragmento al leerlo
+
+        Returns:
+            DedupReader: Flujo binario de solo lectura con el backup reconstruido
+        """
+        return DedupReader(self, self.load_manifest(name), verify)
+
+    def verify(self, name):
+        """
+        Comprueba que todos los fragmentos de un backup existen y son correctos
+
+        Returns:
+            bool: True si el backup se puede reconstruir completo
+        """
+        try:
+            manifest = self.load_manifest(name)
+            with DedupReader(self, manifest, verify=True) as reader:
+                while reader.read(DEDUP_MAX_CHUNK):
+                    pass
+        except (OSError, ValueError, zlib.error) as e:
+            self.log(f"✗ Backup {name} dañado: {e}")
+            return False
+
+        if reader.tell() != manifest["size"]:
+            self.log(f"✗ Backup {name} dañado: tamaño {reader.tell()} en lugar de {manifest['size']}")
+            return False
+
+        self.log(f"✓ Backup {name} válido ({len(manifest['chunks'])} fragmentos)")
+        return True
+
+    def collect_garbage(self, dry_run=False):
+        """
+        Elimina los fragmentos que no usa ningún manifiesto
+
+        Debe ejecutarse sin backups en curso, ya que sus fragmentos aún no
+        figuran en ningún manifiesto.
+
+        Args:
+            dry_run (bool): Solo contar lo que se eliminaría
+
+        Returns:
+            tuple: (fragmentos eliminados, bytes liberados)
+        """
+        referenced = set()
+        with os.scandir(self.manifests_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json"):
+                    manifest = self.load_manifest(entry.name[:-len(".json")])
+                    referenced.update(chunk_id for chunk_id, _ in manifest["chunks"])
+
+        removed = 0
+        freed = 0
+        for prefix in os.scandir(self.chunks_dir):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                if entry.name in referenced:
+                    continue
+                freed += entry.stat().st_size
+                removed += 1
+                if not dry_run:
+                    os.remove(entry.path)
+
+        action = "se eliminarían" if dry_run else "eliminados"
+        self.log(f"Fragmentos sin usar {action}: {removed} ({freed / (1024 * 1024):.1f} MB)")
+        return removed, freed
+
+    def has_chunk(self, chunk_id):
+        """Indica si el repositorio ya contiene un fragmento"""
+        return os.path.exists(self._chunk_path(chunk_id))
+
+    def write_chunk(self, chunk_id, data):
+        """
+        Comprime y guarda un fragmento
+
+        Args:
+            chunk_id (str): sha256 del fragmento en hexadecimal
+            data (bytes): Contenido del fragmento
+
+        Returns:
+            int: Bytes escritos en disco
+        """
+        path = self._chunk_path(chunk_id)
+        compressed = zlib.compress(data, DEDUP_COMPRESSION_LEVEL)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}{PARTIAL_SUFFIX}"
+        with open(temp_path, 'wb') as f:
+            f.write(compressed)
+        # El renombrado es atómico: un fragmento visible siempre está completo
+        os.replace(temp_path, path)
+        return len(compressed)
+
+    def read_chunk(self, chunk_id, verify=True):
+        """Lee y descomprime un fragmento, comprobando opcionalmente su sha256"""
+        with open(self._chunk_path(chunk_id), 'rb') as f:
+            data = zlib.decompress(f.read())
+        if verify and hashlib.sha256(data).hexdigest() != chunk_id:
+            raise ValueError(f"El fragmento {chunk_id} no coincide con su sha256")
+        return data
+
+    def write_manifest(self, name, manifest):
+        """Escribe un manifiesto de forma atómica"""
+        path = self._manifest_path(name)
+        temp_path = path + PARTIAL_SUFFIX
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, path)
+
+    def _chunk_path(self, chunk_id):
+        """Ruta de un fragmento; se reparten en subdirectorios por sus dos primeros caracteres"""
+        return os.path.join(self.chunks_dir, chunk_id[:2], chunk_id)
+
+    def _manifest_path(self, name):
+        """Ruta del manifiesto de un backup"""
+        return os.path.join(self.manifests_dir, f"{name}.json")
+
+class DedupWriter:
+    """
+    Divide un flujo en fragmentos definidos por su contenido y los guarda
+
+    Los cortes se hacen al final de una línea cuyo crc32 tiene a cero sus
+    DEDUP_BOUNDARY_BITS bits bajos, una vez superado DEDUP_MIN_CHUNK. Como la
+    decisión depende solo de la línea, insertar o borrar filas desplaza los
+    cortes junto con el contenido y el resto de fragmentos no cambia. Si no
+    aparece un corte antes de DEDUP_MAX_CHUNK, se corta en ese tamaño.
+
+    Los fragmentos nuevos se comprimen y escriben en varios hilos (zlib libera
+    el GIL), con un número acotado de fragmentos pendientes en memoria.
+    """
+
+    def __init__(self, repository, name, metadata):
+        self.repository = repository
+        self.name = name
+        self.metadata = metadata
+
+        self._buffer = bytearray()
+        self._scan_from = 0
+        self._mask = (1 << DEDUP_BOUNDARY_BITS) - 1
+        self._chunks = []
+        self._known = set()
+        self._start_time = time.monotonic()
+        self.stats = {"bytes_in": 0, "chunks": 0, "new_chunks": 0, "new_bytes": 0, "bytes_stored": 0}
+
+        workers = DEDUP_WORKERS or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._pending = collections.deque()
+        self._max_pending = workers * 2
+
+    def write(self, data):
+        """Añade datos al backup; guarda los fragmentos completos"""
+        self._buffer += data
+        self.stats["bytes_in"] += len(data)
+
+        while True:
+            cut = self._find_boundary()
+            if cut is None:
+                break
+            self._store(bytes(self._buffer[:cut]))
+            del self._buffer[:cut]
+            self._scan_from = 0
+
+    def commit(self):
+        """
+        Guarda el último fragmento y escribe el manifiesto
+
+        Returns:
+            dict: Estadísticas del backup (ver _build_stats)
+        """
+        if self._buffer:
+            self._store(bytes(self._buffer))
+            self._buffer = bytearray()
+
+        # El manifiesto solo se escribe cuando todos sus fragmentos están en disco
+        try:
+            while self._pending:
+                self._collect()
+        finally:
+            self._executor.shutdown()
+
+        stats = self._build_stats()
+        manifest = dict(self.metadata)
+        manifest.update({
+            "name": self.name,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "size": self.stats["bytes_in"],
+            "stats": stats,
+            "chunks": self._chunks
+        })
+        self.repository.write_manifest(self.name, manifest)
+        return stats
+
+    def abort(self):
+        """Descarta el backup; sus fragmentos nuevos quedan para collect_garbage"""
+        self._executor.shutdown()
+        self._pending.clear()
+        self._buffer = bytearray()
+        self._chunks = []
+
+    def _find_boundary(self):
+        """Busca el siguiente corte en el búfer; devuelve su posición o None"""
+        buffer = self._buffer
+        # Antes del tamaño mínimo no puede haber corte: se salta sin examinar líneas
+        position = max(self._scan_from, DEDUP_MIN_CHUNK)
+        limit = min(len(buffer), DEDUP_MAX_CHUNK)
+
+        while position < limit:
+            end = buffer.find(b"\n", position, limit)
+            if end < 0:
+                break
+            line_start = buffer.rfind(b"\n", 0, end) + 1
+            if zlib.crc32(buffer[line_start:end]) & self._mask == 0:
+                return end + 1
+            position = end + 1
+
+        if len(buffer) >= DEDUP_MAX_CHUNK:
+            return DEDUP_MAX_CHUNK
+
+        # Sin corte por ahora: la próxima búsqueda continúa donde terminó esta
+        self._scan_from = position
+        return None
+
+    def _store(self, data):
+        """Añade un fragmento al manifiesto y lo guarda si es nuevo"""
+        chunk_id = hashlib.sha256(data).hexdigest()
+        self._chunks.append([chunk_id, len(data)])
+        self.stats["chunks"] += 1
+
+        if chunk_id in self._known or self.repository.has_chunk(chunk_id):
+            return
+        self._known.add(chunk_id)
+        self.stats["new_chunks"] += 1
+        self.stats["new_bytes"] += len(data)
+
+        if len(self._pending) >= self._max_pending:
+            self._collect()
+        self._pending.append(self._executor.submit(self.repository.write_chunk, chunk_id, data))
+
+    def _collect(self):
+        """Espera al fragmento pendiente más antiguo (propaga sus errores)"""
+        self.stats["bytes_stored"] += self._pending.popleft().result()
+
+    def _build_stats(self):
+        """Estadísticas de deduplicación y velocidad del backup"""
+        elapsed = time.monotonic() - self._start_time
+        bytes_in = self.stats["bytes_in"]
+        stats = dict(self.stats)
+        stats["duration"] = elapsed
+        stats["dedup_ratio"] = bytes_in / self.stats["new_bytes"] if self.stats["new_bytes"] else None
+        stats["storage_ratio"] = bytes_in / self.stats["bytes_stored"] if self.stats["bytes_stored"] else None
+        stats["throughput"] = bytes_in / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+        return stats
+
+class DedupReader:
+    """Flujo binario que reconstruye un backup a partir de sus fragmentos"""
+
+    def __init__(self, repository, manifest, verify=True):
+        self.repository = repository
+        self.manifest = manifest
+        self.verify = verify
+        self.size = manifest["size"]
+
+        self._chunk_index = 0
+        self._current = b""
+        self._offset = 0
+        self._position = 0
+
+    def read(self, size=-1):
+        """Lee hasta size bytes (todos si size es negativo)"""
+        parts = []
+        remaining = size if size is not None and size >= 0 else None
+
+        while remaining is None or remaining > 0:
+            if self._offset >= len(self._current):
+                if self._chunk_index >= len(self.manifest["chunks"]):
+                    break
+                chunk_id, _ = self.manifest["chunks"][self._chunk_index]
+                self._current = self.repository.read_chunk(chunk_id, self.verify)
+                self._chunk_index += 1
+                self._offset = 0
+                continue
+
+            end = len(self._current) if remaining is None else min(len(self._current), self._offset + remaining)
+            part = self._current[self._offset:end]
+            parts.append(part)
+            self._offset = end
+            if remaining is not None:
+                remaining -= len(part)
+
+        data = b"".join(parts)
+        self._position += len(data)
+        return data
+
+    def tell(self):
+        """Bytes del backup leídos hasta ahora"""
+        return self._position
+
+    def close(self):
+        self._current = b""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
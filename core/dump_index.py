@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Índice de los objetos de un backup plain sin comprimir: posición y longitud
+# en bytes de cada objeto y de cada bloque COPY (ver core/sql_splitter.py). Se
+# guarda junto al backup (<backup>.index.json) y permite extraer o consultar
+# una tabla leyendo solo sus bytes, sin recorrer el resto del archivo.
+
+import json
+import os
+from datetime import datetime
+
+from core.sql_splitter import scan_plain_dump, entry_prefix, RangeReader, SECTION_PRE_DATA
+from config.settings import PLAIN_INDEX_SUFFIX, STREAM_CHUNK_SIZE
+
+# Versión del formato del índice (2: secciones de los objetos grandes y sus comentarios)
+INDEX_VERSION = 2
+
+# Inicio de la cabecera de un objeto, para comprobar que el índice corresponde al backup
+ENTRY_MARKER = b"--\n-- "
+
+def index_path(backup_path):
+    """Ruta del índice de un backup plain"""
+    return os.path.normpath(backup_path) + PLAIN_INDEX_SUFFIX
+
+def is_index(name):
+    """Indica si un nombre de archivo corresponde a un índice de backup"""
+    return name.endswith(PLAIN_INDEX_SUFFIX)
+
+def write_index(backup_path, dump):
+    """
+    Guarda el índice de un backup plain
+
+    Args:
+        backup_path (str): Ruta final del backup
+        dump (dict): Resultado de scan_plain_dump o PlainDumpScanner.finish
+
+    Returns:
+        str: Ruta del índice
+    """
+    index = {
+        "version": INDEX_VERSION,
+        "backup": os.path.basename(os.path.normpath(backup_path)),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "size": dump["size"],
+        "complete": dump["complete"],
+        "serial_only": dump["serial_only"],
+        "preamble": dump["preamble"].decode('utf-8', errors='replace'),
+        "data_offset": dump["data_offset"],
+        "post_data_offset": dump["post_data_offset"],
+        "end_offset": dump["end_offset"],
+        "entries": dump["entries"]
+    }
+
+    path = index_path(backup_path)
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+    return path
+
+def build_index(backup_path):
+    """
+    Analiza un backup plain sin comprimir y guarda su índice
+
+    Returns:
+        tuple: (ruta del índice, índice como en load_index)
+    """
+    with open(backup_path, 'rb') as f:
+        dump = scan_plain_dump(f, STREAM_CHUNK_SIZE)
+    return write_index(backup_path, dump), dump
+
+def load_index(backup_path):
+    """
+    Carga el índice de un backup plain
+
+    El índice se descarta si el backup cambió de tamaño desde que se creó o si
+    el primer y el último objeto no están donde indica.
+
+    Returns:
+        dict: Índice con el mismo formato que scan_plain_dump, o None si el
+            backup no tiene índice o no corresponde al archivo actual
+    """
+    try:
+        with open(index_path(backup_path), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get("version") != INDEX_VERSION or index.get("size") != os.path.getsize(backup_path):
+            return None
+        with open(backup_path, 'rb') as f:
+            for entry in index["entries"][:1] + index["entries"][-1:]:
+                f.seek(entry["offset"])
+                if f.read(len(ENTRY_MARKER)) != ENTRY_MARKER:
+                    return None
+    except (OSError, ValueError, KeyError):
+        return None
+    index["preamble"] = index["preamble"].encode('utf-8')
+    return index
+
+def _unquote(name):
+    """Nombre sin las comillas de los identificadores de PostgreSQL"""
+    return name.replace('"', '') if name else name
+
+def find_table(index, table):
+    """
+    Busca los objetos de una tabla en el índice
+
+    Args:
+        index (dict): Índice del backup
+        table (str): Tabla como esquema.tabla o solo tabla (de cualquier esquema)
+
+    Returns:
+        list: Definición, datos, índices, restricciones y demás objetos de la
+            tabla, en el orden del backup
+    """
+    table = _unquote(table)
+    names = set()
+    for entry in index["entries"]:
+        if entry["type"] in ("TABLE", "TABLE DATA"):
+            qualified = f"{entry['schema']}.{entry['name']}"
+            if table in (qualified, entry["name"]):
+                names.add(qualified)
+
+    def belongs(entry):
+        qualified = f"{entry['schema']}.{entry['name']}"
+        if entry["type"] in ("TABLE", "TABLE DATA"):
+            return qualified in names
+        if entry["section"] == SECTION_PRE_DATA:
+            return False
+        # pg_dump nombra los disparadores, reglas, políticas y restricciones
+        # como "tabla objeto"
+        return _unquote(entry["table"]) in names or qualified.split(" ", 1)[0] in names
+
+    return [entry for entry in index["entries"] if belongs(entry)]
+
+def extract_entries(backup_path, index, entries, output):
+    """
+    Escribe objetos del backup como un script SQL que psql puede ejecutar
+
+    El script empieza con las sentencias SET del backup; cada objeto se copia
+    con las opciones de sesión vigentes en su posición.
+
+    Args:
+        backup_path (str): Ruta al backup
+        index (dict): Índice del backup
+        entries (list): Objetos a extraer (ver find_table)
+        output (file): Destino abierto en binario
+
+    Returns:
+        int: Bytes escritos
+    """
+    parts = [index["preamble"]]
+    for entry in entries:
+        parts += [entry_prefix(index, entry)[len(index["preamble"]):], (entry["offset"], entry["length"])]
+
+    copied = 0
+    source = RangeReader(backup_path, parts)
+    try:
+        while True:
+            data = source.read(STREAM_CHUNK_SIZE)
+            if not data:
+                break
+            output.write(data)
+            copied += len(data)
+    finally:
+        source.close()
+    return copied
+
+def preview_rows(backup_path, entry, limit):
+    """
+    Lee las primeras filas del bloque COPY de una tabla
+
+    Args:
+        backup_path (str): Ruta al backup
+        entry (dict): Objeto TABLE DATA del índice
+        limit (int): Filas a leer
+
+    Returns:
+        tuple: (sentencia COPY, lista de filas en texto de COPY)
+    """
+    if entry.get("copy_offset") is None:
+        return None, []
+
+    rows = []
+    with open(backup_path, 'rb') as f:
+        f.seek(entry["copy_offset"])
+        statement = f.readline().rstrip(b"\r\n").decode('utf-8', errors='replace')
+        while len(rows) < limit:
+            line = f.readline()
+            if not line or line.rstrip(b"\r\n") == b"\\.":
+                break
+            rows.append(line.rstrip(b"\r\n").decode('utf-8', errors='replace'))
+    return statement, rows
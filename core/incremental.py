@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+from datetime import datetime
+
+from core.pg_client import run_query
+from config.settings import INCREMENTAL_STATE_SUFFIX, INCREMENTAL_FULL_EVERY
+
+# Huella de cada tabla: contadores de filas insertadas, actualizadas y borradas,
+# tamaño, archivo físico (cambia con TRUNCATE, VACUUM FULL o CLUSTER) y un hash
+# de las columnas (nombre, número y tipo), que cambia al añadir, borrar,
+# renombrar o cambiar de tipo una columna aunque no se reescriba la tabla. La
+# fecha de reinicio de las estadísticas de la base de datos forma parte de la
+# huella, de modo que un reinicio de los contadores fuerza el volcado de todas
+# las tablas.
+TABLE_FINGERPRINT_QUERY = (
+    "SELECT s.schemaname, s.relname, concat_ws(':', s.n_tup_ins, s.n_tup_upd, s.n_tup_del, "
+    "pg_relation_size(s.relid), pg_relation_filenode(s.relid), d.stats_reset, "
+    "(SELECT md5(string_agg(a.attnum || ' ' || a.attname || ' ' || "
+    "format_type(a.atttypid, a.atttypmod), ',' ORDER BY a.attnum)) "
+    "FROM pg_catalog.pg_attribute a "
+    "WHERE a.attrelid = s.relid AND a.attnum > 0 AND NOT a.attisdropped)) "
+    "FROM pg_catalog.pg_stat_user_tables s "
+    "JOIN pg_catalog.pg_stat_database d ON d.datname = current_database() "
+    "WHERE current_setting('track_counts')::boolean"
+)
+
+def quote_table(schema, table):
+    """
+    Nombre cualificado de una tabla entre comillas dobles
+
+    Sirve como clave en el archivo de estado y como patrón exacto para
+    --exclude-table-data de pg_dump.
+    """
+    return '"{}"."{}"'.format(schema.replace('"', '""'), table.replace('"', '""'))
+
+def get_table_fingerprints(conn_info, use_docker=None):
+    """
+    Obtiene la huella de cambios de las tablas de usuario de una base de datos
+
+    Args:
+        conn_info (dict): Componentes de la URL de conexión
+        use_docker (bool): Forzar el uso de Docker (ver run_query)
+
+    Returns:
+        dict: Tablas por nombre cualificado, con schema, table y fingerprint, o
+            None si no se pudieron consultar las estadísticas (o track_counts
+            está desactivado)
+    """
+    rows = run_query(conn_info, TABLE_FINGERPRINT_QUERY, use_docker=use_docker)
+    if not rows:
+        # Sin filas, o track_counts desactivado: los contadores no son fiables
+        return None
+
+    return {
+        quote_table(schema, table): {"schema": schema, "table": table, "fingerprint": fingerprint}
+        for schema, table, fingerprint in (row[:3] for row in rows if len(row) >= 3)
+    }
+
+def state_path(directory, database):
+    """Ruta del archivo de estado incremental de una base de datos"""
+    return os.path.join(directory, f"{database}{INCREMENTAL_STATE_SUFFIX}")
+
+def load_state(directory, database):
+    """
+    Carga el estado incremental de una base de datos
+
+    Returns:
+        dict: Estado con latest (último backup), tables (huellas del último
+            backup) y backups (origen de los datos de cada tabla por backup)
+    """
+    try:
+        with open(state_path(directory, database), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"database": database, "latest": None, "tables": {}, "backups": {}}
+
+def save_state(directory, database, state):
+    """Guarda el estado incremental sin dejar un archivo a medio escribir"""
+    path = state_path(directory, database)
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+def plan_backup(state, fingerprints, directory, full_every=INCREMENTAL_FULL_EVERY):
+    """
+    Decide qué tablas se vuelcan en el siguiente backup
+
+    Una tabla se omite si su huella no ha cambiado desde el último backup y el
+    backup que contiene sus datos sigue existiendo. Tras full_every backups
+    incrementales seguidos se hace uno completo para acotar la cadena.
+
+    Args:
+        state (dict): Estado cargado con load_state
+        fingerprints (dict): Huellas actuales (ver get_table_fingerprints), o
+            None si no se pudieron obtener
+        directory (str): Directorio de los backups
+        full_every (int): Backups incrementales seguidos antes de uno completo
+
+    Returns:
+        dict: full (bool), reason, changed (lista de tablas), unchanged (tabla ->
+            backup con sus datos) y fingerprints
+    """
+    plan = {"full": True, "reason": None, "changed": [], "unchanged": {}, "fingerprints": fingerprints}
+    latest = state["backups"].get(state.get("latest"))
+
+    if fingerprints is None:
+        plan["reason"] = "estadísticas de las tablas no disponibles"
+    elif latest is None or not os.path.exists(os.path.join(directory, state["latest"])):
+        plan["reason"] = "no hay un backup anterior"
+    elif latest["chain"] >= full_every:
+        plan["reason"] = f"{latest['chain']} backups incrementales seguidos"
+
+    if plan["reason"]:
+        plan["changed"] = sorted(fingerprints or {})
+        return plan
+
+    source_of = {
+        quote_table(schema, table): source
+        for source, tables in latest["sources"].items()
+        for schema, table in tables
+    }
+    for key, info in sorted(fingerprints.items()):
+        previous = state["tables"].get(key)
+        source = source_of.get(key)
+        if (previous and previous["fingerprint"] == info["fingerprint"]
+                and source and os.path.exists(os.path.join(directory, source))):
+            plan["unchanged"][key] = source
+        else:
+            plan["changed"].append(key)
+
+    if not plan["unchanged"]:
+        plan["reason"] = "todas las tablas han cambiado"
+    else:
+        plan["full"] = False
+    return plan
+
+def exclude_data_args(plan):
+    """Parámetros de pg_dump que omiten los datos de las tablas sin cambios"""
+    return [f"--exclude-table-data={key}" for key in plan["unchanged"]]
+
+def record_backup(directory, database, name, plan):
+    """
+    Registra un backup terminado en el estado incremental
+
+    Las huellas guardadas son las leídas antes de iniciar pg_dump: un cambio
+    posterior a la lectura hace que la tabla se vuelque en el siguiente backup.
+
+    Args:
+        directory (str): Directorio de los backups
+        database (str): Nombre de la base de datos
+        name (str): Nombre del archivo o directorio del backup
+        plan (dict): Plan con el que se hizo el backup (ver plan_backup)
+    """
+    state = load_state(directory, database)
+    fingerprints = plan["fingerprints"] or {}
+    latest = state["backups"].get(state.get("latest"))
+
+    sources = {}
+    for key in plan["changed"]:
+        info = fingerprints[key]
+        sources.setdefault(name, []).append([info["schema"], info["table"]])
+    for key, source in plan["unchanged"].items():
+        info = fingerprints[key]
+        sources.setdefault(source, []).append([info["schema"], info["table"]])
+
+    state["backups"][name] = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "full": plan["full"],
+        "chain": 0 if plan["full"] or latest is None else latest["chain"] + 1,
+        "sources": sources
+    }
+    state["tables"] = fingerprints
+    state["latest"] = name
+    save_state(directory, database, state)
+
+def find_backup_sources(backup_path):
+    """
+    Busca de qué backups procede cada tabla de un backup incremental
+
+    Args:
+        backup_path (str): Ruta del backup
+
+    Returns:
+        dict: Backup -> lista de [esquema, tabla] cuyos datos contiene, o None si
+            el backup no forma parte de una cadena incremental
+    """
+    directory = os.path.dirname(os.path.abspath(backup_path))
+    name = os.path.basename(os.path.normpath(backup_path))
+
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.name.endswith(INCREMENTAL_STATE_SUFFIX):
+                continue
+            state = load_state(directory, entry.name[:-len(INCREMENTAL_STATE_SUFFIX)])
+            if name in state["backups"]:
+                return state["backups"][name]["sources"]
+    return None
+
+def required_backups(directory, database, names):
+    """
+    Backups de los que dependen los indicados para poder restaurarse
+
+    Returns:
+        set: Nombres de los backups que contienen datos de las tablas de names
+    """
+    state = load_state(directory, database)
+    required = set()
+    for name in names:
+        backup = state["backups"].get(name)
+        if backup:
+            required.update(backup["sources"])
+    return required
+
+def forget_backups(directory, database, names):
+    """Elimina del estado incremental los backups borrados"""
+    if not os.path.exists(state_path(directory, database)):
+        return
+    state = load_state(directory, database)
+    for name in names:
+        state["backups"].pop(name, None)
+    if state.get("latest") not in state["backups"]:
+        state["latest"] = None
+    save_state(directory, database, state)
@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.backup_manager import BackupManager
+from core.client_container import ClientContainer
+from core.system_utils import get_available_tools
+from config.settings import (
+    DEFAULT_BACKUP_FORMAT, DEFAULT_BACKUP_JOBS, DEFAULT_COMPRESSION,
+    SCHEDULER_MAX_WORKERS, SCHEDULER_PER_HOST_LIMIT, SCHEDULER_RETRIES,
+    SCHEDULER_RETRY_DELAY, SCHEDULER_OUTPUT_DIR
+)
+
+# Estados de un trabajo
+JOB_PENDING = "pendiente"
+JOB_RUNNING = "en curso"
+JOB_RETRYING = "reintento"
+JOB_DONE = "completado"
+JOB_FAILED = "fallido"
+JOB_CANCELLED = "cancelado"
+
+def load_profiles(path):
+    """
+    Carga perfiles de conexión desde un archivo JSON
+
+    El archivo puede ser una lista de perfiles o un objeto con "defaults" (valores
+    comunes) y "profiles". Cada perfil necesita "url" y admite "name", "format",
+    "jobs", "compression", "compression_level", "repository" e "incremental".
+
+    Args:
+        path (str): Ruta al archivo JSON
+
+    Returns:
+        list: Perfiles con los valores por defecto aplicados
+
+    Raises:
+        ValueError: Si el archivo no tiene el formato esperado
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    defaults = {}
+    if isinstance(data, dict):
+        defaults = data.get("defaults", {})
+        data = data.get("profiles")
+
+    if not isinstance(data, list):
+        raise ValueError("El archivo debe contener una lista de perfiles")
+
+    profiles = []
+    for index, entry in enumerate(data, 1):
+        if not isinstance(entry, dict) or not entry.get("url"):
+            raise ValueError(f"El perfil {index} no tiene URL de conexión")
+        profile = dict(defaults)
+        profile.update(entry)
+        profiles.append(profile)
+    return profiles
+
+class JobScheduler:
+    """
+    Ejecuta backups de varias bases de datos con un conjunto acotado de hilos
+
+    Limita los backups simultáneos en total y contra cada servidor, de modo que
+    un servidor nunca recibe más de per_host_limit volcados a la vez. Un trabajo
+    cuyo servidor está ocupado no bloquea a los de otros servidores. Los
+    trabajos fallidos se reintentan tras una espera.
+    """
+
+    def __init__(self, max_workers=SCHEDULER_MAX_WORKERS, per_host_limit=SCHEDULER_PER_HOST_LIMIT,
+                 retries=SCHEDULER_RETRIES, retry_delay=SCHEDULER_RETRY_DELAY,
+                 output_dir=SCHEDULER_OUTPUT_DIR, reuse_container=False, logger_callback=None):
+        """
+        Inicializa el planificador
+
+        Args:
+            max_workers (int): Backups simultáneos en total
+            per_host_limit (int): Backups simultáneos contra un mismo servidor
+            retries (int): Reintentos de un backup fallido
+            retry_delay (int): Segundos de espera antes de reintentar
+            output_dir (str): Directorio base; cada perfil usa un subdirectorio
+            reuse_container (bool): Compartir un contenedor cliente entre los backups con Docker
+            logger_callback (callable): Función para registrar mensajes
+        """
+        self.max_workers = max(1, max_workers)
+        self.per_host_limit = max(1, per_host_limit)
+        self.retries = max(0, retries)
+        self.retry_delay = retry_delay
+        self.output_dir = output_dir
+        self.reuse_container = reuse_container
+        self.logger = logger_callback if logger_callback else print
+
+        self._jobs = []
+        self._cond = threading.Condition()
+        self._host_active = {}
+        self._managers = {}
+        self._cancelled = False
+        self._client_container = None
+
+    def log(self, message):
+        """Registra un mensaje usando el callback configurado"""
+        if self.logger:
+            self.logger(message)
+
+    def add_job(self, profile):
+        """
+        Añade un backup a la cola
+
+        Args:
+            profile (dict): Perfil con "url" y, opcionalmente, "name", "format",
+                "jobs", "compression", "compression_level", "repository" e "incremental"
+
+        Returns:
+            dict: Trabajo creado, o None si la URL no es válida
+        """
+        conn_info = BackupManager(logger_callback=self.log).parse_connection_url(profile["url"])
+        if not conn_info:
+            return None
+
+        name = profile.get("name") or f"{conn_info['host']}_{conn_info['database']}"
+        job = {
+            "name": name,
+            "host": f"{conn_info['host']}:{conn_info['port']}",
+            "conn_info": conn_info,
+            "format": profile.get("format", DEFAULT_BACKUP_FORMAT),
+            "jobs": profile.get("jobs", DEFAULT_BACKUP_JOBS),
+            "compression": profile.get("compression", DEFAULT_COMPRESSION),
+            "compression_level": profile.get("compression_level"),
+            "repository": profile.get("repository"),
+            "incremental": profile.get("incremental", False),
+            "status": JOB_PENDING,
+            "attempts": 0,
+            "not_before": 0.0,
+            "duration": 0.0,
+            "size": 0,
+            "final_backup": None
+        }
+        with self._cond:
+            job["id"] = len(self._jobs) + 1
+            self._jobs.append(job)
+        return job
+
+    def get_jobs(self):
+        """Devuelve una copia del estado de los trabajos"""
+        with self._cond:
+            return [
+                {key: value for key, value in job.items() if key != "conn_info"}
+                for job in self._jobs
+            ]
+
+    def run(self):
+        """
+        Ejecuta todos los trabajos de la cola y espera a que terminen
+
+        Returns:
+            dict: Informe con el resultado de cada trabajo y los totales
+        """
+        with self._cond:
+            self._cancelled = False
+        pending = sum(1 for job in self._jobs if job["status"] == JOB_PENDING)
+        self.log(f"Planificador: {pending} backups, {self.max_workers} simultáneos, "
+                 f"máximo {self.per_host_limit} por servidor")
+
+        # Herramientas detectadas una sola vez para todos los trabajos
+        tools = get_available_tools()
+        if self.reuse_container and tools['has_docker']:
+            self._client_container = ClientContainer(logger_callback=self.log)
+            atexit.register(self._client_container.stop)
+
+        start_time = time.monotonic()
+        workers = min(self.max_workers, max(1, pending))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for _ in range(workers):
+                executor.submit(self._worker, tools)
+
+        report = self._build_report(time.monotonic() - start_time)
+        self._log_report(report)
+        return report
+
+    def cancel(self):
+        """Cancela los trabajos pendientes y los backups en curso"""
+        with self._cond:
+            self._cancelled = True
+            for job in self._jobs:
+                if job["status"] in (JOB_PENDING, JOB_RETRYING):
+                    job["status"] = JOB_CANCELLED
+            managers = list(self._managers.values())
+            self._cond.notify_all()
+
+        for manager in managers:
+            manager.cancel()
+
+    def _worker(self, tools):
+        """Toma trabajos de la cola hasta que no quedan pendientes"""
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    if not self._has_pending():
+                        return
+                    self._cond.wait(timeout=self._wait_time())
+                    job = self._next_job()
+
+                job["status"] = JOB_RUNNING
+                job["attempts"] += 1
+                self._host_active[job["host"]] = self._host_active.get(job["host"], 0) + 1
+
+            try:
+                result = self._run_job(job, tools)
+            except Exception as e:
+                self.log(f"✗ [{job['name']}] Error inesperado: {e}")
+                result = {"success": False, "duration": 0.0, "size": 0, "final_backup": None}
+
+            with self._cond:
+                self._host_active[job["host"]] -= 1
+                self._managers.pop(job["id"], None)
+                self._finish_job(job, result)
+                self._cond.notify_all()
+
+    def _next_job(self):
+        """Devuelve el primer trabajo listo cuyo servidor tiene capacidad; requiere el lock"""
+        now = time.monotonic()
+        for job in self._jobs:
+            if job["status"] not in (JOB_PENDING, JOB_RETRYING):
+                continue
+            if job["not_before"] > now:
+                continue
+            if self._host_active.get(job["host"], 0) >= self.per_host_limit:
+                continue
+            return job
+        return None
+
+    def _has_pending(self):
+        """Indica si quedan trabajos por ejecutar; requiere el lock"""
+        return any(job["status"] in (JOB_PENDING, JOB_RETRYING) for job in self._jobs)
+
+    def _wait_time(self):
+        """Segundos hasta el próximo reintento, o None para esperar un aviso; requiere el lock"""
+        now = time.monotonic()
+        waits = [
+            job["not_before"] - now for job in self._jobs
+            if job["status"] == JOB_RETRYING and job["not_before"] > now
+        ]
+        return max(0.0, min(waits)) if waits else None
+
+    def _run_job(self, job, tools):
+        """Ejecuta el backup de un trabajo en su propio directorio"""
+        name = job["name"]
+        manager = BackupManager(logger_callback=lambda message: self.log(f"[{name}] {message}"))
+        if self._client_container:
+            manager.reuse_container = True
+            manager.client_container = self._client_container
+
+        with self._cond:
+            if self._cancelled:
+                return {"success": False, "duration": 0.0, "size": 0, "final_backup": None}
+            self._managers[job["id"]] = manager
+
+        output_dir = os.path.join(self.output_dir, self._safe_name(name))
+        os.makedirs(output_dir, exist_ok=True)
+
+        self.log(f"→ [{name}] Iniciando backup (intento {job['attempts']}/{self.retries + 1})")
+        return manager.run_backup(
+            job["conn_info"], job["format"], job["jobs"],
+            job["compression"], job["compression_level"],
+            output_dir=output_dir, tools=tools, repository=job["repository"],
+            incremental=job["incremental"], keep_timestamped=True
+        )
+
+    def _finish_job(self, job, result):
+        """Actualiza el estado de un trabajo según su resultado; requiere el lock"""
+        job["duration"] += result["duration"]
+
+        if result["success"]:
+            job["status"] = JOB_DONE
+            job["size"] = result["size"]
+            job["final_backup"] = result["final_backup"]
+            self.log(f"✓ [{job['name']}] Backup completado en {result['duration']:.1f} s: {result['final_backup']}")
+        elif self._cancelled:
+            job["status"] = JOB_CANCELLED
+            self.log(f"✗ [{job['name']}] Backup cancelado")
+        elif job["attempts"] <= self.retries:
+            job["status"] = JOB_RETRYING
+            job["not_before"] = time.monotonic() + self.retry_delay
+            self.log(f"✗ [{job['name']}] Backup fallido; reintento {job['attempts'] + 1}/{self.retries + 1} "
+                     f"en {self.retry_delay} s")
+        else:
+            job["status"] = JOB_FAILED
+            self.log(f"✗ [{job['name']}] Backup fallido tras {job['attempts']} intentos")
+
+    def _safe_name(self, name):
+        """Convierte el nombre de un perfil en un nombre de directorio válido"""
+        return re.sub(r'[^\w.-]+', '_', name)
+
+    def _build_report(self, elapsed):
+        """Construye el informe agregado de la ejecución"""
+        jobs = self.get_jobs()
+        total_size = sum(job["size"] for job in jobs)
+        counts = {}
+        for job in jobs:
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+
+        return {
+            "jobs": jobs,
+            "total": len(jobs),
+            "succeeded": counts.get(JOB_DONE, 0),
+            "failed": counts.get(JOB_FAILED, 0),
+            "cancelled": counts.get(JOB_CANCELLED, 0),
+            "total_size": total_size,
+            "elapsed": elapsed,
+            "job_time": sum(job["duration"] for job in jobs),
+            "throughput": total_size / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+        }
+
+    def _log_report(self, report):
+        """Registra el resumen de la ejecución"""
+        self.log("=" * 50)
+        self.log("RESUMEN DE BACKUPS")
+        self.log("=" * 50)
+        for job in report["jobs"]:
+            size_mb = job["size"] / (1024 * 1024)
+            self.log(f"  {job['name']:<24} {job['status']:<11} intentos: {job['attempts']}, "
+                     f"{job['duration']:.1f} s, {size_mb:.1f} MB")
+
+        self.log(f"Completados: {report['succeeded']}/{report['total']}, "
+                 f"fallidos: {report['failed']}, cancelados: {report['cancelled']}")
+        self.log(f"Tiempo total: {report['elapsed']:.1f} s "
+                 f"(suma de trabajos: {report['job_time']:.1f} s)")
+        self.log(f"Volumen: {report['total_size'] / (1024 * 1024):.1f} MB "
+                 f"({report['throughput']:.1f} MB/s agregados)")
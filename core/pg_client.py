@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import subprocess
+
+from config.settings import POSTGRES_DOCKER_IMAGE
+
+def connection_args(conn_info, include_database=True):
+    """
+    Devuelve los argumentos de conexión comunes a las herramientas de PostgreSQL
+
+    pg_basebackup y pg_receivewal usan conexiones de replicación, en las que -d
+    es una cadena de conexión y no un nombre de base de datos, por lo que se
+    omite con include_database=False.
+    """
+    args = [
+        "-h", conn_info['host'],
+        "-p", conn_info['port'],
+        "-U", conn_info['username']
+    ]
+    if include_database:
+        args += ["-d", conn_info['database']]
+    return args
+
+def build_client_command(conn_info, tool, args=None, use_docker=False, interactive=False, volumes=None,
+                         include_database=True, pg_options=None, image=None):
+    """
+    Construye el comando para ejecutar una herramienta cliente de PostgreSQL
+
+    Args:
+        conn_info (dict): Componentes de la URL de conexión
+        tool (str): Herramienta a ejecutar (pg_dump, psql, pg_restore...)
+        args (list): Argumentos adicionales para la herramienta
+        use_docker (bool): Ejecutar la herramienta dentro de un contenedor temporal
+        interactive (bool): Mantener stdin abierto en el contenedor (-i)
+        volumes (list): Pares (ruta local, ruta en el contenedor) a montar
+        include_database (bool): Indicar la base de datos con -d (ver connection_args)
+        pg_options (str): Parámetros de sesión del servidor (PGOPTIONS, p. ej.
+            "-c synchronous_commit=off")
+        image (str): Imagen de Docker (por defecto, POSTGRES_DOCKER_IMAGE)
+
+    Returns:
+        tuple: (comando, entorno) listos para subprocess
+    """
+    args = args or []
+    conn_args = connection_args(conn_info, include_database)
+
+    if not use_docker:
+        env = os.environ.copy()
+        env['PGPASSWORD'] = conn_info['password']
+        if pg_options:
+            env['PGOPTIONS'] = f"{env.get('PGOPTIONS', '')} {pg_options}".strip()
+        return [tool] + conn_args + args, env
+
+    command = ["docker", "run", "--rm"]
+    if interactive:
+        command.append("-i")
+    command += ["-e", f"PGPASSWORD={conn_info['password']}"]
+    if pg_options:
+        command += ["-e", f"PGOPTIONS={pg_options}"]
+
+    for host_path, container_path in volumes or []:
+        command += ["-v", f"{os.path.abspath(host_path)}:{container_path}"]
+
+    # Evitar que los archivos generados en volúmenes queden a nombre de root
+    if volumes and hasattr(os, "getuid"):
+        command += ["--user", f"{os.getuid()}:{os.getgid()}"]
+
+    command += [image or POSTGRES_DOCKER_IMAGE, tool] + conn_args + args
+    return command, None
+
+def build_container_command(container_name, database, username, tool, args=None,
+                            interactive=False, volumes=None, pg_options=None):
+    """
+    Construye el comando para ejecutar una herramienta contra un contenedor PostgreSQL
+
+    Sin volúmenes, la herramienta se ejecuta dentro del propio contenedor con
+    docker exec. Con volúmenes, se lanza un contenedor auxiliar que comparte la red
+    del contenedor de destino, de modo que puede leer archivos locales montados sin
+    copiarlos dentro del contenedor de la base de datos.
+
+    Args:
+        container_name (str): Nombre del contenedor Docker de destino
+        database (str): Nombre de la base de datos
+        username (str): Usuario de PostgreSQL
+        tool (str): Herramienta a ejecutar (psql, pg_restore...)
+        args (list): Argumentos adicionales para la herramienta
+        interactive (bool): Mantener stdin abierto (-i)
+        volumes (list): Pares (ruta local, ruta en el contenedor) a montar
+        pg_options (str): Parámetros de sesión del servidor (PGOPTIONS)
+
+    Returns:
+        list: Comando listo para subprocess
+    """
+    args = args or []
+    options = ["-e", f"PGOPTIONS={pg_options}"] if pg_options else []
+
+    if not volumes:
+        command = ["docker", "exec"]
+        if interactive:
+            command.append("-i")
+        command += ["-e", "PGCLIENTENCODING=UTF8"] + options + [container_name, tool]
+        return command + ["-U", username, "-d", database] + args
+
+    command = ["docker", "run", "--rm", "--network", f"container:{container_name}"]
+    if interactive:
+        command.append("-i")
+    command += ["-e", "PGCLIENTENCODING=UTF8"] + options
+    for host_path, container_path in volumes:
+        command += ["-v", f"{os.path.abspath(host_path)}:{container_path}"]
+    command += [POSTGRES_DOCKER_IMAGE, tool, "-h", "localhost", "-U", username, "-d", database]
+    return command + args
+
+def run_query(conn_info, sql, use_docker=None, timeout=60):
+    """
+    Ejecuta una consulta con psql y devuelve las filas obtenidas
+
+    Args:
+        conn_info (dict): Componentes de la URL de conexión
+        sql (str): Consulta a ejecutar
+        use_docker (bool): Forzar el uso de Docker. Si es None, se usa psql local
+            cuando está disponible
+        timeout (int): Tiempo máximo de espera en segundos
+
+    Returns:
+        list: Filas como listas de columnas (texto), o None si la consulta falló
+    """
+    if use_docker is None:
+        use_docker = shutil.which("psql") is None
+
+    command, env = build_client_command(
+        conn_info, "psql",
+        ["-X", "-A", "-t", "-F", "\t", "-v", "ON_ERROR_STOP=1", "-c", sql],
+        use_docker=use_docker
+    )
+
+    try:
+        process = subprocess.run(
+            command,
+            env=env,
+            capture_output=True,
+            text=True,
+            encoding='utf-8',
+            timeout=timeout
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+    if process.returncode != 0:
+        return None
+
+    return [line.split("\t") for line in process.stdout.splitlines() if line]
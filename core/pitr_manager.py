@@ -0,0 +1,571 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import tarfile
+import threading
+import time
+from datetime import datetime
+
+from core.system_utils import get_available_tools, get_pitr_tools
+from core.pg_client import build_client_command, run_query
+from core.process_runner import ProcessRunner
+from config.settings import (
+    PITR_DIR, PITR_SLOT_NAME, PITR_WAL_COMPRESSION, PITR_KEEP_BASE_BACKUPS, PITR_RECOVERY_TIMEOUT,
+    POSTGRES_DOCKER_IMAGE, PARTIAL_SUFFIX
+)
+
+# Nombre de un segmento WAL: timeline (8), log (8) y segmento (8) en hexadecimal
+WAL_SEGMENT_PATTERN = re.compile(r'^[0-9A-F]{24}')
+
+# Directorio de datos en la imagen oficial de PostgreSQL
+CONTAINER_DATA_DIR = "/var/lib/postgresql/data"
+
+# restore_command del servidor restaurado: busca cada segmento sin comprimir,
+# comprimido con gzip o parcial (el último que escribía pg_receivewal). Un
+# segmento parcial comprimido se completa con ceros hasta el tamaño de segmento
+# del servidor ({segment_size} bytes, ver pg_controldata), como hace
+# pg_receivewal con los parciales sin comprimir.
+RESTORE_COMMAND = (
+    "f=/pitr/wal/%f; "
+    "if [ -f $f.gz ]; then gzip -dc $f.gz > %p; "
+    "elif [ -f $f ]; then cp $f %p; "
+    "elif [ -f $f.gz.partial ]; then gzip -dc $f.gz.partial > %p 2>/dev/null; truncate -s {segment_size} %p; "
+    "elif [ -f $f.partial ]; then cp $f.partial %p; "
+    "else exit 1; fi"
+)
+
+# Tamaño de segmento WAL en la salida de pg_controldata
+WAL_SEGMENT_SIZE_PATTERN = re.compile(r'^Bytes per WAL segment:\s+(\d+)', re.MULTILINE)
+
+class PitrManager:
+    """
+    Backups físicos y archivado continuo de WAL para recuperar a un instante
+
+    Estructura del directorio:
+        base/<AAAAMMDD_HHMMSS>/  backup de pg_basebackup (base.tar.gz, pg_wal.tar.gz)
+                                 y backup_info.json con su primer segmento WAL
+        wal/                     segmentos recibidos con pg_receivewal
+        restore/<contenedor>/    directorios de datos de las restauraciones
+    """
+
+    def __init__(self, pitr_dir=PITR_DIR, logger_callback=None):
+        """
+        Inicializa el gestor
+
+        Args:
+            pitr_dir (str): Directorio de los backups físicos y del WAL
+            logger_callback (callable): Función para registrar mensajes
+        """
+        self.pitr_dir = os.path.abspath(pitr_dir)
+        self.base_dir = os.path.join(self.pitr_dir, "base")
+        self.wal_dir = os.path.join(self.pitr_dir, "wal")
+        self.logger = logger_callback if logger_callback else print
+
+        # Procesos en curso, para poder cancelarlos
+        self._active_runners = set()
+        self._runners_lock = threading.Lock()
+        self._cancel_event = threading.Event()
+
+    def log(self, message):
+        """Registra un mensaje usando el callback configurado"""
+        if self.logger:
+            self.logger(message)
+
+    def base_backup(self, conn_info):
+        """
+        Crea un backup físico del servidor con pg_basebackup
+
+        El backup incluye el WAL necesario para que sea consistente por sí mismo
+        (-X stream); el archivado continuo permite avanzar desde él.
+
+        Args:
+            conn_info (dict): Componentes de la URL de conexión
+
+        Returns:
+            dict: success, path, size (bytes) y duration (segundos)
+        """
+        self._cancel_event.clear()
+        start_time = time.monotonic()
+        result = {"success": False, "path": None, "size": 0, "duration": 0.0}
+
+        tools = self._select_tools(conn_info)
+        if tools is None:
+            return result
+        use_docker, image = tools
+
+        name = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_path = os.path.join(self.base_dir, name)
+        partial_path = backup_path + PARTIAL_SUFFIX
+        os.makedirs(self.base_dir, exist_ok=True)
+
+        command, env = self._tool_command(conn_info, "pg_basebackup", [
+            "-D", self._tool_path(partial_path, use_docker),
+            "-Ft", "-z", "-X", "stream", "-c", "fast",
+            "-l", f"pg_backup_tool {name}"
+        ], use_docker, image)
+
+        self.log(f"→ Backup físico en {backup_path}")
+        if not self._run_tool(command, env, "pg_basebackup"):
+            shutil.rmtree(partial_path, ignore_errors=True)
+            return result
+
+        try:
+            info = self._read_backup_info(partial_path, name)
+        except (OSError, tarfile.TarError, ValueError) as e:
+            self.log(f"✗ El backup físico no es válido: {e}")
+            shutil.rmtree(partial_path, ignore_errors=True)
+            return result
+
+        with open(os.path.join(partial_path, "backup_info.json"), 'w', encoding='utf-8') as f:
+            json.dump(info, f, indent=2)
+        os.rename(partial_path, backup_path)
+
+        size = sum(entry.stat().st_size for entry in os.scandir(backup_path) if entry.is_file())
+        self.log(f"✓ Backup físico creado: {backup_path} ({size / (1024 * 1024):.1f} MB, "
+                 f"PostgreSQL {info['server_major']}, primer WAL {info['start_wal']})")
+        result.update({
+            "success": True,
+            "path": backup_path,
+            "size": size,
+            "duration": time.monotonic() - start_time
+        })
+        return result
+
+    def stream_wal(self, conn_info):
+        """
+        Recibe el WAL del servidor de forma continua con pg_receivewal
+
+        Usa un slot de replicación (PITR_SLOT_NAME) para que el servidor conserve
+        el WAL que aún no se ha recibido. Se ejecuta hasta que se llama a cancel();
+        si se pierde la conexión, pg_receivewal vuelve a conectarse.
+
+        Args:
+            conn_info (dict): Componentes de la URL de conexión
+
+        Returns:
+            bool: True si se detuvo con cancel(), False si falló
+        """
+        self._cancel_event.clear()
+        tools = self._select_tools(conn_info)
+        if tools is None:
+            return False
+        use_docker, image = tools
+        os.makedirs(self.wal_dir, exist_ok=True)
+
+        command, env = self._tool_command(conn_info, "pg_receivewal", [
+            "--create-slot", "--if-not-exists", "-S", PITR_SLOT_NAME
+        ], use_docker, image)
+        if not self._run_tool(command, env, "pg_receivewal"):
+            return False
+
+        args = ["-D", self._tool_path(self.wal_dir, use_docker), "-S", PITR_SLOT_NAME]
+        args += self._wal_compression_args(use_docker, image)
+        command, env = self._tool_command(conn_info, "pg_receivewal", args, use_docker, image)
+
+        self.log(f"→ Recibiendo WAL en {self.wal_dir} (slot {PITR_SLOT_NAME}, compresión {PITR_WAL_COMPRESSION})")
+        runner = self._new_runner()
+        try:
+            process = runner.run(command, env, on_stderr_line=lambda line: self.log(f"  {line}"))
+        except OSError as e:
+            self.log(f"✗ Error al ejecutar pg_receivewal: {e}")
+            return False
+        finally:
+            self._release_runner(runner)
+
+        if process["cancelled"]:
+            self.log("Recepción de WAL detenida")
+            return True
+        self.log(f"✗ pg_receivewal terminó con código {process['returncode']}:")
+        self.log(process["stderr"])
+        return False
+
+    def list_base_backups(self):
+        """
+        Lista los backups físicos terminados
+
+        Returns:
+            list: Información de cada backup (ver backup_info.json), del más antiguo al más reciente
+        """
+        backups = []
+        if not os.path.isdir(self.base_dir):
+            return backups
+
+        with os.scandir(self.base_dir) as entries:
+            for entry in entries:
+                info_path = os.path.join(entry.path, "backup_info.json")
+                if entry.name.endswith(PARTIAL_SUFFIX) or not os.path.isfile(info_path):
+                    continue
+                with open(info_path, 'r', encoding='utf-8') as f:
+                    info = json.load(f)
+                info["path"] = entry.path
+                backups.append(info)
+        return sorted(backups, key=lambda info: info["name"])
+
+    def prune(self, keep=PITR_KEEP_BASE_BACKUPS, dry_run=False):
+        """
+        Aplica la retención: conserva los últimos backups físicos y el WAL posterior
+
+        Los segmentos WAL anteriores al primero que necesita el backup físico más
+        antiguo conservado ya no sirven para ninguna recuperación.
+
+        Args:
+            keep (int): Backups físicos a conservar (al menos uno)
+            dry_run (bool): Solo mostrar lo que se eliminaría
+
+        Returns:
+            list: Rutas eliminadas (o que se eliminarían con dry_run)
+        """
+        backups = self.list_base_backups()
+        if not backups:
+            self.log("No hay backups físicos; no se elimina ningún segmento WAL")
+            return []
+
+        keep = max(1, keep)
+        expired, retained = backups[:-keep], backups[-keep:]
+        first_needed = retained[0]["start_wal"][8:]
+
+        removed = [info["path"] for info in expired]
+        if os.path.isdir(self.wal_dir):
+            with os.scandir(self.wal_dir) as entries:
+                for entry in entries:
+                    # Se compara log y segmento; los archivos .history no son segmentos
+                    if WAL_SEGMENT_PATTERN.match(entry.name) and entry.name[8:24] < first_needed:
+                        removed.append(entry.path)
+
+        if not dry_run:
+            for path in removed:
+                try:
+                    if os.path.isdir(path):
+                        shutil.rmtree(path)
+                    else:
+                        os.remove(path)
+                except OSError as e:
+                    self.log(f"✗ No se pudo eliminar {path}: {e}")
+
+        action = "se eliminarían" if dry_run else "eliminados"
+        wal_count = len(removed) - len(expired)
+        self.log(f"Retención PITR: {len(retained)} backups físicos conservados, {len(expired)} {action}; "
+                 f"{wal_count} segmentos WAL {action} (anteriores a {retained[0]['start_wal']})")
+        return removed
+
+    def restore_to_container(self, target_time, container_name, port=None):
+        """
+        Restaura el servidor en un contenedor Docker nuevo hasta un instante
+
+        Se elige el último backup físico terminado antes del instante, se extrae
+        en restore/<contenedor> y el contenedor reproduce el WAL archivado hasta
+        target_time y pasa a aceptar escrituras.
+
+        Args:
+            target_time (str): Instante de recuperación (AAAA-MM-DD HH:MM[:SS], con
+                zona horaria opcional; sin ella se usa la local)
+            container_name (str): Nombre del contenedor a crear
+            port (int): Puerto local en el que publicar PostgreSQL (None = no publicarlo)
+
+        Returns:
+            bool: True si la recuperación terminó, False en caso contrario
+        """
+        self._cancel_event.clear()
+        try:
+            # Sin zona horaria, el instante es local; se pasa al servidor con su desplazamiento
+            target = datetime.fromisoformat(target_time.strip()).astimezone()
+        except ValueError:
+            self.log(f"✗ Error: instante de recuperación inválido: {target_time} (formato AAAA-MM-DD HH:MM:SS)")
+            return False
+
+        if not get_available_tools()["has_docker"]:
+            self.log("✗ Docker es necesario para restaurar en un contenedor.")
+            return False
+
+        candidates = [
+            info for info in self.list_base_backups()
+            if datetime.fromisoformat(info["finished"]).astimezone() <= target
+        ]
+        if not candidates:
+            self.log(f"✗ Error: no hay ningún backup físico terminado antes de {target:%Y-%m-%d %H:%M:%S}")
+            return False
+        base = candidates[-1]
+
+        data_dir = os.path.join(self.pitr_dir, "restore", container_name)
+        if os.path.exists(data_dir):
+            self.log(f"✗ Error: ya existe {data_dir}; elimínalo o usa otro nombre de contenedor")
+            return False
+
+        image = self._docker_image(base.get("server_major"))
+        self.log(f"→ Recuperando hasta {target.isoformat()} desde el backup físico {base['name']}")
+        try:
+            prepared = self._prepare_data_dir(base, data_dir, target, image)
+        except (OSError, tarfile.TarError, ValueError) as e:
+            self.log(f"✗ Error al preparar el directorio de datos: {e}")
+            shutil.rmtree(data_dir, ignore_errors=True)
+            return False
+        if not prepared:
+            self.log("✗ Recuperación cancelada")
+            shutil.rmtree(data_dir, ignore_errors=True)
+            return False
+
+        command = [
+            "docker", "run", "-d", "--name", container_name,
+            "-v", f"{data_dir}:{CONTAINER_DATA_DIR}",
+            "-v", f"{self.wal_dir}:/pitr/wal:ro"
+        ]
+        # El directorio de datos pertenece al usuario local; el servidor debe ejecutarse con él
+        if hasattr(os, "getuid"):
+            command += ["--user", f"{os.getuid()}:{os.getgid()}"]
+        if port:
+            command += ["-p", f"{port}:5432"]
+        command.append(image)
+
+        if not self._run_tool(command, None, "docker"):
+            return False
+        return self._wait_for_recovery(container_name, data_dir, port)
+
+    def cancel(self):
+        """
+        Cancela los procesos en curso de este gestor (y sus procesos hijos)
+
+        La cancelación dura hasta que empieza la siguiente operación, de modo
+        que también detiene los procesos que aún no se habían lanzado.
+        """
+        with self._runners_lock:
+            self._cancel_event.set()
+            runners = list(self._active_runners)
+        for runner in runners:
+            runner.cancel()
+
+    def _new_runner(self):
+        """Crea un ProcessRunner registrado para poder cancelarlo (ya cancelado si se canceló el gestor)"""
+        runner = ProcessRunner()
+        with self._runners_lock:
+            if self._cancel_event.is_set():
+                runner.cancel()
+            self._active_runners.add(runner)
+        return runner
+
+    def _release_runner(self, runner):
+        """Deja de seguir un ProcessRunner terminado"""
+        with self._runners_lock:
+            self._active_runners.discard(runner)
+
+    def _select_tools(self, conn_info):
+        """
+        Elige entre las herramientas locales y Docker
+
+        Returns:
+            tuple: (usar Docker, imagen de la versión del servidor), o None si
+                no hay ninguna opción
+        """
+        rows = run_query(conn_info, "SHOW server_version_num")
+        server_major = int(rows[0][0]) // 10000 if rows else None
+        tools = get_pitr_tools(server_major)
+
+        if not tools["available"]:
+            self.log("✗ Se necesitan pg_basebackup y pg_receivewal compatibles con el servidor, o Docker.")
+            return None
+        image = self._docker_image(server_major)
+        self.log(f"→ Usando Docker ({image})..." if tools["use_docker"]
+                 else "→ Usando pg_basebackup y pg_receivewal locales...")
+        return tools["use_docker"], image
+
+    def _docker_image(self, server_major):
+        """Imagen de Docker de la versión mayor del servidor (POSTGRES_DOCKER_IMAGE si no se conoce)"""
+        return f"postgres:{server_major}" if server_major else POSTGRES_DOCKER_IMAGE
+
+    def _tool_path(self, path, use_docker):
+        """Ruta de un archivo del directorio PITR tal como la ve la herramienta"""
+        if not use_docker:
+            return path
+        relative = os.path.relpath(path, self.pitr_dir).replace(os.sep, "/")
+        return f"/pitr/{relative}"
+
+    def _tool_command(self, conn_info, tool, args, use_docker, image):
+        """Comando de una herramienta de replicación (el directorio PITR se monta en /pitr)"""
+        volumes = [(self.pitr_dir, "/pitr")] if use_docker else None
+        return build_client_command(
+            conn_info, tool, args, use_docker=use_docker, volumes=volumes, include_database=False,
+            image=image
+        )
+
+    def _wal_compression_args(self, use_docker, image):
+        """Parámetros de compresión de pg_receivewal según su versión"""
+        if PITR_WAL_COMPRESSION == "none":
+            return []
+
+        if use_docker:
+            match = re.search(r':(\d+)', image)
+            major = int(match.group(1)) if match else None
+        else:
+            major = get_available_tools()["details"]["pg_receivewal"]["major"]
+
+        # Desde PostgreSQL 15 se indica el método; antes, -Z era el nivel de gzip
+        if major and major >= 15:
+            return [f"--compress={PITR_WAL_COMPRESSION}"]
+        return ["-Z", "5"]
+
+    def _run_tool(self, command, env, tool):
+        """Ejecuta un comando corto y registra su error; devuelve True si termina bien"""
+        runner = self._new_runner()
+        try:
+            process = runner.run(command, env)
+        except OSError as e:
+            self.log(f"✗ Error al ejecutar {tool}: {e}")
+            return False
+        finally:
+            self._release_runner(runner)
+
+        if process["cancelled"]:
+            self.log(f"✗ {tool} cancelado")
+            return False
+        if process["returncode"] != 0:
+            self.log(f"✗ Error en {tool}:")
+            self.log(process["stderr"])
+            if "replication" in process["stderr"]:
+                self.log("El usuario necesita el atributo REPLICATION y una entrada "
+                         "'replication' en pg_hba.conf del servidor (wal_level = replica).")
+            return False
+        return True
+
+    def _read_backup_info(self, backup_path, name):
+        """Lee de base.tar.gz el primer segmento WAL y la versión del servidor"""
+        info = {
+            "name": name,
+            "finished": datetime.now().astimezone().isoformat(timespec="seconds"),
+            "start_wal": None,
+            "timeline": None,
+            "server_major": None
+        }
+
+        with tarfile.open(os.path.join(backup_path, "base.tar.gz"), "r|gz") as archive:
+            for member in archive:
+                if member.name not in ("backup_label", "PG_VERSION"):
+                    continue
+                content = archive.extractfile(member).read().decode("utf-8", errors="replace")
+                if member.name == "PG_VERSION":
+                    info["server_major"] = int(content.strip().split(".")[0])
+                    continue
+                match = re.search(r'START WAL LOCATION: \S+ \(file ([0-9A-F]{24})\)', content)
+                if match:
+                    info["start_wal"] = match.group(1)
+                    info["timeline"] = int(match.group(1)[:8], 16)
+                if info["server_major"]:
+                    break
+
+        if not info["start_wal"]:
+            raise ValueError("falta backup_label en base.tar.gz")
+        return info
+
+    def _wal_segment_size(self, data_dir, image):
+        """
+        Tamaño de segmento WAL del servidor del backup (initdb --wal-segsize)
+
+        Se lee con pg_controldata del directorio de datos ya extraído, en un
+        contenedor de la misma versión que el servidor.
+
+        Returns:
+            int: Tamaño en bytes, o None si se canceló
+
+        Raises:
+            ValueError: Si pg_controldata no lo indica
+        """
+        command = ["docker", "run", "--rm", "-e", "LC_ALL=C", "-v", f"{data_dir}:{CONTAINER_DATA_DIR}"]
+        if hasattr(os, "getuid"):
+            command += ["--user", f"{os.getuid()}:{os.getgid()}"]
+        command += [image, "pg_controldata", CONTAINER_DATA_DIR]
+
+        lines = []
+        runner = self._new_runner()
+        try:
+            process = runner.run(command, on_stdout_line=lines.append)
+        finally:
+            self._release_runner(runner)
+        if process["cancelled"]:
+            return None
+        match = WAL_SEGMENT_SIZE_PATTERN.search("\n".join(lines))
+        if process["returncode"] != 0 or not match:
+            raise ValueError(f"pg_controldata no indica el tamaño de segmento WAL: {process['stderr']}")
+        return int(match.group(1))
+
+    def _prepare_data_dir(self, base, data_dir, target, image):
+        """
+        Extrae un backup físico y configura la recuperación hasta target
+
+        Returns:
+            bool: True si el directorio está listo, False si se canceló
+        """
+        os.makedirs(data_dir, mode=0o700)
+
+        with tarfile.open(os.path.join(base["path"], "base.tar.gz"), "r:gz") as archive:
+            archive.extractall(data_dir)
+        wal_archive = os.path.join(base["path"], "pg_wal.tar.gz")
+        # La extracción no se puede interrumpir; se comprueba entre cada archivo
+        if self._cancel_event.is_set():
+            return False
+        if os.path.exists(wal_archive):
+            with tarfile.open(wal_archive, "r:gz") as archive:
+                archive.extractall(os.path.join(data_dir, "pg_wal"))
+            if self._cancel_event.is_set():
+                return False
+
+        # Instalaciones como las de Debian guardan la configuración fuera del directorio de datos
+        if not os.path.exists(os.path.join(data_dir, "postgresql.conf")):
+            with open(os.path.join(data_dir, "postgresql.conf"), 'w', encoding='utf-8') as f:
+                f.write("listen_addresses = '*'\n")
+        if not os.path.exists(os.path.join(data_dir, "pg_hba.conf")):
+            with open(os.path.join(data_dir, "pg_hba.conf"), 'w', encoding='utf-8') as f:
+                f.write("local all all trust\nhost all all all scram-sha-256\n")
+
+        segment_size = self._wal_segment_size(data_dir, image)
+        if segment_size is None:
+            return False
+        with open(os.path.join(data_dir, "postgresql.auto.conf"), 'a', encoding='utf-8') as f:
+            f.write("\n# Recuperación a un instante (pg_backup_tool)\n")
+            f.write(f"restore_command = '{RESTORE_COMMAND.format(segment_size=segment_size)}'\n")
+            f.write(f"recovery_target_time = '{target.isoformat(sep=' ')}'\n")
+            f.write("recovery_target_action = 'promote'\n")
+            f.write("archive_mode = 'off'\n")
+            f.write("listen_addresses = '*'\n")
+        open(os.path.join(data_dir, "recovery.signal"), 'w').close()
+        return True
+
+    def _wait_for_recovery(self, container_name, data_dir, port):
+        """Espera a que el contenedor reproduzca el WAL y termine la recuperación"""
+        signal_path = os.path.join(data_dir, "recovery.signal")
+        start_time = time.monotonic()
+        last_report = start_time
+
+        # PostgreSQL elimina recovery.signal al terminar la recuperación
+        while os.path.exists(signal_path):
+            if self._cancel_event.wait(2):
+                self.log(f"✗ Recuperación cancelada; el contenedor {container_name} sigue en ejecución")
+                return False
+
+            status = subprocess.run(
+                ["docker", "inspect", "-f", "{{.State.Running}}", container_name],
+                capture_output=True, text=True
+            )
+            if status.stdout.strip() != "true":
+                logs = subprocess.run(
+                    ["docker", "logs", "--tail", "20", container_name],
+                    capture_output=True, text=True
+                )
+                self.log(f"✗ El contenedor {container_name} se detuvo durante la recuperación:")
+                self.log((logs.stdout + logs.stderr).strip())
+                return False
+
+            elapsed = time.monotonic() - start_time
+            if elapsed > PITR_RECOVERY_TIMEOUT:
+                self.log(f"✗ La recuperación no terminó en {PITR_RECOVERY_TIMEOUT} s")
+                return False
+            if time.monotonic() - last_report >= 30:
+                self.log(f"  Reproduciendo WAL... ({elapsed:.0f} s)")
+                last_report = time.monotonic()
+
+        self.log(f"✓ Recuperación completada en {time.monotonic() - start_time:.0f} s: contenedor {container_name}")
+        if port:
+            self.log(f"  Conexión: psql -h localhost -p {port} -U <usuario del servidor original>")
+        return True
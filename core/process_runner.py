@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import collections
+import os
+import queue
+import signal
+import subprocess
+import threading
+import time
+import uuid
+
+from config.settings import STREAM_CHUNK_SIZE, STREAM_QUEUE_SIZE, STDERR_TAIL_LINES, PROCESS_KILL_GRACE
+
+# Opciones de docker exec que van seguidas de un valor
+DOCKER_EXEC_VALUE_OPTIONS = {"-e", "--env", "--env-file", "-u", "--user", "-w", "--workdir"}
+
+# Variable de entorno que marca los procesos lanzados con docker exec, para
+# encontrarlos dentro del contenedor al cancelar
+DOCKER_RUN_MARKER = "PG_BACKUP_TOOL_RUN"
+
+# Termina dentro del contenedor los procesos con la marca indicada en $1 (sin
+# depender de pkill, que no está en todas las imágenes)
+DOCKER_KILL_SCRIPT = (
+    'for p in /proc/[0-9]*; do '
+    'tr "\\0" "\\n" < "$p/environ" 2>/dev/null | grep -qxF "$1" && kill -TERM "${p#/proc/}"; '
+    'done; true'
+)
+
+class ProcessRunner:
+    """
+    Ejecuta un proceso drenando stdout y stderr a la vez
+
+    Cada flujo se lee en su propio hilo, por lo que un proceso que escribe mucho
+    en stderr nunca queda bloqueado con la tubería llena. La salida en binario
+    pasa por una cola acotada y de stderr solo se conservan las últimas líneas,
+    así que la memoria no depende del volumen de salida. cancel() termina el
+    proceso y todos sus descendientes; si el proceso es un docker exec, también
+    la herramienta que se ejecuta dentro del contenedor, que no es descendiente
+    del cliente de Docker.
+
+    Cada instancia ejecuta un proceso a la vez; run() puede llamarse de nuevo
+    cuando el anterior ha terminado. Una cancelación, también si llega antes
+    de run(), se aplica a todas las ejecuciones siguientes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._process = None
+        self._container = None
+        self._cancelled = False
+
+    def run(self, command, env=None, stdin_source=None, stdout_sink=None,
+            on_stdout_line=None, on_stderr_line=None):
+        """
+        Ejecuta un comando hasta que termina
+
+        Args:
+            command (list): Comando a ejecutar
+            env (dict): Variables de entorno para el proceso
+            stdin_source (file): Objeto con read(n) cuyo contenido se envía a stdin
+            stdout_sink (callable): Recibe stdout en bloques binarios. Se invoca en
+                el hilo que llama a run(), de modo que escribir o comprimir se solapa
+                con la lectura del proceso
+            on_stdout_line (callable): Recibe cada línea de stdout como texto
+                (si no hay stdout_sink)
+            on_stderr_line (callable): Recibe cada línea de stderr como texto
+
+        Returns:
+            dict: returncode, duration (s), bytes_in (enviados a stdin), bytes_out
+                (leídos de stdout), stderr (últimas líneas), cancelled y
+                first_byte (segundos hasta el primer byte de stdout, o None)
+
+        Raises:
+            OSError: Si el comando no se puede ejecutar
+            Exception: Cualquier error de stdin_source o stdout_sink, después de
+                terminar el proceso
+        """
+        start_time = time.monotonic()
+        command, container = self._mark_docker_exec(command)
+        with self._lock:
+            if self._cancelled:
+                return {
+                    "returncode": None, "duration": 0.0, "bytes_in": 0, "bytes_out": 0,
+                    "first_byte": None, "stderr": "", "cancelled": True
+                }
+            process = subprocess.Popen(
+                command,
+                env=env,
+                stdin=subprocess.PIPE if stdin_source is not None else subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                **self._group_kwargs()
+            )
+            self._process = process
+            self._container = container
+
+        stats = {"bytes_in": 0, "bytes_out": 0, "first_byte": None}
+        stderr_tail = collections.deque(maxlen=STDERR_TAIL_LINES)
+        errors = []
+        threads = []
+        chunks = queue.Queue(maxsize=STREAM_QUEUE_SIZE) if stdout_sink else None
+
+        def drain_stderr():
+            for line in process.stderr:
+                text = line.decode('utf-8', errors='replace').rstrip()
+                stderr_tail.append(text)
+                if on_stderr_line:
+                    on_stderr_line(text)
+
+        def drain_stdout_lines():
+            for line in process.stdout:
+                if stats["first_byte"] is None:
+                    stats["first_byte"] = time.monotonic() - start_time
+                stats["bytes_out"] += len(line)
+                if on_stdout_line:
+                    on_stdout_line(line.decode('utf-8', errors='replace').rstrip())
+
+        def drain_stdout_chunks():
+            try:
+                while True:
+                    chunk = process.stdout.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if stats["first_byte"] is None:
+                        stats["first_byte"] = time.monotonic() - start_time
+                    stats["bytes_out"] += len(chunk)
+                    chunks.put(chunk)
+            finally:
+                chunks.put(None)
+
+        def feed_stdin():
+            try:
+                while True:
+                    chunk = stdin_source.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    # write() se bloquea si el proceso no consume: contrapresión natural
+                    process.stdin.write(chunk)
+                    stats["bytes_in"] += len(chunk)
+            except BrokenPipeError:
+                # El proceso terminó antes de leer todo; su código de salida lo indica
+                pass
+            except Exception as e:
+                errors.append(e)
+                self._kill_tree(process)
+            finally:
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass
+
+        threads.append(threading.Thread(target=drain_stderr, daemon=True))
+        threads.append(threading.Thread(
+            target=drain_stdout_chunks if stdout_sink else drain_stdout_lines,
+            daemon=True
+        ))
+        if stdin_source is not None:
+            threads.append(threading.Thread(target=feed_stdin, daemon=True))
+        for thread in threads:
+            thread.start()
+
+        try:
+            if stdout_sink:
+                self._consume_chunks(process, chunks, stdout_sink)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            for thread in threads:
+                thread.join()
+            process.wait()
+            process.stdout.close()
+            process.stderr.close()
+            with self._lock:
+                self._process = None
+                self._container = None
+
+        if errors:
+            raise errors[0]
+
+        return {
+            "returncode": process.returncode,
+            "duration": time.monotonic() - start_time,
+            "bytes_in": stats["bytes_in"],
+            "bytes_out": stats["bytes_out"],
+            "first_byte": stats["first_byte"],
+            "stderr": "\n".join(stderr_tail),
+            "cancelled": self._cancelled
+        }
+
+    def cancel(self):
+        """Cancela el proceso en curso terminando todo su árbol de procesos"""
+        with self._lock:
+            self._cancelled = True
+            process = self._process
+        if process is not None:
+            self._kill_tree(process)
+
+    @property
+    def cancelled(self):
+        """Indica si se canceló el proceso"""
+        return self._cancelled
+
+    def _mark_docker_exec(self, command):
+        """
+        Marca con una variable de entorno la herramienta de un docker exec
+
+        Returns:
+            tuple: (comando, (contenedor, marca) o None si no es un docker exec)
+        """
+        if len(command) < 3 or os.path.basename(command[0]) != "docker" or command[1] != "exec":
+            return command, None
+        index = 2
+        while index < len(command) and command[index].startswith("-"):
+            index += 2 if command[index] in DOCKER_EXEC_VALUE_OPTIONS else 1
+        if index >= len(command) - 1:
+            return command, None
+        marker = f"{DOCKER_RUN_MARKER}={uuid.uuid4().hex}"
+        return command[:2] + ["-e", marker] + command[2:], (command[index], marker)
+
+    def _stop_in_container(self, container):
+        """Termina dentro del contenedor la herramienta lanzada con docker exec"""
+        name, marker = container
+        try:
+            subprocess.run(
+                ["docker", "exec", name, "sh", "-c", DOCKER_KILL_SCRIPT, "sh", marker],
+                capture_output=True, timeout=PROCESS_KILL_GRACE
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+
+    def _consume_chunks(self, process, chunks, stdout_sink):
+        """Entrega los bloques de stdout al sink; si falla, termina el proceso"""
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is None:
+                    break
+                stdout_sink(chunk)
+        except Exception:
+            # Terminar el proceso y vaciar la cola para liberar al lector
+            self._kill_tree(process)
+            while chunks.get() is not None:
+                pass
+            raise
+
+    def _group_kwargs(self):
+        """Argumentos de Popen para crear el proceso en su propio grupo"""
+        if os.name == "nt":
+            return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+        return {"start_new_session": True}
+
+    def _kill_tree(self, process):
+        """Termina el proceso y sus descendientes (y, con docker exec, la herramienta en el contenedor)"""
+        if process.poll() is not None:
+            return
+
+        with self._lock:
+            container = self._container if process is self._process else None
+        if container is not None:
+            self._stop_in_container(container)
+
+        if os.name == "nt":
+            subprocess.run(
+                ["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                capture_output=True
+            )
+            return
+
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+            try:
+                process.wait(timeout=PROCESS_KILL_GRACE)
+            except subprocess.TimeoutExpired:
+                os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
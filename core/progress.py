@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import re
+import threading
+import time
+
+from core.pg_client import run_query
+from core.incremental import quote_table
+from config.settings import PROGRESS_LOG_INTERVAL
+
+# Tipos de evento de progreso
+EVENT_START = "start"
+EVENT_PROGRESS = "progress"
+EVENT_TABLE_START = "table_start"
+EVENT_TABLE_DONE = "table_done"
+EVENT_FINISH = "finish"
+
+# Tamaño de la base de datos y de cada tabla de usuario (datos y TOAST, sin
+# índices, que el backup solo guarda como CREATE INDEX). La primera fila, con
+# el esquema vacío, es el tamaño total de la base de datos.
+BACKUP_SIZE_QUERY = (
+    "SELECT '', '', pg_database_size(current_database()) "
+    "UNION ALL "
+    "SELECT schemaname, relname, pg_table_size(relid) FROM pg_catalog.pg_stat_user_tables"
+)
+
+# Líneas de pg_dump -v y pg_restore -v que indican el inicio o el fin del
+# volcado de los datos de una tabla. Con procesos paralelos, cada proceso
+# informa además de los elementos que termina ("finished item 42 TABLE DATA tabla").
+TABLE_START_PATTERN = re.compile(
+    r'^pg_(?:dump|restore): (?:dumping contents of table|processing data for table) "?(.+?)"?$'
+)
+TABLE_DONE_PATTERN = re.compile(r'^pg_(?:dump|restore): finished item \d+ TABLE DATA (.+)$')
+
+# Mensajes informativos de -v, que no se muestran (los errores y avisos sí)
+VERBOSE_INFO_PATTERN = re.compile(r'^pg_(?:dump|restore): (?!error|warning|detail|hint|while|from |\[)')
+
+# Línea con la que psql confirma cada COPY de un backup plain ("COPY 1234")
+PSQL_COPY_DONE_PATTERN = re.compile(r'^COPY \d+$')
+
+# Sentencia COPY de un backup plain: COPY esquema.tabla (columnas) FROM stdin;
+PLAIN_COPY_PATTERN = re.compile(rb'^COPY (.+?) (?:\(|FROM stdin)', re.MULTILINE)
+
+def estimate_backup_size(conn_info, exclude=None, use_docker=None):
+    """
+    Estima el volumen de datos que va a volcar un backup
+
+    Args:
+        conn_info (dict): Componentes de la URL de conexión
+        exclude (iterable): Tablas cuyos datos no se vuelcan, con el nombre
+            cualificado de quote_table (p. ej. las de un backup incremental)
+        use_docker (bool): Forzar el uso de Docker (ver run_query)
+
+    Returns:
+        dict: database_size (bytes), tables (esquema.tabla -> bytes) y total
+            (suma de las tablas que se vuelcan), o None si no se pudo consultar
+    """
+    rows = run_query(conn_info, BACKUP_SIZE_QUERY, use_docker=use_docker)
+    if not rows:
+        return None
+
+    exclude = set(exclude or ())
+    estimate = {"database_size": 0, "tables": {}, "total": 0}
+    for schema, table, size in (row[:3] for row in rows if len(row) >= 3):
+        if not schema:
+            estimate["database_size"] = int(size)
+        elif quote_table(schema, table) not in exclude:
+            estimate["tables"][f"{schema}.{table}"] = int(size)
+
+    # Sin estadísticas de tablas, el tamaño de la base de datos es la mejor referencia
+    estimate["total"] = sum(estimate["tables"].values()) or estimate["database_size"]
+    return estimate
+
+def parse_table_event(line):
+    """
+    Interpreta una línea de stderr de pg_dump -v o pg_restore -v
+
+    Returns:
+        tuple: (EVENT_TABLE_START o EVENT_TABLE_DONE, tabla), o None si la línea
+            no indica el inicio ni el fin de una tabla
+    """
+    match = TABLE_START_PATTERN.match(line)
+    if match:
+        return EVENT_TABLE_START, match.group(1)
+    match = TABLE_DONE_PATTERN.match(line)
+    if match:
+        return EVENT_TABLE_DONE, match.group(1)
+    return None
+
+def track_table_line(tracker, line):
+    """
+    Actualiza el seguimiento con una línea de stderr de pg_dump -v o pg_restore -v
+
+    Returns:
+        bool: True si la línea indicaba el inicio o el fin de una tabla
+    """
+    parsed = parse_table_event(line)
+    if parsed is None:
+        return False
+    kind, table = parsed
+    if kind == EVENT_TABLE_START:
+        tracker.table_started(table)
+    else:
+        tracker.table_finished(table)
+    return True
+
+def is_verbose_info(line):
+    """Indica si una línea de stderr es un mensaje informativo de pg_dump -v o pg_restore -v"""
+    return VERBOSE_INFO_PATTERN.match(line) is not None
+
+def format_duration(seconds):
+    """Duración legible: 45 s, 3 min 20 s, 1 h 05 min"""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds} s"
+    if seconds < 3600:
+        return f"{seconds // 60} min {seconds % 60:02d} s"
+    return f"{seconds // 3600} h {seconds % 3600 // 60:02d} min"
+
+def format_event(event):
+    """
+    Describe un evento de progreso en una línea de texto para el registro
+
+    Returns:
+        str: Mensaje, o None para los eventos que no se registran (inicio y fin)
+    """
+    if event["event"] == EVENT_TABLE_START:
+        size = f" (~{event['size'] / (1024 * 1024):.1f} MB)" if event.get("size") else ""
+        return f"  → Tabla {event['table']}{size}"
+    if event["event"] == EVENT_TABLE_DONE:
+        tables = f", {event['tables_done']}/{event['tables_total']}" if event["tables_total"] else ""
+        return f"  ✓ Tabla {event['table']} ({event['duration']:.1f} s{tables})"
+    if event["event"] != EVENT_PROGRESS:
+        return None
+
+    verb = "leídos" if event["operation"] == "backup" else "consumidos"
+    text = f"  {event['bytes'] / (1024 * 1024):.1f} MB {verb}"
+    if event.get("bytes_written") is not None:
+        text += f", {event['bytes_written'] / (1024 * 1024):.1f} MB escritos"
+    text += f" ({event['rate'] / (1024 * 1024):.1f} MB/s"
+    if event["percent"] is not None:
+        text += f", {event['percent']:.0f}%"
+    if event["eta"] is not None:
+        text += f", quedan ~{format_duration(event['eta'])}"
+    return text + ")"
+
+class ProgressTracker:
+    """
+    Sigue el progreso de un backup o una restauración y emite eventos
+
+    Cada evento es un diccionario con event (start, progress, table_start,
+    table_done o finish), operation, time (epoch), elapsed, bytes, bytes_written,
+    total, percent, rate (bytes/s), eta (segundos), tables_done y tables_total,
+    además de table, size y duration en los eventos de tabla y success en el
+    final. Los eventos de progreso se emiten como mucho cada interval segundos.
+
+    El porcentaje se calcula con el tamaño de las tablas terminadas cuando se
+    conoce (backups: tamaño estimado de cada tabla), con las tablas terminadas
+    si solo se conoce su número, o con los bytes procesados frente a total
+    (restauraciones: posición en el archivo). Puede llamarse desde varios hilos.
+    """
+
+    def __init__(self, operation, on_event, total=None, table_sizes=None, tables_total=None,
+                 sequential=True, interval=PROGRESS_LOG_INTERVAL):
+        """
+        Inicializa el seguimiento
+
+        Args:
+            operation (str): "backup" o "restore"
+            on_event (callable): Recibe cada evento
+            total (int): Total estimado de bytes, o None si se desconoce
+            table_sizes (dict): Tamaño estimado de cada tabla (esquema.tabla)
+            tables_total (int): Número de tablas con datos (por defecto, las de table_sizes)
+            sequential (bool): Las tablas se procesan de una en una, de modo que
+                el inicio de una tabla termina la anterior
+            interval (float): Segundos mínimos entre eventos de progreso
+        """
+        self.operation = operation
+        self.total = total
+        self.table_sizes = table_sizes or {}
+        self.tables_total = tables_total or len(self.table_sizes) or None
+        self.sequential = sequential
+        self.interval = interval
+        self._on_event = on_event
+        self._lock = threading.Lock()
+        self._start_time = time.monotonic()
+        self._last_report = self._start_time
+        self._bytes = 0
+        self._bytes_written = None
+        self._open_tables = {}
+        self._done_size = 0
+        self._tables_done = 0
+        self._finished = False
+
+    def start(self, **info):
+        """Emite el evento de inicio con datos adicionales (método, formato...)"""
+        with self._lock:
+            event = self._event(EVENT_START)
+        event.update(info)
+        self._emit(event)
+
+    def update(self, bytes_done, bytes_written=None):
+        """Actualiza los bytes procesados y emite un evento si ha pasado el intervalo"""
+        now = time.monotonic()
+        with self._lock:
+            self._bytes = bytes_done
+            if bytes_written is not None:
+                self._bytes_written = bytes_written
+            if now - self._last_report < self.interval:
+                return
+            self._last_report = now
+            event = self._event(EVENT_PROGRESS)
+        self._emit(event)
+
+    def table_started(self, table):
+        """Registra el inicio de los datos de una tabla"""
+        events = []
+        with self._lock:
+            if self.sequential:
+                for name in list(self._open_tables):
+                    events.append(self._close_table(name))
+            self._open_tables[table] = (time.monotonic(), self._bytes)
+            event = self._event(EVENT_TABLE_START)
+            event["table"] = table
+            event["size"] = self.table_sizes.get(table)
+            events.append(event)
+        for event in events:
+            self._emit(event)
+
+    def table_finished(self, table=None):
+        """
+        Registra el fin de los datos de una tabla
+
+        Args:
+            table (str): Tabla terminada. Puede ser el nombre sin esquema (como
+                en "finished item ... TABLE DATA tabla"); None termina la tabla
+                abierta más antigua
+        """
+        with self._lock:
+            name = self._match_open_table(table)
+            if name is None:
+                return
+            event = self._close_table(name)
+        self._emit(event)
+
+    def finish(self, success):
+        """Cierra las tablas abiertas y emite el evento final (solo la primera vez)"""
+        events = []
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+            if success:
+                for name in list(self._open_tables):
+                    events.append(self._close_table(name))
+            event = self._event(EVENT_FINISH)
+            event["success"] = success
+            if success:
+                event["percent"] = 100.0
+                event["eta"] = 0.0
+            events.append(event)
+        for event in events:
+            self._emit(event)
+
+    def _match_open_table(self, table):
+        """Busca una tabla abierta por nombre completo o sin esquema; requiere el lock"""
+        if table is None:
+            return next(iter(self._open_tables), None)
+        if table in self._open_tables:
+            return table
+        for name in self._open_tables:
+            if name.endswith("." + table):
+                return name
+        return None
+
+    def _close_table(self, name):
+        """Marca una tabla como terminada y devuelve su evento; requiere el lock"""
+        started, _ = self._open_tables.pop(name)
+        self._tables_done += 1
+        self._done_size += self.table_sizes.get(name, 0)
+        event = self._event(EVENT_TABLE_DONE)
+        event["table"] = name
+        event["duration"] = time.monotonic() - started
+        return event
+
+    def _fraction(self):
+        """Fracción completada entre 0 y 1, o None si no se puede estimar; requiere el lock"""
+        if self.table_sizes and self.total:
+            done = self._done_size
+            if len(self._open_tables) == 1:
+                # La tabla en curso avanza con los bytes volcados desde su inicio
+                name, (_, start_bytes) = next(iter(self._open_tables.items()))
+                done += min(self.table_sizes.get(name, 0), self._bytes - start_bytes)
+            return min(done / self.total, 1.0)
+        if self.total:
+            return min(self._bytes / self.total, 1.0)
+        if self.tables_total:
+            return min(self._tables_done / self.tables_total, 1.0)
+        return None
+
+    def _event(self, kind):
+        """Construye un evento con el estado actual; requiere el lock"""
+        elapsed = time.monotonic() - self._start_time
+        fraction = self._fraction()
+        eta = None
+        if fraction and fraction < 1.0:
+            eta = elapsed * (1.0 - fraction) / fraction
+        return {
+            "event": kind,
+            "operation": self.operation,
+            "time": time.time(),
+            "elapsed": elapsed,
+            "bytes": self._bytes,
+            "bytes_written": self._bytes_written,
+            "total": self.total,
+            # Hasta el evento final no se muestra el 100%: el total es una estimación
+            "percent": None if fraction is None else min(fraction * 100.0, 99.0),
+            "rate": self._bytes / elapsed if elapsed > 0 else 0.0,
+            "eta": eta,
+            "tables_done": self._tables_done,
+            "tables_total": self.tables_total
+        }
+
+    def _emit(self, event):
+        """Entrega un evento fuera del lock, para que el receptor pueda tardar"""
+        if self._on_event:
+            self._on_event(event)
@@ -2,98 +2,754 @@
 # -*- coding: utf-8 -*-
 
 import os
-import subprocess
-from core.system_utils import get_system_info
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from core.system_utils import get_system_info, invalidate_tool_cache
+from core.pg_client import build_client_command, build_container_command
+from core.process_runner import ProcessRunner
+from core.dedup_repository import DedupRepository
+from core.incremental import find_backup_sources
+from core.checksums import load_manifest, manifest_path, find_manifests, verify_backups
+from core.progress import (
+    ProgressTracker, PLAIN_COPY_PATTERN, PSQL_COPY_DONE_PATTERN, format_event, track_table_line, is_verbose_info
+)
+from core.tracing import trace_span
+from core.sql_splitter import (
+    scan_plain_dump, entry_prefix, RangeReader, SECTION_PRE_DATA, SECTION_DATA, SECTION_POST_DATA
+)
+from core.dump_index import load_index
+from core.restore_selection import (
+    describe_selection, parse_toc, schema_selected, select_archive_entries, select_drop_statements,
+    select_plain_entries, table_selected
+)
+from core.compression import detect_compression, is_compression_available, open_decompressed, wrap_decompressed
+from config.settings import (
+    PGRESTORE_PARAMS, DEFAULT_RESTORE_JOBS, STREAM_CHUNK_SIZE, PLAIN_PARALLEL_RESTORE, RESTORE_PROFILES,
+    DEFAULT_RESTORE_PROFILE, POST_RESTORE_ANALYZE, POST_RESTORE_TIMING_TOP
+)
+
+# Cabecera de los archivos generados por pg_dump en formato custom
+ARCHIVE_MAGIC = b"PGDMP"
+
+# Marca que pg_dump escribe al final de un backup plain completo
+DUMP_COMPLETE_MARKER = b"PostgreSQL database dump complete"
+
+# Bytes finales de un backup plain en los que se busca la marca de fin
+VERIFY_TAIL_SIZE = 4096
+
+# Longitud máxima de una línea incompleta que se guarda entre bloques al buscar
+# las sentencias COPY de un backup plain (las filas de datos no se guardan)
+COPY_SCAN_CARRY = 64 * 1024
+
+# Objetos post-data que se crean en paralelo (agrupados por tabla) al restaurar
+# un backup plain: primero índices y restricciones, luego las claves foráneas,
+# que necesitan las claves primarias y únicas a las que hacen referencia
+PARALLEL_POST_DATA_TYPES = ("CONSTRAINT", "INDEX")
+PARALLEL_FOREIGN_KEY_TYPES = ("FK CONSTRAINT",)
+
+
+class _ProgressReader:
+    """
+    Flujo de un backup que informa del progreso de lectura
+    
+    El progreso se calcula con position(), que en un archivo comprimido indica
+    los bytes del archivo consumidos, de modo que el porcentaje es correcto
+    también para backups comprimidos. Con on_copy, se buscan además las
+    sentencias COPY de un backup plain para informar del inicio de cada tabla.
+    """
+    
+    def __init__(self, stream, total_size, position, on_progress, on_copy=None):
+        self.total_size = total_size
+        self._stream = stream
+        self._position = position
+        self._on_progress = on_progress
+        self._on_copy = on_copy
+        self._carry = b""
+    
+    @classmethod
+    def open_file(cls, path, on_progress, on_copy=None):
+        """Abre un archivo de backup descomprimiéndolo si es necesario"""
+        raw = open(path, 'rb')
+        stream = wrap_decompressed(raw, detect_compression(path))
+        return cls(stream, os.path.getsize(path), raw.tell, on_progress, on_copy)
+    
+    def read(self, size=-1):
+        chunk = self._stream.read(size)
+        if not chunk:
+            self._on_progress(self.total_size)
+            return chunk
+        
+        if self._on_copy:
+            self._scan_copies(chunk)
+        self._on_progress(self._position())
+        return chunk
+    
+    def _scan_copies(self, chunk):
+        """Busca sentencias COPY en las líneas completas del bloque"""
+        end = chunk.rfind(b"\n") + 1
+        data = self._carry + chunk[:end] if self._carry else chunk[:end]
+        for match in PLAIN_COPY_PATTERN.finditer(data):
+            self._on_copy(match.group(1).decode('utf-8', errors='replace'))
+        
+        # La línea incompleta se examina con el siguiente bloque; una más larga
+        # que COPY_SCAN_CARRY es una fila de datos
+        rest = chunk[end:] if end else self._carry + chunk
+        self._carry = rest if len(rest) <= COPY_SCAN_CARRY else b""
+    
+    def close(self):
+        self._stream.close()
 
 
 class RestoreManager:
-    def __init__(self, logger_callback=None):
+    def __init__(self, logger_callback=None, progress_callback=None, profile=DEFAULT_RESTORE_PROFILE):
         """
         Inicializa el gestor de restauración
         
         Args:
             logger_callback (callable): Función para registrar mensajes
+            progress_callback (callable): Recibe los eventos de progreso (ver
+                ProgressTracker); se invoca desde los hilos de la restauración
+            profile (str): Perfil de restauración (ver set_profile)
         """
         self.logger = logger_callback if logger_callback else print
+        self.progress_callback = progress_callback
         self.system_info = get_system_info()
+        
+        # Traza por fases del trabajo en curso (ver core/tracing.py), o None
+        self.tracer = None
+        
+        # Parámetros de sesión y modo de las restauraciones (ver set_profile)
+        self.profile_name = None
+        self.profile = None
+        self.set_profile(profile)
+        
+        # Procesos en curso, para poder cancelarlos
+        self._active_runners = set()
+        self._runners_lock = threading.Lock()
+        # Marcado al cancelar: los procesos que se lancen después ya no arrancan
+        self._cancel_event = threading.Event()
     
     def log(self, message):
         """Registra un mensaje usando el callback configurado"""
         if self.logger:
             self.logger(message)
     
-    def restore_with_powershell(self, backup_file, container_name, database_name, username):
+    def set_profile(self, name, single_transaction=None):
         """
-        Ejecuta el script de restauración de PowerShell para Windows
+        Selecciona el perfil de las siguientes restauraciones
         
         Args:
-            backup_file (str): Ruta al archivo de backup
+            name (str): Perfil de RESTORE_PROFILES ("none", "safe", "fast"...)
+            single_transaction (bool): Restaurar en una sola transacción; None =
+                lo que indique el perfil
+        
+        Raises:
+            ValueError: Si el perfil no existe
+        """
+        if name not in RESTORE_PROFILES:
+            raise ValueError(f"Perfil de restauración desconocido: {name}")
+        self.profile_name = name
+        self.profile = dict(RESTORE_PROFILES[name])
+        if single_transaction is not None:
+            self.profile["single_transaction"] = single_transaction
+    
+    def _session_options(self):
+        """Parámetros de sesión del perfil en el formato de PGOPTIONS, o None si no hay"""
+        settings = dict(self.profile["settings"])
+        if self.profile["disable_triggers"]:
+            # Las réplicas lógicas no ejecutan disparadores ni comprueban claves foráneas
+            settings["session_replication_role"] = "replica"
+        if not settings:
+            return None
+        return " ".join(f"-c {name}={value}" for name, value in settings.items())
+    
+    def _log_profile(self):
+        """Registra el perfil con el que se restaura"""
+        details = [f"{name}={value}" for name, value in self.profile["settings"].items()]
+        if self.profile["disable_triggers"]:
+            details.append("sin disparadores ni comprobación de claves foráneas")
+        if self.profile["single_transaction"]:
+            details.append("una sola transacción")
+        self.log(f"Perfil de restauración: {self.profile_name}"
+                 + (f" ({', '.join(details)})" if details else ""))
+    
+    def _remote_script_env(self):
+        """
+        Entorno de los scripts de restauración remota, con los parámetros de sesión del perfil
+        
+        Solo sirve para los scripts que ejecutan psql en el equipo: PGOPTIONS no
+        llega a un psql lanzado con docker exec.
+        """
+        pg_options = self._session_options()
+        if not pg_options:
+            return None
+        env = os.environ.copy()
+        env['PGOPTIONS'] = f"{env.get('PGOPTIONS', '')} {pg_options}".strip()
+        return env
+    
+    def _psql_args(self):
+        """Parámetros de psql para restaurar un backup plain completo con una conexión"""
+        if self.profile["single_transaction"]:
+            # Sin ON_ERROR_STOP, psql seguiría ejecutando sentencias en la transacción abortada
+            return ["-1", "-v", "ON_ERROR_STOP=1"]
+        return []
+    
+    def _on_progress_event(self, event):
+        """Registra un evento de progreso y lo entrega al callback de progreso"""
+        message = format_event(event)
+        if message:
+            self.log(message)
+        if self.progress_callback:
+            self.progress_callback(event)
+    
+    def resolve_backup_path(self, backup_path):
+        """Devuelve la ruta del backup, usando el directorio si se eligió su toc.dat"""
+        if os.path.basename(backup_path) == "toc.dat":
+            return os.path.dirname(backup_path)
+        return backup_path
+    
+    def detect_backup_format(self, backup_path):
+        """
+        Detecta el formato de un backup
+        
+        Args:
+            backup_path (str): Ruta al archivo o directorio de backup
+        
+        Returns:
+            str: "directory", "custom" o "plain", o None si es un directorio
+                sin toc.dat o un archivo que no se puede descomprimir
+        """
+        backup_path = self.resolve_backup_path(backup_path)
+        
+        if os.path.isdir(backup_path):
+            if os.path.isfile(os.path.join(backup_path, "toc.dat")):
+                return "directory"
+            return None
+        
+        # En backups comprimidos se examina el contenido descomprimido
+        compression = detect_compression(backup_path)
+        if not is_compression_available(compression):
+            self.log(f"✗ Error: El backup está comprimido con {compression} y no se puede descomprimir.")
+            if compression == "zstd":
+                self.log("  - Instala el módulo con: pip install zstandard")
+            return None
+        
+        with open_decompressed(backup_path, compression) as f:
+            header = f.read(len(ARCHIVE_MAGIC))
+        
+        return "custom" if header == ARCHIVE_MAGIC else "plain"
+    
+    def detect_backup_compression(self, backup_path):
+        """Devuelve la compresión del backup ("none" para directorios)"""
+        backup_path = self.resolve_backup_path(backup_path)
+        if os.path.isdir(backup_path):
+            return "none"
+        return detect_compression(backup_path)
+    
+    def verify_backup(self, backup_path):
+        """
+        Comprueba que un backup está completo y se puede leer
+        
+        Si el backup tiene manifiesto, basta con comparar sus sumas de
+        comprobación: el manifiesto solo se escribe cuando pg_dump termina bien.
+        Si no, los backups comprimidos se descomprimen enteros, lo que valida sus
+        sumas internas; en formato plain se busca la marca de fin que escribe
+        pg_dump, y en formato custom o directorio se lee el índice con
+        pg_restore -l si está instalado.
+        
+        Args:
+            backup_path (str): Ruta al archivo o directorio de backup
+        
+        Returns:
+            bool: True si el backup es válido, False en caso contrario
+        """
+        if not os.path.exists(backup_path):
+            self.log(f"✗ Error: El backup no existe: {backup_path}")
+            return False
+        
+        if os.path.isfile(manifest_path(backup_path)):
+            return self._verify_with_manifests([backup_path])
+        
+        backup_path = self.resolve_backup_path(backup_path)
+        backup_format = self.detect_backup_format(backup_path)
+        if backup_format is None:
+            self.log(f"✗ Error: No se reconoce el formato del backup: {backup_path}")
+            return False
+        compression = self.detect_backup_compression(backup_path)
+        self.log(f"Formato: {backup_format}, compresión: {compression}")
+        
+        if backup_format != "directory" and (compression != "none" or backup_format == "plain"):
+            tail = self._read_backup_tail(backup_path, compression)
+            if tail is None:
+                return False
+            if backup_format == "plain" and DUMP_COMPLETE_MARKER not in tail:
+                self.log("✗ El backup está incompleto: falta la marca de fin de pg_dump")
+                return False
+        
+        if backup_format in ("custom", "directory"):
+            if not self._verify_archive_toc(backup_path, compression):
+                return False
+        
+        self.log(f"✓ Backup válido: {backup_path}")
+        return True
+    
+    def verify_directory(self, directory, recursive=True):
+        """
+        Comprueba en paralelo todos los backups con manifiesto de un directorio
+        
+        Args:
+            directory (str): Directorio a examinar
+            recursive (bool): Incluir los subdirectorios
+        
+        Returns:
+            bool: True si todos los backups son correctos
+        """
+        backups = find_manifests(directory, recursive)
+        if not backups:
+            self.log(f"✗ No hay backups con manifiesto en {directory}")
+            return False
+        return self._verify_with_manifests(backups)
+    
+    def _verify_with_manifests(self, backups):
+        """Compara las sumas de comprobación de varios backups con sus manifiestos"""
+        start_time = time.monotonic()
+        results = verify_backups(backups)
+        
+        failed = 0
+        for backup_path, problems in results.items():
+            if problems:
+                failed += 1
+                self.log(f"✗ Backup dañado: {backup_path}")
+                for problem in problems:
+                    self.log(f"    {problem}")
+            else:
+                self.log(f"✓ Backup válido: {backup_path}")
+        
+        total_mb = 0.0
+        for path in backups:
+            try:
+                total_mb += load_manifest(path)["size"] / (1024 * 1024)
+            except (ValueError, KeyError, TypeError):
+                # Manifiesto dañado: ya se informó como backup dañado
+                pass
+        elapsed = time.monotonic() - start_time
+        throughput = total_mb / elapsed if elapsed > 0 else 0.0
+        self.log(f"{len(backups) - failed} de {len(backups)} backups válidos "
+                 f"({total_mb:.1f} MB en {elapsed:.1f} s, {throughput:.1f} MB/s)")
+        return failed == 0
+    
+    def _read_backup_tail(self, backup_path, compression):
+        """Lee el backup completo (descomprimiéndolo) y devuelve sus últimos bytes, o None si falla"""
+        tail = b""
+        try:
+            with open_decompressed(backup_path, compression) as f:
+                while True:
+                    chunk = f.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    tail = (tail + chunk)[-VERIFY_TAIL_SIZE:]
+        except Exception as e:
+            self.log(f"✗ Error al leer el backup: {e}")
+            return None
+        return tail
+    
+    def _verify_archive_toc(self, backup_path, compression):
+        """Lee el índice de un backup custom o directorio con pg_restore -l"""
+        if not shutil.which("pg_restore"):
+            self.log("Advertencia: pg_restore no está instalado; no se comprueba el índice del backup")
+            return True
+        
+        entries = []
+        source = None
+        try:
+            if compression != "none":
+                source = open_decompressed(backup_path, compression)
+                command = ["pg_restore", "-l"]
+            else:
+                command = ["pg_restore", "-l", backup_path]
+            
+            result = ProcessRunner().run(
+                command,
+                stdin_source=source,
+                on_stdout_line=lambda line: entries.append(line) if line and not line.startswith(";") else None
+            )
+        except Exception as e:
+            self.log(f"✗ Error al ejecutar pg_restore: {e}")
+            return False
+        finally:
+            if source:
+                source.close()
+        
+        if result["returncode"] != 0:
+            self.log(f"✗ pg_restore no pudo leer el índice del backup:")
+            self.log(result["stderr"])
+            return False
+        
+        self.log(f"Índice del backup: {len(entries)} objetos")
+        return True
+    
+    def _build_pg_restore_args(self, jobs=None):
+        """Construye los parámetros de pg_restore"""
+        if self.profile["single_transaction"]:
+            # pg_restore no admite --single-transaction con varios procesos
+            self.log("pg_restore en una sola transacción (sin procesos paralelos)")
+            return list(PGRESTORE_PARAMS) + ["--single-transaction"]
+        jobs = jobs or DEFAULT_RESTORE_JOBS or os.cpu_count() or 1
+        self.log(f"Procesos paralelos de pg_restore: {jobs}")
+        return list(PGRESTORE_PARAMS) + ["-j", str(jobs)]
+    
+    def _archive_volume(self, backup_path):
+        """Devuelve el volumen (solo lectura) a montar y la ruta del backup en el contenedor"""
+        backup_path = os.path.abspath(backup_path)
+        volume = (os.path.dirname(backup_path), "/backup:ro")
+        return volume, f"/backup/{os.path.basename(backup_path)}"
+    
+    def restore_to_container(self, backup_file, container_name, database_name, username, jobs=None,
+                             selection=None):
+        """
+        Restaura un backup en un contenedor Docker con el método adecuado a su formato
+        
+        Los formatos custom y directorio sin comprimir se restauran en paralelo con
+        pg_restore y los plain sin comprimir, con varias conexiones de psql (ver
+        restore_plain_parallel); el resto se envía por stdin, descomprimiéndolo
+        si es necesario.
+        
+        Args:
+            backup_file (str): Ruta al archivo o directorio de backup
             container_name (str): Nombre del contenedor Docker
             database_name (str): Nombre de la base de datos
             username (str): Nombre de usuario de PostgreSQL
+            jobs (int): Procesos paralelos de pg_restore (por defecto, uno por núcleo)
+            selection (dict): Esquemas y tablas a restaurar (ver
+                core/restore_selection.py), o None para restaurar todo
         
         Returns:
             bool: True si la restauración fue exitosa, False en caso contrario
         """
-        # Obtener la ruta al script PowerShell
-        script_path = self._get_powershell_script_path()
+        self._start_job()
+        with trace_span(self.tracer, "detect_format") as span:
+            backup_format = self.detect_backup_format(backup_file)
+            compression = self.detect_backup_compression(backup_file) if backup_format else None
+            span.set(format=backup_format, compression=compression)
+        if backup_format is None:
+            return False
+        if selection and not self._check_selection_supported(compression):
+            return False
+        self._log_profile()
+        
+        if backup_format in ("custom", "directory") and compression == "none":
+            self.log(f"\n→ Usando pg_restore en paralelo (formato {backup_format})...")
+            return self.restore_archive_to_container(
+                backup_file, container_name, database_name, username, jobs, selection
+            )
         
-        if not os.path.isfile(script_path):
-            self.log(f"✗ Error: No se encontró el script de restauración en {script_path}")
+        if backup_format == "plain" and compression == "none" and (PLAIN_PARALLEL_RESTORE or selection):
+            result = self.restore_plain_parallel(
+                backup_file, jobs, container=(container_name, database_name, username), selection=selection
+            )
+            if result is not None:
+                return result
+        if self._check_cancelled():
             return False
         
-        # Comando para ejecutar el script PowerShell
-        command = [
-            "powershell",
-            "-ExecutionPolicy", "Bypass",
-            "-File", script_path,
-            "-BackupFile", backup_file,
-            "-ContainerName", container_name,
-            "-DatabaseName", database_name,
-            "-Username", username
-        ]
+        if compression != "none":
+            self.log(f"\n→ Restaurando backup comprimido ({compression}) por streaming...")
+        else:
+            self.log("\n→ Restaurando backup por streaming con docker exec...")
+        success = self.restore_stream_to_container(
+            backup_file, container_name, database_name, username
+        )
+        if success and backup_format == "plain":
+            self._analyze_after_restore(jobs, container=(container_name, database_name, username))
+        return success
+    
+    def restore_archive_to_container(self, backup_path, container_name, database_name, username, jobs=None,
+                                     selection=None):
+        """
+        Restaura un backup en formato custom o directorio en un contenedor Docker
         
-        self.log(f"Ejecutando comando: {' '.join(command)}")
+        pg_restore se ejecuta en un contenedor auxiliar que comparte la red del
+        contenedor de destino y lee el backup desde un volumen montado.
+        
+        Args:
+            backup_path (str): Ruta al archivo o directorio de backup
+            container_name (str): Nombre del contenedor Docker
+            database_name (str): Nombre de la base de datos
+            username (str): Nombre de usuario de PostgreSQL
+            jobs (int): Procesos paralelos (por defecto, uno por núcleo)
+            selection (dict): Esquemas y tablas a restaurar, o None para restaurar todo
+        
+        Returns:
+            bool: True si la restauración fue exitosa, False en caso contrario
+        """
+        return self._restore_archive(
+            backup_path, jobs, selection, container=(container_name, database_name, username)
+        )
+    
+    def restore_archive_with_connection_url(self, backup_path, connection_url, jobs=None, selection=None):
+        """
+        Restaura un backup en formato custom o directorio en un servidor PostgreSQL
+        
+        Usa pg_restore local si está instalado y, si no, un contenedor temporal.
+        
+        Args:
+            backup_path (str): Ruta al archivo o directorio de backup
+            connection_url (str): URL de conexión PostgreSQL para el destino
+            jobs (int): Procesos paralelos (por defecto, uno por núcleo)
+            selection (dict): Esquemas y tablas a restaurar, o None para restaurar todo
+        
+        Returns:
+            bool: True si la restauración fue exitosa, False en caso contrario
+        """
+        conn_info = self._parse_connection_url(connection_url)
+        if not conn_info:
+            self.log(f"✗ Error: URL de conexión inválida: {connection_url}")
+            return False
+        
+        return self._restore_archive(backup_path, jobs, selection, conn_info=conn_info)
+    
+    def _restore_archive(self, backup_path, jobs, selection, conn_info=None, container=None):
+        """
+        Restaura un backup custom o directorio, completo o solo los objetos seleccionados
+        
+        Con selection, pg_restore recibe con -L la lista de los objetos
+        seleccionados y de los que dependen de ellos (ver _write_selection_list).
         
+        Returns:
+            bool: True si la restauración fue exitosa, False en caso contrario
+        """
+        backup_path = self.resolve_backup_path(backup_path)
+        list_file = None
         try:
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                universal_newlines=True
-            )
+            if selection:
+                selected = self._write_selection_list(backup_path, selection, conn_info, container)
+                if selected is None:
+                    return False
+                list_file, tables_total = selected
             
-            # Leer y mostrar la salida en tiempo real
-            while True:
-                output = process.stdout.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output:
-                    self.log(output.strip())
+            sources = find_backup_sources(backup_path)
+            if sources and len(sources) > 1:
+                return self.restore_incremental_chain(
+                    backup_path, sources, jobs, conn_info, container, selection, list_file
+                )
             
-            # Capturar errores
-            rc = process.poll()
-            if rc != 0:
-                stderr = process.stderr.read()
-                if stderr:
-                    self.log(f"Error: {stderr}")
-                self.log(f"✗ El script de restauración falló con código {rc}")
-                return False
-            
-            self.log("✓ Restauración completada exitosamente")
+            if not selection:
+                tables_total = self._count_table_data(backup_path)
+            command, env = self._build_archive_command(
+                backup_path, self._build_pg_restore_args(jobs), conn_info, container, list_file
+            )
+            return self._run_restore_command(command, env, tables_total=tables_total)
+        finally:
+            if list_file:
+                shutil.rmtree(os.path.dirname(list_file), ignore_errors=True)
+    
+    def _check_selection_supported(self, compression):
+        """Comprueba que un backup admite la restauración selectiva (debe estar sin comprimir)"""
+        if compression == "none":
             return True
+        self.log(f"✗ Error: La restauración selectiva necesita un backup sin comprimir "
+                 f"(este usa {compression}); descomprímelo antes de restaurarlo")
+        return False
+    
+    def _write_selection_list(self, backup_path, selection, conn_info=None, container=None):
+        """
+        Escribe la lista de pg_restore -L con los objetos seleccionados de un backup
+        
+        El índice del backup se lee con pg_restore -l -v, que incluye las
+        dependencias de cada objeto (ver select_archive_entries). La lista se
+        guarda en un directorio temporal que se monta en el contenedor si
+        pg_restore se ejecuta con Docker.
+        
+        Args:
+            backup_path (str): Ruta al archivo o directorio de backup
+            selection (dict): Esquemas y tablas a restaurar
+            conn_info (dict): Servidor de destino, o None
+            container (tuple): (contenedor, base de datos, usuario) si no hay conn_info
+        
+        Returns:
+            tuple: (ruta de la lista, tablas con datos seleccionadas), o None si
+                no se pudo leer el índice o ningún objeto coincide
+        """
+        command, env = self._build_archive_command(backup_path, ["-l", "-v"], conn_info, container)
+        lines = []
+        errors = []
+        with trace_span(self.tracer, "select") as span:
+            runner = self._new_runner()
+            try:
+                result = runner.run(
+                    command, env, on_stdout_line=lines.append, on_stderr_line=errors.append
+                )
+            except OSError as e:
+                self.log(f"✗ Error al leer el índice del backup: {e}")
+                return None
+            finally:
+                self._release_runner(runner)
+            if result["cancelled"]:
+                self.log("✗ Restauración cancelada")
+                return None
+            if result["returncode"] != 0:
+                for line in errors:
+                    self.log(line)
+                self.log(f"✗ Error al leer el índice del backup con código {result['returncode']}")
+                return None
             
-        except Exception as e:
-            self.log(f"✗ Error al ejecutar el script: {e}")
-            return False
+            entries = parse_toc(lines)
+            selected = select_archive_entries(entries, selection)
+            tables_total = sum(1 for entry in selected if entry["type"] == "TABLE DATA")
+            span.set(entries=len(entries), selected=len(selected), tables=tables_total)
+        
+        if not selected:
+            self.log(f"✗ Error: Ningún objeto del backup coincide con {describe_selection(selection)}")
+            return None
+        self.log(f"Restauración selectiva ({describe_selection(selection)}): {len(selected)} de "
+                 f"{len(entries)} objetos, {tables_total} tablas con datos")
+        
+        list_file = os.path.join(tempfile.mkdtemp(prefix="pg_restore_list_"), "restore.list")
+        with open(list_file, 'w', encoding='utf-8') as f:
+            for entry in selected:
+                f.write(entry["line"] + "\n")
+        return list_file, tables_total
     
-    def restore_with_bash(self, backup_file, container_name, database_name, username):
+    def _build_archive_command(self, backup_path, args, conn_info=None, container=None, list_file=None):
         """
-        Ejecuta el script de restauración Bash para macOS/Linux
+        Construye el comando de pg_restore para un backup custom o directorio
         
         Args:
-            backup_file (str): Ruta al archivo de backup
+            backup_path (str): Ruta al archivo o directorio de backup
+            args (list): Parámetros de pg_restore
+            conn_info (dict): Servidor de destino (pg_restore local o, si no está, Docker)
+            container (tuple): (contenedor, base de datos, usuario) de destino si no hay conn_info
+            list_file (str): Lista de objetos a restaurar (pg_restore -L), o None
+        
+        Returns:
+            tuple: (comando, entorno) listos para _run_restore_command
+        """
+        volume, container_path = self._archive_volume(backup_path)
+        volumes = [volume]
+        container_args = list(args)
+        if list_file:
+            volumes.append((os.path.dirname(os.path.abspath(list_file)), "/restore-list:ro"))
+            container_args += ["-L", f"/restore-list/{os.path.basename(list_file)}"]
+            args = args + ["-L", list_file]
+        
+        if conn_info is None:
+            container_name, database_name, username = container
+            command = build_container_command(
+                container_name, database_name, username, "pg_restore",
+                container_args + [container_path],
+                volumes=volumes,
+                pg_options=self._session_options()
+            )
+            return command, None
+        
+        if shutil.which("pg_restore"):
+            return build_client_command(
+                conn_info, "pg_restore", args + [backup_path], pg_options=self._session_options()
+            )
+        
+        self.log("pg_restore local no encontrado, usando Docker...")
+        return build_client_command(
+            conn_info, "pg_restore", container_args + [container_path],
+            use_docker=True,
+            volumes=volumes,
+            pg_options=self._session_options()
+        )
+    
+    def restore_incremental_chain(self, backup_path, sources, jobs=None, conn_info=None, container=None,
+                                  selection=None, list_file=None):
+        """
+        Restaura un backup incremental junto con los backups anteriores de los que depende
+        
+        El último backup aporta el esquema, los datos de las tablas modificadas y
+        las secuencias; el resto de tablas se cargan desde el backup que contiene
+        sus datos. El orden es el de pg_restore: primero las tablas (pre-data),
+        luego todos los datos y al final índices y restricciones (post-data), de
+        modo que las claves foráneas se validan con todos los datos cargados.
+        
+        Args:
+            backup_path (str): Ruta al último backup de la cadena
+            sources (dict): Backup -> tablas cuyos datos contiene (ver find_backup_sources)
+            jobs (int): Procesos paralelos de pg_restore (por defecto, uno por núcleo)
+            conn_info (dict): Servidor de destino
+            container (tuple): (contenedor, base de datos, usuario) de destino si no hay conn_info
+            selection (dict): Esquemas y tablas a restaurar, o None para restaurar todo
+            list_file (str): Lista de pg_restore -L del último backup con los
+                objetos seleccionados (ver _write_selection_list)
+        
+        Returns:
+            bool: True si la restauración fue exitosa, False en caso contrario
+        """
+        directory = os.path.dirname(backup_path)
+        latest = os.path.basename(backup_path)
+        parallel_args = self._build_pg_restore_args(jobs)
+        # -c no es compatible con la restauración solo de datos
+        data_args = [arg for arg in parallel_args if arg not in ("-c", "--if-exists")]
+        
+        steps = [(latest, parallel_args + ["--section=pre-data"], "esquema")]
+        steps.append((latest, data_args + ["--section=data"], "datos modificados"))
+        for source, tables in sorted(sources.items()):
+            if source == latest:
+                continue
+            by_schema = {}
+            for schema, table in tables:
+                if selection and not (schema_selected(selection, schema) or table_selected(selection, schema, table)):
+                    continue
+                by_schema.setdefault(schema, []).append(table)
+            for schema, names in sorted(by_schema.items()):
+                args = data_args + ["--data-only", "-n", schema]
+                for name in names:
+                    args += ["-t", name]
+                steps.append((source, args, f"{len(names)} tablas sin cambios de {schema}"))
+        steps.append((latest, data_args + ["--section=post-data"], "índices y restricciones"))
+        
+        self.log(f"→ Restaurando cadena incremental: {len(sources)} backups, {len(steps)} pasos")
+        for index, (name, args, label) in enumerate(steps, 1):
+            if self._check_cancelled():
+                return False
+            path = os.path.join(directory, name)
+            if not os.path.exists(path):
+                self.log(f"✗ Error: falta el backup {name} de la cadena incremental")
+                return False
+            
+            self.log(f"\n[{index}/{len(steps)}] {name}: {label}")
+            command, env = self._build_archive_command(
+                path, args, conn_info, container, list_file if name == latest else None
+            )
+            with trace_span(self.tracer, f"step {index}", backup=name, label=label):
+                if not self._run_restore_command(
+                    command, env,
+                    success_message=f"✓ Paso {index}/{len(steps)} completado",
+                    failure_message=f"✗ Error en el paso {index}/{len(steps)} de la cadena incremental"
+                ):
+                    return False
+        
+        self.log("✓ Restauración incremental completada exitosamente")
+        return True
+    
+    def _stream_tool_args(self, backup_format):
+        """Devuelve la herramienta y sus parámetros para restaurar desde stdin"""
+        if backup_format == "custom":
+            # pg_restore no admite procesos paralelos leyendo desde stdin
+            self.log("Advertencia: un archivo custom comprimido se restaura sin procesos paralelos")
+            args = list(PGRESTORE_PARAMS)
+            if self.profile["single_transaction"]:
+                args.append("--single-transaction")
+            return "pg_restore", args
+        return "psql", self._psql_args()
+    
+    def restore_stream_to_container(self, backup_file, container_name, database_name, username):
+        """
+        Restaura un backup en un contenedor Docker enviándolo por stdin
+        
+        El archivo se envía a docker exec -i, sin copiarlo dentro del contenedor,
+        y la carga empieza desde el primer bloque. Los backups comprimidos con gzip
+        o zstd se descomprimen al vuelo, sin crear una copia temporal descomprimida.
+        
+        Args:
+            backup_file (str): Ruta al archivo de backup (plain o custom)
             container_name (str): Nombre del contenedor Docker
             database_name (str): Nombre de la base de datos
             username (str): Nombre de usuario de PostgreSQL
@@ -101,74 +757,751 @@ class RestoreManager:
         Returns:
             bool: True si la restauración fue exitosa, False en caso contrario
         """
-        # Obtener la ruta al script Bash
-        script_path = self._get_bash_script_path()
+        backup_format = self.detect_backup_format(backup_file)
+        if backup_format not in ("plain", "custom"):
+            self.log(f"✗ Error: Formato de backup no admitido para streaming: {backup_file}")
+            return False
+        
+        tool, args = self._stream_tool_args(backup_format)
+        command = build_container_command(
+            container_name, database_name, username, tool, args, interactive=True,
+            pg_options=self._session_options()
+        )
+        
+        return self._run_restore_command(command, stdin_file=backup_file)
+    
+    def restore_stream_with_connection_url(self, backup_file, conn_info):
+        """
+        Restaura un backup en un servidor PostgreSQL enviándolo por stdin
         
-        if not os.path.isfile(script_path):
-            self.log(f"✗ Error: No se encontró el script de restauración en {script_path}")
+        Los backups comprimidos con gzip o zstd se descomprimen al vuelo, sin
+        crear una copia temporal descomprimida.
+        
+        Args:
+            backup_file (str): Ruta al archivo de backup (plain o custom)
+            conn_info (dict): Componentes de la URL de conexión
+        
+        Returns:
+            bool: True si la restauración fue exitosa, False en caso contrario
+        """
+        backup_format = self.detect_backup_format(backup_file)
+        if backup_format not in ("plain", "custom"):
+            self.log(f"✗ Error: Formato de backup no admitido para streaming: {backup_file}")
             return False
         
-        # Asegurar que el script tiene permisos de ejecución
+        tool, args = self._stream_tool_args(backup_format)
+        use_docker = shutil.which(tool) is None
+        if use_docker:
+            self.log(f"{tool} local no encontrado, usando Docker...")
+        
+        command, env = build_client_command(
+            conn_info, tool, args, use_docker=use_docker, interactive=True,
+            pg_options=self._session_options()
+        )
+        if env is not None:
+            env['PGCLIENTENCODING'] = 'UTF8'
+        
+        return self._run_restore_command(command, env, stdin_file=backup_file)
+    
+    def restore_plain_parallel(self, backup_file, jobs=None, conn_info=None, container=None, selection=None):
+        """
+        Restaura un backup plain sin comprimir con varias conexiones de psql
+        
+        El backup se divide por secciones con su índice (ver core/dump_index.py)
+        o, si no tiene, analizándolo en una pasada (ver core/sql_splitter.py).
+        La definición de los objetos se aplica con una conexión, como con psql -f;
+        los datos de las tablas se cargan a la vez, empezando por los más grandes.
+        Después se crean en paralelo los índices y restricciones y luego las
+        claves foráneas (los de una misma tabla, en orden, con la misma conexión);
+        los que fallan se reintentan uno a uno, por si chocaron con otro objeto.
+        El resto de objetos post-data (disparadores, reglas...) se aplica al
+        final con una conexión, en el orden del backup.
+        
+        Con selection solo se envían los objetos seleccionados (ver
+        select_plain_entries), precedidos de sus sentencias DROP si el backup
+        se hizo con pg_dump -c; en ese caso el backup no se restaura nunca
+        entero con una sola conexión, aunque jobs sea 1. Si el perfil pide una
+        sola transacción, los objetos seleccionados se envían juntos con psql -1.
+        
+        Args:
+            backup_file (str): Ruta al backup plain sin comprimir
+            jobs (int): Conexiones simultáneas (por defecto, una por núcleo)
+            conn_info (dict): Componentes de la URL de conexión (psql local)
+            container (tuple): (contenedor, base de datos, usuario) si no hay conn_info
+            selection (dict): Esquemas y tablas a restaurar, o None para restaurar todo
+        
+        Returns:
+            bool: True si la restauración fue exitosa, False en caso contrario, o
+                None si el backup debe restaurarse con una sola conexión (un solo
+                proceso, sin cabeceras de pg_dump o con órdenes como \\connect)
+        """
+        jobs = jobs or DEFAULT_RESTORE_JOBS or os.cpu_count() or 1
+        single_transaction = self.profile["single_transaction"]
+        if (jobs <= 1 or single_transaction) and not selection:
+            return None
+        
+        start_time = time.monotonic()
+        with trace_span(self.tracer, "split_dump") as span:
+            dump = load_index(backup_file)
+            if dump is None:
+                try:
+                    with open(backup_file, 'rb') as f:
+                        dump = scan_plain_dump(f)
+                except OSError as e:
+                    self.log(f"✗ Error al leer el backup: {e}")
+                    return False
+            span.set(bytes=dump["size"], entries=len(dump["entries"]), indexed="version" in dump)
+        # Analizar un backup grande lleva tiempo: no se lanza ningún psql si se canceló mientras
+        if self._check_cancelled():
+            return False
+        
+        entries = dump["entries"]
+        if selection:
+            if dump["serial_only"] or not entries:
+                self.log(f"✗ Error: No se puede restaurar una parte del backup: "
+                         f"{dump['serial_only'] or 'no tiene las cabeceras de los objetos de pg_dump'}")
+                return False
+            entries = select_plain_entries(dump, selection)
+            if not entries:
+                self.log(f"✗ Error: Ningún objeto del backup coincide con {describe_selection(selection)}")
+                return False
+            self.log(f"Restauración selectiva ({describe_selection(selection)}): "
+                     f"{len(entries)} de {len(dump['entries'])} objetos")
+        
+        pre_entries = [entry for entry in entries if entry["section"] == SECTION_PRE_DATA]
+        data_entries = [entry for entry in entries if entry["section"] == SECTION_DATA]
+        post_entries = [entry for entry in entries if entry["section"] == SECTION_POST_DATA]
+        if dump["serial_only"]:
+            self.log(f"El backup {dump['serial_only']}: se restaura con una sola conexión")
+            return None
+        if not data_entries and not post_entries and not selection:
+            return None
+        if not dump["complete"]:
+            self.log("Advertencia: el backup no tiene la marca de fin de pg_dump; puede estar incompleto")
+        
+        tables = [entry for entry in data_entries if entry["type"] == "TABLE DATA"]
+        data_size = sum(entry["length"] for entry in data_entries)
+        mode = "en una sola transacción" if single_transaction else f"en paralelo ({jobs} conexiones)"
+        self.log(f"\n→ Restaurando backup plain {mode}: "
+                 f"{len(tables)} tablas ({data_size / (1024 * 1024):.1f} MB de datos) y "
+                 f"{len(post_entries)} objetos post-data")
+        
+        if selection:
+            try:
+                with open(backup_file, 'rb') as f:
+                    drops = select_drop_statements(f.read(dump["entries"][0]["offset"]), selection, entries)
+            except OSError as e:
+                self.log(f"✗ Error al leer el backup: {e}")
+                return False
+            pre_data_parts = [dump["preamble"], drops]
+            for entry in pre_entries:
+                settings = entry_prefix(dump, entry)[len(dump["preamble"]):]
+                pre_data_parts += [settings, (entry["offset"], entry["length"])]
+            total = sum(entry["length"] for entry in entries)
+        else:
+            pre_data_parts = [(0, dump["data_offset"])]
+            total = dump["end_offset"]
+        pre_data_size = sum(part[1] for part in pre_data_parts if not isinstance(part, bytes))
+        
+        tracker = ProgressTracker(
+            "restore", self._on_progress_event,
+            total=total, tables_total=len(tables), sequential=False
+        )
+        tracker.start(jobs=jobs)
+        state = {"bytes": 0, "stop": False, "cancelled": False}
+        failed = []
+        retry = []
+        lock = threading.Lock()
+        
+        def on_read(size):
+            with lock:
+                state["bytes"] += size
+                done = state["bytes"]
+            tracker.update(done)
+        
+        def run(parts, label, stop_on_error=True, single_transaction=False):
+            if self._cancel_event.is_set():
+                state["stop"] = state["cancelled"] = True
+            if state["stop"]:
+                return False
+            return self._run_sql_piece(
+                backup_file, parts, label, conn_info, container, stop_on_error, on_read, state,
+                single_transaction
+            )
+        
+        def entry_parts(entry):
+            settings = entry_prefix(dump, entry)[len(dump["preamble"]):]
+            return [settings, (entry["offset"], entry["length"])]
+        
+        def run_entry(entry, phase):
+            started = time.monotonic()
+            prefix = entry_prefix(dump, entry)
+            ok = run([prefix, (entry["offset"], entry["length"])], self._entry_label(entry))
+            with lock:
+                timings.append((time.monotonic() - started, phase, self._entry_label(entry)))
+            return ok
+        
+        def load_data(entry):
+            is_table = entry["type"] == "TABLE DATA"
+            if is_table:
+                tracker.table_started(entry["table"])
+            if run_entry(entry, "datos"):
+                if is_table:
+                    tracker.table_finished(entry["table"])
+            elif not state["stop"]:
+                with lock:
+                    failed.append(entry)
+        
+        def create_group(entries, phase):
+            for entry in entries:
+                if not run_entry(entry, phase) and not state["stop"]:
+                    with lock:
+                        retry.append(entry)
+        
+        def analyze(entry):
+            started = time.monotonic()
+            label = f"ANALYZE {entry['schema']}.{entry['name']}"
+            ok = run([f"ANALYZE {self._quote_table(entry)};\n".encode('utf-8')], label)
+            with lock:
+                timings.append((time.monotonic() - started, "ANALYZE", label))
+                if not ok:
+                    analyze_failed.append(label)
+        
+        timings = []
+        analyze_failed = []
+        table_sizes = {entry["table"]: entry["length"] for entry in tables}
+        success = False
         try:
-            os.chmod(script_path, 0o755)
+            if single_transaction:
+                parts = list(pre_data_parts)
+                for entry in data_entries + post_entries:
+                    parts += entry_parts(entry)
+                with trace_span(self.tracer, "single_transaction", bytes=total):
+                    if not run(parts, "backup", single_transaction=True):
+                        self.log("✗ Restauración cancelada" if state["cancelled"]
+                                 else "✗ La restauración falló y no se aplicó ningún cambio")
+                        return False
+            else:
+                with trace_span(self.tracer, "pre-data", bytes=pre_data_size):
+                    if not run(pre_data_parts, "pre-data", stop_on_error=False):
+                        self.log("✗ Restauración cancelada" if state["cancelled"]
+                                 else "✗ La restauración falló al crear los objetos del backup")
+                        return False
+                
+                with trace_span(self.tracer, "data", bytes=data_size, tables=len(tables)):
+                    with ThreadPoolExecutor(max_workers=jobs) as executor:
+                        list(executor.map(load_data, sorted(data_entries, key=lambda entry: -entry["length"])))
+                
+                with trace_span(self.tracer, "post-data", objects=len(post_entries)) as span:
+                    for types, phase in ((PARALLEL_POST_DATA_TYPES, "índices y restricciones"),
+                                         (PARALLEL_FOREIGN_KEY_TYPES, "claves foráneas")):
+                        groups = self._group_by_table(post_entries, types, table_sizes)
+                        phase_start = time.monotonic()
+                        with ThreadPoolExecutor(max_workers=jobs) as executor:
+                            list(executor.map(lambda group: create_group(group, phase), groups))
+                        if groups:
+                            self.log(f"✓ {phase.capitalize()}: {sum(len(group) for group in groups)} objetos "
+                                     f"en {time.monotonic() - phase_start:.1f} s")
+                    
+                    for entry in sorted(retry, key=lambda entry: entry["offset"]):
+                        self.log(f"Reintentando {self._entry_label(entry)}...")
+                        if not run_entry(entry, "reintentos") and not state["stop"]:
+                            failed.append(entry)
+                    
+                    parallel_types = PARALLEL_POST_DATA_TYPES + PARALLEL_FOREIGN_KEY_TYPES
+                    parts = [dump["preamble"]]
+                    for entry in post_entries:
+                        if entry["type"] not in parallel_types:
+                            parts += entry_parts(entry)
+                    if len(parts) > 1 and not run(parts, "post-data", stop_on_error=False) and not state["stop"]:
+                        self.log("✗ La restauración falló al crear los disparadores, reglas y demás objetos post-data")
+                        return False
+                    span.set(slowest=self._slowest_objects(timings, ("índices y restricciones", "claves foráneas")))
+                
+                if state["cancelled"]:
+                    self.log("✗ Restauración cancelada")
+                    return False
+                if state["stop"]:
+                    return False
+                
+                if failed:
+                    self.log(f"✗ La restauración falló en {len(failed)} objetos:")
+                    for entry in failed:
+                        self.log(f"  - {self._entry_label(entry)}")
+                    return False
+            
+            # Sin estadísticas, el planificador elegiría planes malos hasta el
+            # siguiente autovacuum; las tablas más grandes se analizan primero
+            if POST_RESTORE_ANALYZE and tables:
+                with trace_span(self.tracer, "analyze", tables=len(tables)) as span:
+                    phase_start = time.monotonic()
+                    with ThreadPoolExecutor(max_workers=jobs) as executor:
+                        list(executor.map(analyze, sorted(tables, key=lambda entry: -entry["length"])))
+                    span.set(slowest=self._slowest_objects(timings, ("ANALYZE",)))
+                if state["cancelled"]:
+                    self.log("✗ Restauración cancelada")
+                    return False
+                self.log(f"✓ ANALYZE: {len(tables)} tablas en {time.monotonic() - phase_start:.1f} s")
+                if analyze_failed:
+                    self.log(f"Advertencia: no se pudieron analizar {len(analyze_failed)} tablas; "
+                             f"ejecuta ANALYZE antes de usar la base de datos")
+            
+            self._log_slowest_objects(timings)
+            success = True
+            tracker.finish(True)
+            self.log(f"✓ Restauración completada exitosamente en {time.monotonic() - start_time:.1f} s")
+            return True
+        finally:
+            if not success:
+                tracker.finish(False)
+    
+    def _run_sql_piece(self, backup_file, parts, label, conn_info, container, stop_on_error, on_read, state,
+                       single_transaction=False):
+        """
+        Envía una parte de un backup plain a una conexión nueva de psql
+        
+        Args:
+            backup_file (str): Ruta al backup
+            parts (list): Partes a enviar (ver RangeReader)
+            label (str): Objeto o sección, para los mensajes de psql
+            conn_info (dict): Componentes de la URL de conexión (psql local o, si
+                no está, Docker), o None
+            container (tuple): (contenedor, base de datos, usuario) si no hay conn_info
+            stop_on_error (bool): Detenerse en el primer error (ON_ERROR_STOP)
+            on_read (callable): Recibe los bytes del backup leídos
+            state (dict): Estado compartido; se marca stop (y cancelled si se
+                canceló) para no lanzar más conexiones
+            single_transaction (bool): Ejecutar todo en una transacción (psql -1)
+        
+        Returns:
+            bool: True si psql terminó sin errores
+        """
+        args = ["-X", "-q"]
+        if stop_on_error or single_transaction:
+            args += ["-v", "ON_ERROR_STOP=1"]
+        if single_transaction:
+            args.append("-1")
+        pg_options = self._session_options()
+        if conn_info is not None:
+            command, env = build_client_command(
+                conn_info, "psql", args, use_docker=shutil.which("psql") is None, interactive=True,
+                pg_options=pg_options
+            )
+            if env is not None:
+                env['PGCLIENTENCODING'] = 'UTF8'
+        else:
+            container_name, database_name, username = container
+            command = build_container_command(
+                container_name, database_name, username, "psql", args, interactive=True,
+                pg_options=pg_options
+            )
+            env = None
+        
+        runner = self._new_runner()
+        source = None
+        try:
+            source = RangeReader(backup_file, parts, on_read)
+            
+            def on_stdout_line(line):
+                if not PSQL_COPY_DONE_PATTERN.match(line):
+                    self.log(f"[{label}] {line}")
+            
+            result = runner.run(
+                command, env,
+                stdin_source=source,
+                on_stdout_line=on_stdout_line,
+                on_stderr_line=lambda line: self.log(f"[{label}] {line}")
+            )
+        except FileNotFoundError as e:
+            self.log(f"✗ Error al ejecutar la restauración: {e}")
+            if e.filename == command[0]:
+                invalidate_tool_cache()
+                self._log_missing_tool(command[0])
+            state["stop"] = True
+            return False
         except Exception as e:
-            self.log(f"Advertencia: No se pudieron establecer permisos de ejecución: {e}")
+            self.log(f"✗ Error al ejecutar la restauración ({label}): {e}")
+            return False
+        finally:
+            if source:
+                source.close()
+            self._release_runner(runner)
         
-        # Comando para ejecutar el script Bash
-        command = [
-            script_path,
-            "-f", backup_file,
-            "-c", container_name,
-            "-d", database_name,
-            "-u", username
-        ]
+        if result["cancelled"]:
+            state["stop"] = state["cancelled"] = True
+            return False
+        return result["returncode"] == 0
+    
+    def _analyze_after_restore(self, jobs=None, conn_info=None, container=None):
+        """
+        Ejecuta ANALYZE de toda la base de datos tras restaurar un backup plain con una sola conexión
         
-        self.log(f"Ejecutando comando: {' '.join(command)}")
+        restore_plain_parallel analiza las tablas que restaura; psql -f, los
+        scripts y el streaming terminan sin estadísticas. vacuumdb --analyze-only
+        reparte las tablas entre jobs conexiones. Si falla solo se advierte: los
+        datos ya están restaurados.
+        
+        Args:
+            jobs (int): Conexiones simultáneas (por defecto, una por núcleo)
+            conn_info (dict): Componentes de la URL de conexión (vacuumdb local o Docker)
+            container (tuple): (contenedor, base de datos, usuario) si no hay conn_info
+        """
+        if not POST_RESTORE_ANALYZE:
+            return
+        jobs = jobs or DEFAULT_RESTORE_JOBS or os.cpu_count() or 1
+        args = ["--analyze-only", "-j", str(jobs)]
+        if conn_info is not None:
+            command, env = build_client_command(
+                conn_info, "vacuumdb", args, use_docker=shutil.which("vacuumdb") is None
+            )
+        else:
+            command = build_container_command(*container, "vacuumdb", args)
+            env = None
         
+        self.log(f"\n→ Ejecutando ANALYZE (vacuumdb --analyze-only -j {jobs})...")
+        start_time = time.monotonic()
+        runner = self._new_runner()
         try:
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                universal_newlines=True
+            with trace_span(self.tracer, "analyze", jobs=jobs) as span:
+                result = runner.run(command, env, on_stderr_line=lambda line: self.log(f"  {line}"))
+                span.set(returncode=result["returncode"])
+        except OSError as e:
+            self.log(f"Advertencia: no se pudo ejecutar vacuumdb ({e}); ejecuta ANALYZE antes de usar la base de datos")
+            return
+        finally:
+            self._release_runner(runner)
+        
+        if result["cancelled"]:
+            self.log("Advertencia: ANALYZE cancelado; ejecuta ANALYZE antes de usar la base de datos")
+        elif result["returncode"] != 0:
+            self.log("Advertencia: ANALYZE falló; ejecuta ANALYZE antes de usar la base de datos")
+        else:
+            self.log(f"✓ ANALYZE: {time.monotonic() - start_time:.1f} s")
+    
+    def _quote_table(self, entry):
+        """Nombre entrecomillado de la tabla de un objeto TABLE DATA (pg_dump escribe el nombre sin comillas)"""
+        return ".".join('"' + name.replace('"', '""') + '"' for name in (entry["schema"], entry["name"]))
+    
+    def _slowest_objects(self, timings, phases=None):
+        """
+        Objetos que más tardaron en restaurarse
+        
+        Args:
+            timings (list): Tuplas (segundos, fase, objeto)
+            phases (tuple): Fases a considerar, o None para todas
+        
+        Returns:
+            list: Las POST_RESTORE_TIMING_TOP tuplas más lentas, de más a menos
+        """
+        selected = [timing for timing in timings if phases is None or timing[1] in phases]
+        return sorted(selected, reverse=True)[:POST_RESTORE_TIMING_TOP]
+    
+    def _log_slowest_objects(self, timings):
+        """Registra los objetos que más tardaron, con su fase (datos, índices, ANALYZE...)"""
+        slowest = self._slowest_objects(timings)
+        if not slowest:
+            return
+        self.log("\nObjetos más lentos:")
+        for seconds, phase, label in slowest:
+            self.log(f"  {seconds:8.2f} s  {label} ({phase})")
+    
+    def _entry_label(self, entry):
+        """Tipo y nombre de un objeto de un backup plain, para los mensajes"""
+        name = f"{entry['schema']}.{entry['name']}" if entry["schema"] else entry["name"]
+        return f"{entry['type']} {name}"
+    
+    def _group_by_table(self, entries, types, table_sizes=None):
+        """
+        Agrupa por tabla los objetos post-data de los tipos indicados
+        
+        Los objetos de una misma tabla se crean en orden con la misma conexión,
+        para que no esperen unos por los bloqueos de otros. Los grupos de las
+        tablas con más datos se reparten primero (sus índices son los más
+        lentos) y, a igual tamaño, los que tienen más objetos.
+        
+        Args:
+            entries (list): Objetos post-data
+            types (tuple): Tipos de objeto a agrupar
+            table_sizes (dict): Bytes de datos de cada tabla (esquema.tabla)
+        
+        Returns:
+            list: Listas de objetos en el orden del backup
+        """
+        groups = {}
+        for entry in entries:
+            if entry["type"] in types:
+                groups.setdefault(entry["table"] or self._entry_label(entry), []).append(entry)
+        
+        def weight(item):
+            table, group = item
+            return (table_sizes or {}).get(table.replace('"', ''), 0), len(group)
+        return [group for _, group in sorted(groups.items(), key=weight, reverse=True)]
+    
+    def restore_from_repository(self, repository_path, name, connection_url=None,
+                                container_name=None, database_name=None, username=None):
+        """
+        Restaura un backup de un repositorio deduplicado
+        
+        Los fragmentos se leen, comprueban y reensamblan en streaming hacia psql o
+        pg_restore, sin reconstruir el backup en disco.
+        
+        Args:
+            repository_path (str): Directorio del repositorio
+            name (str): Nombre del backup en el repositorio
+            connection_url (str): URL de conexión del servidor de destino
+            container_name (str): Contenedor Docker de destino (si no hay URL)
+            database_name (str): Base de datos del contenedor
+            username (str): Usuario de PostgreSQL del contenedor
+        
+        Returns:
+            bool: True si la restauración fue exitosa, False en caso contrario
+        """
+        self._start_job()
+        repository = DedupRepository(repository_path, logger_callback=self.log)
+        try:
+            with trace_span(self.tracer, "open_repository_backup"):
+                reader = repository.open_backup(name)
+        except (OSError, ValueError) as e:
+            self.log(f"✗ Error: No se pudo abrir el backup {name}: {e}")
+            return False
+        
+        backup_format = reader.manifest.get("format", "plain")
+        tool, args = self._stream_tool_args(backup_format)
+        
+        conn_info = container = None
+        if connection_url:
+            conn_info = self._parse_connection_url(connection_url)
+            if not conn_info:
+                reader.close()
+                return False
+            use_docker = shutil.which(tool) is None
+            if use_docker:
+                self.log(f"{tool} local no encontrado, usando Docker...")
+            command, env = build_client_command(
+                conn_info, tool, args, use_docker=use_docker, interactive=True,
+                pg_options=self._session_options()
             )
+            if env is not None:
+                env['PGCLIENTENCODING'] = 'UTF8'
+        else:
+            container = (container_name, database_name, username)
+            command = build_container_command(
+                container_name, database_name, username, tool, args, interactive=True,
+                pg_options=self._session_options()
+            )
+            env = None
+        
+        self._log_profile()
+        self.log(f"→ Restaurando {name} desde el repositorio ({len(reader.manifest['chunks'])} fragmentos)")
+        success = self._run_restore_command(command, env, stdin_reader=reader)
+        if success and backup_format == "plain":
+            self._analyze_after_restore(conn_info=conn_info, container=container)
+        return success
+    
+    def _count_table_data(self, backup_path):
+        """
+        Cuenta las tablas con datos de un backup custom o directorio sin comprimir
+        
+        Sirve para calcular el progreso de pg_restore, que lee el archivo por su
+        cuenta. Solo se consulta si pg_restore está instalado localmente.
+        
+        Returns:
+            int: Entradas TABLE DATA del índice, o None si no se pudo leer
+        """
+        if not shutil.which("pg_restore"):
+            return None
+        
+        count = [0]
+        def count_line(line):
+            if " TABLE DATA " in line and not line.startswith(";"):
+                count[0] += 1
+        
+        with trace_span(self.tracer, "read_toc") as span:
+            runner = self._new_runner()
+            try:
+                result = runner.run(["pg_restore", "-l", backup_path], on_stdout_line=count_line)
+            except OSError:
+                return None
+            finally:
+                self._release_runner(runner)
+            span.set(tables=count[0])
+        return count[0] if result["returncode"] == 0 else None
+    
+    def _run_restore_command(self, command, env=None, stdin_file=None, stdin_reader=None,
+                             success_message="✓ Restauración completada exitosamente",
+                             failure_message="✗ La restauración falló", tables_total=None):
+        """
+        Ejecuta un comando de restauración mostrando su salida en tiempo real
+        
+        stdout y stderr se leen a la vez en hilos separados, por lo que un proceso
+        que escribe mucho en cualquiera de los dos nunca queda bloqueado.
+        
+        El progreso de un backup enviado por stdin se calcula con la posición en
+        el archivo. Las tablas se siguen con los mensajes de pg_restore --verbose
+        (que no se muestran) o, con psql, con las sentencias COPY del backup y
+        la confirmación "COPY n" de cada una.
+        
+        Args:
+            command (list): Comando a ejecutar
+            env (dict): Variables de entorno para el proceso
+            stdin_file (str): Backup a enviar por stdin (se descomprime si es necesario)
+            stdin_reader (object): Flujo abierto a enviar por stdin, con read(),
+                tell(), close() y size (p. ej. DedupReader)
+            success_message (str): Mensaje a registrar si el comando termina bien
+            failure_message (str): Mensaje a registrar si el comando falla
+            tables_total (int): Tablas con datos a restaurar, si se conocen
+        
+        Returns:
+            bool: True si la restauración fue exitosa, False en caso contrario
+        """
+        self.log(f"Ejecutando comando: {' '.join(command)}")
+        
+        # psql confirma cada COPY en orden; pg_restore sin -j solo anuncia el inicio de cada tabla
+        is_psql = "psql" in command
+        tracker = ProgressTracker(
+            "restore", self._on_progress_event,
+            tables_total=tables_total,
+            sequential=not is_psql and "-j" not in command
+        )
+        success = False
+        runner = self._new_runner()
+        source = None
+        try:
+            on_copy = tracker.table_started if is_psql else None
+            if stdin_file:
+                source = _ProgressReader.open_file(stdin_file, tracker.update, on_copy)
+            elif stdin_reader:
+                source = _ProgressReader(
+                    stdin_reader, stdin_reader.size, stdin_reader.tell, tracker.update, on_copy
+                )
+            # El total se conoce al abrir el backup; sin stdin, el progreso es por tablas
+            tracker.total = source.total_size if source else None
+            tracker.start()
+            
+            def on_stdout_line(line):
+                if is_psql and PSQL_COPY_DONE_PATTERN.match(line):
+                    tracker.table_finished()
+                else:
+                    self.log(line)
+            
+            def on_stderr_line(line):
+                if not track_table_line(tracker, line) and not is_verbose_info(line):
+                    self.log(line)
             
-            # Leer y mostrar la salida en tiempo real
-            while True:
-                output = process.stdout.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output:
-                    self.log(output.strip())
+            with trace_span(self.tracer, self._tool_name(command), total=tracker.total) as span:
+                result = runner.run(
+                    command, env,
+                    stdin_source=source,
+                    on_stdout_line=on_stdout_line,
+                    on_stderr_line=on_stderr_line
+                )
+                # Con stdin, bytes_in son los bytes descomprimidos enviados al proceso
+                span.set(bytes_in=result["bytes_in"] if source else None, returncode=result["returncode"])
             
-            # Capturar errores
-            rc = process.poll()
-            if rc != 0:
-                stderr = process.stderr.read()
-                if stderr:
-                    self.log(f"Error: {stderr}")
-                self.log(f"✗ El script de restauración falló con código {rc}")
+            if result["cancelled"]:
+                self.log("✗ Restauración cancelada")
                 return False
             
-            self.log("✓ Restauración completada exitosamente")
+            if result["returncode"] != 0:
+                self.log(f"{failure_message} con código {result['returncode']}")
+                return False
+            
+            success = True
+            tracker.finish(True)
+            self.log(success_message)
             return True
             
+        except FileNotFoundError as e:
+            self.log(f"✗ Error al ejecutar la restauración: {e}")
+            if e.filename == command[0]:
+                invalidate_tool_cache()
+                self._log_missing_tool(command[0])
+            return False
         except Exception as e:
-            self.log(f"✗ Error al ejecutar el script: {e}")
+            self.log(f"✗ Error al ejecutar la restauración: {e}")
             return False
+        finally:
+            if not success:
+                tracker.finish(False)
+            if source:
+                source.close()
+            elif stdin_reader:
+                stdin_reader.close()
+            self._release_runner(runner)
     
-    def restore_with_connection_url(self, backup_file, connection_url):
+    def _tool_name(self, command):
+        """Herramienta que ejecuta un comando de restauración (nombre de su fase en la traza)"""
+        for tool in ("pg_restore", "psql"):
+            if tool in command:
+                return tool
+        return os.path.basename(command[0])
+    
+    def _log_missing_tool(self, tool):
+        """Indica cómo instalar una herramienta cliente de PostgreSQL que no se encontró"""
+        if tool not in ("psql", "pg_restore"):
+            return
+        
+        self.log(f"✗ El comando '{tool}' no fue encontrado. Necesitas instalar el cliente PostgreSQL.")
+        if self.system_info["is_windows"]:
+            self.log("  - Para Windows: Descarga PostgreSQL desde https://www.postgresql.org/download/windows/")
+        elif self.system_info["is_macos"]:
+            self.log("  - Para macOS: brew install postgresql")
+        else:
+            self.log("  - Para Linux: sudo apt-get install postgresql-client")
+    
+    def cancel(self):
+        """
+        Cancela las restauraciones en curso de este gestor (y sus procesos hijos)
+        
+        La cancelación dura hasta que empieza la siguiente restauración, de modo
+        que también detiene los procesos que aún no se habían lanzado.
+        """
+        with self._runners_lock:
+            self._cancel_event.set()
+            runners = list(self._active_runners)
+        for runner in runners:
+            runner.cancel()
+    
+    def _start_job(self):
+        """Descarta la cancelación de una restauración anterior al empezar otra"""
+        self._cancel_event.clear()
+    
+    def _check_cancelled(self):
+        """Registra la cancelación entre fases; devuelve True si se canceló"""
+        if not self._cancel_event.is_set():
+            return False
+        self.log("✗ Restauración cancelada")
+        return True
+    
+    def _new_runner(self):
+        """Crea un ProcessRunner registrado para poder cancelarlo (ya cancelado si se canceló el gestor)"""
+        runner = ProcessRunner()
+        with self._runners_lock:
+            if self._cancel_event.is_set():
+                runner.cancel()
+            self._active_runners.add(runner)
+        return runner
+    
+    def _release_runner(self, runner):
+        """Deja de seguir un ProcessRunner terminado"""
+        with self._runners_lock:
+            self._active_runners.discard(runner)
+    
+    def restore_with_connection_url(self, backup_file, connection_url, jobs=None, selection=None):
         """
         Restaura un backup directamente a un servidor PostgreSQL usando una URL de conexión
         
         Args:
             backup_file (str): Ruta al archivo de backup
             connection_url (str): URL de conexión PostgreSQL para el destino
+            jobs (int): Procesos paralelos de pg_restore (por defecto, uno por núcleo)
+            selection (dict): Esquemas y tablas a restaurar (ver
+                core/restore_selection.py), o None para restaurar todo
         
         Returns:
             bool: True si la restauración fue exitosa, False en caso contrario
         """
+        self._start_job()
         # Analizar la URL de conexión
         conn_info = self._parse_connection_url(connection_url)
         if not conn_info:
@@ -178,10 +1511,52 @@ class RestoreManager:
         self.log(f"→ Restaurando backup a servidor remoto: {conn_info['host']}:{conn_info['port']}/{conn_info['database']}")
         
         # Verificar el archivo de backup
-        if not os.path.isfile(backup_file):
+        if not os.path.exists(backup_file):
             self.log(f"✗ Error: El archivo de backup no existe: {backup_file}")
             return False
         
+        # Los backups comprimidos se descomprimen al vuelo hacia psql o pg_restore
+        with trace_span(self.tracer, "detect_format") as span:
+            backup_format = self.detect_backup_format(backup_file)
+            compression = self.detect_backup_compression(backup_file) if backup_format else None
+            span.set(format=backup_format, compression=compression)
+        if backup_format is None:
+            return False
+        if selection and not self._check_selection_supported(compression):
+            return False
+        self._log_profile()
+        if compression != "none":
+            self.log(f"Backup comprimido detectado ({compression}, contenido {backup_format})")
+            success = self.restore_stream_with_connection_url(backup_file, conn_info)
+            if success and backup_format == "plain":
+                self._analyze_after_restore(jobs, conn_info=conn_info)
+            return success
+        
+        # Los formatos custom y directorio se restauran en paralelo con pg_restore
+        if backup_format in ("custom", "directory"):
+            self.log(f"Formato de backup detectado: {backup_format}")
+            return self.restore_archive_with_connection_url(backup_file, connection_url, jobs, selection)
+        
+        # Los backups plain se cargan en paralelo con psql local (con Docker, cada
+        # conexión arrancaría un contenedor, que solo compensa para restaurar una parte)
+        if selection or (PLAIN_PARALLEL_RESTORE and shutil.which("psql")):
+            result = self.restore_plain_parallel(backup_file, jobs, conn_info=conn_info, selection=selection)
+            if result is not None:
+                return result
+        if self._check_cancelled():
+            return False
+        
+        success = self._restore_plain_serial(backup_file, connection_url, conn_info)
+        if success:
+            self._analyze_after_restore(jobs, conn_info=conn_info)
+        return success
+    
+    def _restore_plain_serial(self, backup_file, connection_url, conn_info):
+        """Restaura un backup plain con una sola conexión (script del sistema o psql -f)"""
+        # Los scripts no admiten la restauración en una sola transacción
+        if self.profile["single_transaction"]:
+            return self._restore_remote_psql(backup_file, conn_info)
+        
         # Ejecutar restauración según el sistema operativo
         if self.system_info["is_windows"]:
             # Primero intentar usar el script PowerShell específico
@@ -190,7 +1565,7 @@ class RestoreManager:
                 return self._restore_with_remote_powershell_script(backup_file, connection_url, script_path)
             else:
                 self.log(f"Script específico no encontrado, usando método estándar...")
-                return self._restore_remote_windows(backup_file, conn_info)
+                return self._restore_remote_psql(backup_file, conn_info)
         else:  # macOS o Linux
             # Primero intentar usar el script Bash específico
             script_path = self._get_remote_bash_script_path()
@@ -198,124 +1573,17 @@ class RestoreManager:
                 return self._restore_with_remote_bash_script(backup_file, connection_url, script_path)
             else:
                 self.log(f"Script específico no encontrado, usando método estándar...")
-                return self._restore_remote_unix(backup_file, conn_info)
-    
-    def _restore_remote_windows(self, backup_file, conn_info):
-        """Restauración remota en Windows usando psql"""
-        # Configurar entorno
-        env = os.environ.copy()
-        env['PGPASSWORD'] = conn_info['password']
-        
-        # Construir comando
-        command = [
-            "psql",
-            "-h", conn_info['host'],
-            "-p", conn_info['port'],
-            "-U", conn_info['username'],
-            "-d", conn_info['database'],
-            "-f", backup_file
-        ]
-        
-        self.log(f"Ejecutando comando: {' '.join(command)}")
-        
-        try:
-            # Ejecutar comando
-            process = subprocess.Popen(
-                command,
-                env=env,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                universal_newlines=True
-            )
-            
-            # Leer y mostrar la salida en tiempo real
-            while True:
-                output = process.stdout.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output:
-                    self.log(output.strip())
-            
-            # Capturar errores
-            rc = process.poll()
-            if rc != 0:
-                stderr = process.stderr.read()
-                if stderr:
-                    self.log(f"Error: {stderr}")
-                self.log(f"✗ La restauración falló con código {rc}")
-                return False
-            
-            self.log("✓ Restauración remota completada exitosamente")
-            return True
-            
-        except Exception as e:
-            self.log(f"✗ Error al ejecutar la restauración remota: {e}")
-            # Verificar si psql está instalado
-            if isinstance(e, FileNotFoundError):
-                self.log("✗ El comando 'psql' no fue encontrado. Necesitas instalar el cliente PostgreSQL.")
-                self.log("  - Para Windows: Descarga PostgreSQL desde https://www.postgresql.org/download/windows/")
-            return False
+                return self._restore_remote_psql(backup_file, conn_info)
     
-    def _restore_remote_unix(self, backup_file, conn_info):
-        """Restauración remota en macOS/Linux usando psql"""
-        # Configurar entorno
-        env = os.environ.copy()
-        env['PGPASSWORD'] = conn_info['password']
-        
-        # Construir comando
-        command = [
-            "psql",
-            "-h", conn_info['host'],
-            "-p", conn_info['port'],
-            "-U", conn_info['username'],
-            "-d", conn_info['database'],
-            "-f", backup_file
-        ]
-        
-        self.log(f"Ejecutando comando: {' '.join(command)}")
-        
-        try:
-            # Ejecutar comando
-            process = subprocess.Popen(
-                command,
-                env=env,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                universal_newlines=True
-            )
-            
-            # Leer y mostrar la salida en tiempo real
-            while True:
-                output = process.stdout.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output:
-                    self.log(output.strip())
-            
-            # Capturar errores
-            rc = process.poll()
-            if rc != 0:
-                stderr = process.stderr.read()
-                if stderr:
-                    self.log(f"Error: {stderr}")
-                self.log(f"✗ La restauración falló con código {rc}")
-                return False
-            
-            self.log("✓ Restauración remota completada exitosamente")
-            return True
-            
-        except Exception as e:
-            self.log(f"✗ Error al ejecutar la restauración remota: {e}")
-            # Verificar si psql está instalado
-            if isinstance(e, FileNotFoundError):
-                self.log("✗ El comando 'psql' no fue encontrado. Necesitas instalar el cliente PostgreSQL.")
-                if self.system_info["is_macos"]:
-                    self.log("  - Para macOS: brew install postgresql")
-                else:
-                    self.log("  - Para Linux: sudo apt-get install postgresql-client")
-            return False
+    def _restore_remote_psql(self, backup_file, conn_info):
+        """Restauración remota usando psql local"""
+        command, env = build_client_command(
+            conn_info, "psql", self._psql_args() + ["-f", backup_file], pg_options=self._session_options()
+        )
+        return self._run_restore_command(
+            command, env,
+            success_message="✓ Restauración remota completada exitosamente"
+        )
     
     def _parse_connection_url(self, connection_url):
         """Analiza una URL de conexión PostgreSQL y devuelve sus componentes"""
@@ -347,40 +1615,11 @@ class RestoreManager:
             "-ConnectionURL", connection_url
         ]
         
-        self.log(f"Ejecutando comando: {' '.join(command)}")
-        
-        try:
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                universal_newlines=True
-            )
-            
-            # Leer y mostrar la salida en tiempo real
-            while True:
-                output = process.stdout.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output:
-                    self.log(output.strip())
-            
-            # Capturar errores
-            rc = process.poll()
-            if rc != 0:
-                stderr = process.stderr.read()
-                if stderr:
-                    self.log(f"Error: {stderr}")
-                self.log(f"✗ El script de restauración remota falló con código {rc}")
-                return False
-            
-            self.log("✓ Restauración remota completada exitosamente")
-            return True
-            
-        except Exception as e:
-            self.log(f"✗ Error al ejecutar el script: {e}")
-            return False
+        return self._run_restore_command(
+            command, self._remote_script_env(),
+            success_message="✓ Restauración remota completada exitosamente",
+            failure_message="✗ El script de restauración remota falló"
+        )
     
     def _restore_with_remote_bash_script(self, backup_file, connection_url, script_path):
         """Restaura a un servidor remoto usando un script Bash dedicado"""
@@ -398,40 +1637,11 @@ class RestoreManager:
             "-c", connection_url
         ]
         
-        self.log(f"Ejecutando comando: {' '.join(command)}")
-        
-        try:
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                universal_newlines=True
-            )
-            
-            # Leer y mostrar la salida en tiempo real
-            while True:
-                output = process.stdout.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output:
-                    self.log(output.strip())
-            
-            # Capturar errores
-            rc = process.poll()
-            if rc != 0:
-                stderr = process.stderr.read()
-                if stderr:
-                    self.log(f"Error: {stderr}")
-                self.log(f"✗ El script de restauración remota falló con código {rc}")
-                return False
-            
-            self.log("✓ Restauración remota completada exitosamente")
-            return True
-            
-        except Exception as e:
-            self.log(f"✗ Error al ejecutar el script: {e}")
-            return False
+        return self._run_restore_command(
+            command, self._remote_script_env(),
+            success_message="✓ Restauración remota completada exitosamente",
+            failure_message="✗ El script de restauración remota falló"
+        )
     
     def _get_remote_powershell_script_path(self):
         """Obtiene la ruta al script PowerShell de restauración remota"""
@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Restauración selectiva: qué objetos de un backup restaurar para recuperar
+# unos esquemas o unas tablas (con patrones glob: ventas.*, public.log_2024_*).
+#
+# Con cada tabla se restauran los objetos que dependen de ella (datos, índices,
+# restricciones, valores por defecto, disparadores, reglas, políticas y
+# comentarios) y las secuencias que usa. En los formatos custom y directorio,
+# las dependencias se leen del índice del archivo (pg_restore -l -v) y el
+# resultado es una lista para pg_restore -L; en los backups plain, que no
+# guardan dependencias, se deducen de los nombres y las sentencias de cada
+# objeto (ver core/sql_splitter.py).
+
+import fnmatch
+import re
+
+from core.sql_splitter import SECTION_PRE_DATA, TABLE_PATTERN
+
+# Objetos que se seleccionan por su nombre con un patrón de tabla
+TABLE_TYPES = ("TABLE", "FOREIGN TABLE", "VIEW", "MATERIALIZED VIEW", "SEQUENCE")
+
+# Objetos que se restauran con las tablas de las que dependen
+DEPENDENT_TYPES = {
+    "TABLE DATA", "TABLE ATTACH", "DEFAULT", "CONSTRAINT", "FK CONSTRAINT", "CHECK CONSTRAINT",
+    "INDEX", "INDEX ATTACH", "STATISTICS", "TRIGGER", "RULE", "POLICY", "ROW SECURITY", "COMMENT",
+    "SEQUENCE OWNED BY", "SEQUENCE SET", "MATERIALIZED VIEW DATA"
+}
+
+# Tipos de objeto de pg_restore -l, de más a menos palabras para reconocer
+# primero "TABLE DATA" que "TABLE"
+TOC_TYPES = sorted([
+    "ACCESS METHOD", "ACL", "AGGREGATE", "BLOB", "BLOB DATA", "BLOBS", "CAST", "CHECK CONSTRAINT",
+    "COLLATION", "COMMENT", "CONSTRAINT", "CONVERSION", "DATABASE", "DATABASE PROPERTIES",
+    "DEFAULT", "DEFAULT ACL", "DOMAIN", "ENCODING", "EVENT TRIGGER", "EXTENSION", "FK CONSTRAINT",
+    "FOREIGN DATA WRAPPER", "FOREIGN SERVER", "FOREIGN TABLE", "FUNCTION", "INDEX", "INDEX ATTACH",
+    "LARGE OBJECT", "MATERIALIZED VIEW", "MATERIALIZED VIEW DATA", "OPERATOR", "OPERATOR CLASS",
+    "OPERATOR FAMILY", "POLICY", "PROCEDURAL LANGUAGE", "PROCEDURE", "PUBLICATION",
+    "PUBLICATION TABLE", "PUBLICATION TABLES IN SCHEMA", "ROW SECURITY", "RULE", "SCHEMA",
+    "SEARCHPATH", "SECURITY LABEL", "SEQUENCE", "SEQUENCE OWNED BY", "SEQUENCE SET", "SERVER",
+    "SHELL TYPE", "STATISTICS", "STDSTRINGS", "SUBSCRIPTION", "TABLE", "TABLE ATTACH", "TABLE DATA",
+    "TEXT SEARCH CONFIGURATION", "TEXT SEARCH DICTIONARY", "TEXT SEARCH PARSER",
+    "TEXT SEARCH TEMPLATE", "TRANSFORM", "TRIGGER", "TYPE", "USER MAPPING", "VIEW"
+], key=lambda toc_type: -len(toc_type))
+
+# Línea de pg_restore -l: "215; 1259 16390 TABLE public clientes postgres"
+TOC_LINE_PATTERN = re.compile(r'^(\d+); (\d+) (\d+) (.*)$')
+
+# Dependencias de la entrada anterior con pg_restore -l -v: ";	depends on: 214 216"
+TOC_DEPENDS_PATTERN = re.compile(r'^;\s*depends on:((?: \d+)*)\s*$')
+
+# Secuencia de un valor por defecto: nextval('public.clientes_id_seq'::regclass)
+NEXTVAL_PATTERN = re.compile(r"nextval\('([^']+)'")
+
+# Tabla de la que depende una secuencia: OWNED BY public.clientes.id
+OWNED_BY_PATTERN = re.compile(r'OWNED BY (\S+)\.[^.\s;]+;?$')
+
+# Esquema de un DROP SCHEMA y nombres esquema.objeto de las sentencias DROP de pg_dump -c
+DROP_SCHEMA_PATTERN = re.compile(r'^DROP SCHEMA (?:IF EXISTS )?(\S+?);')
+QUALIFIED_NAME_PATTERN = re.compile(r'(?:"[^"]+"|[\w$]+)\.(?:"[^"]+"|[\w$]+)')
+
+def parse_patterns(text):
+    """Patrones separados por comas o espacios (p. ej. "public.clientes, ventas.*")"""
+    return [pattern for pattern in re.split(r'[,\s]+', text or "") if pattern]
+
+def make_selection(schemas=None, tables=None):
+    """
+    Construye una selección de esquemas y tablas
+
+    Args:
+        schemas (list): Patrones de esquema (todos sus objetos, como pg_restore -n)
+        tables (list): Patrones esquema.tabla o tabla (de cualquier esquema)
+
+    Returns:
+        dict: schemas y tables, o None si no se seleccionó nada (restauración completa)
+    """
+    schemas = [pattern for pattern in schemas or [] if pattern]
+    tables = [pattern for pattern in tables or [] if pattern]
+    if not schemas and not tables:
+        return None
+    return {"schemas": schemas, "tables": tables}
+
+def describe_selection(selection):
+    """Descripción de una selección para los mensajes"""
+    parts = []
+    if selection["schemas"]:
+        parts.append(f"esquemas {', '.join(selection['schemas'])}")
+    if selection["tables"]:
+        parts.append(f"tablas {', '.join(selection['tables'])}")
+    return " y ".join(parts)
+
+def _unquote(name):
+    """Nombre sin las comillas de los identificadores de PostgreSQL"""
+    return name.replace('"', '') if name else name
+
+def schema_selected(selection, schema):
+    """Indica si un esquema coincide con algún patrón de esquema"""
+    return any(fnmatch.fnmatchcase(schema, _unquote(pattern)) for pattern in selection["schemas"])
+
+def _in_selected_schema(selection, entry):
+    """Indica si un objeto es un esquema seleccionado o pertenece a uno"""
+    if entry["type"] == "SCHEMA":
+        return schema_selected(selection, entry["name"])
+    return bool(entry["schema"]) and schema_selected(selection, entry["schema"])
+
+def table_selected(selection, schema, name):
+    """Indica si una tabla coincide con algún patrón esquema.tabla o tabla"""
+    for pattern in selection["tables"]:
+        target = f"{schema}.{name}" if "." in pattern else name
+        if fnmatch.fnmatchcase(target, _unquote(pattern)):
+            return True
+    return False
+
+def parse_toc(lines):
+    """
+    Analiza la salida de pg_restore -l (con -v, también las dependencias)
+
+    Returns:
+        list: Entradas con id, type, schema, name, owner, line y deps (ids)
+    """
+    entries = []
+    for line in lines:
+        line = line.rstrip("\r\n")
+        depends = TOC_DEPENDS_PATTERN.match(line)
+        if depends and entries:
+            entries[-1]["deps"] = [int(value) for value in depends.group(1).split()]
+            continue
+        match = TOC_LINE_PATTERN.match(line)
+        if not match:
+            continue
+
+        rest = match.group(4)
+        toc_type = next((toc_type for toc_type in TOC_TYPES if rest.startswith(toc_type + " ")), rest.split(" ")[0])
+        words = rest[len(toc_type) + 1:].split(" ")
+        # El esquema es "-" en los objetos globales; el nombre puede tener espacios
+        schema = words[0] if words else ""
+        entries.append({
+            "id": int(match.group(1)),
+            "type": toc_type,
+            "schema": "" if schema == "-" else schema,
+            "name": " ".join(words[1:-1]) if len(words) > 2 else (words[1] if len(words) > 1 else ""),
+            "owner": words[-1] if len(words) > 2 else "",
+            "line": line,
+            "deps": []
+        })
+    return entries
+
+def _owner_table(entry):
+    """Tabla a la que pertenece un objeto por su nombre ("tabla objeto" o "TABLE tabla")"""
+    name = entry["name"]
+    if entry["type"] == "COMMENT":
+        kind, _, target = name.partition(" ")
+        if kind == "TABLE":
+            return f"{entry['schema']}.{target}"
+        if kind == "COLUMN":
+            return f"{entry['schema']}.{target.rsplit('.', 1)[0]}"
+        return None
+    return f"{entry['schema']}.{name.split(' ', 1)[0]}"
+
+def select_archive_entries(entries, selection):
+    """
+    Selecciona las entradas de un backup custom o directorio
+
+    Se incluyen los objetos de los esquemas y las tablas seleccionados, los
+    objetos que dependen de ellos (las claves foráneas, solo las de las tablas
+    seleccionadas) y las secuencias que usan.
+
+    Args:
+        entries (list): Entradas de parse_toc
+        selection (dict): Selección de make_selection
+
+    Returns:
+        list: Entradas seleccionadas, en el orden del índice
+    """
+    by_id = {entry["id"]: entry for entry in entries}
+    included = set()
+    tables = set()
+    for entry in entries:
+        if _in_selected_schema(selection, entry):
+            included.add(entry["id"])
+        elif entry["type"] in TABLE_TYPES and table_selected(selection, entry["schema"], entry["name"]):
+            included.add(entry["id"])
+        if entry["id"] in included and entry["type"] in TABLE_TYPES:
+            tables.add(f"{entry['schema']}.{entry['name']}")
+
+    changed = True
+    while changed:
+        changed = False
+        for entry in entries:
+            if entry["id"] in included:
+                # Las secuencias de los valores por defecto y las columnas identidad
+                for dependency in entry["deps"]:
+                    required = by_id.get(dependency)
+                    if required and required["type"] == "SEQUENCE" and dependency not in included:
+                        included.add(dependency)
+                        changed = True
+                continue
+            if entry["type"] == "SEQUENCE":
+                # Las columnas identidad: la secuencia (ALTER TABLE ... ADD
+                # GENERATED ... AS IDENTITY) depende de su tabla
+                if any(dependency in included and by_id[dependency]["type"] in TABLE_TYPES
+                       for dependency in entry["deps"] if dependency in by_id):
+                    included.add(entry["id"])
+                    changed = True
+                continue
+            if entry["type"] not in DEPENDENT_TYPES:
+                continue
+            if not any(dependency in included for dependency in entry["deps"]) \
+                    and _owner_table(entry) not in tables:
+                continue
+            if entry["type"] == "FK CONSTRAINT" and _owner_table(entry) not in tables:
+                continue
+            included.add(entry["id"])
+            changed = True
+
+    return [entry for entry in entries if entry["id"] in included]
+
+def select_plain_entries(dump, selection):
+    """
+    Selecciona los objetos de un backup plain (ver scan_plain_dump)
+
+    Los backups plain no guardan dependencias: la tabla de cada objeto se
+    deduce de su nombre ("tabla restricción", "TABLE tabla") o de su primera
+    sentencia (CREATE INDEX ... ON tabla, ALTER TABLE tabla, OWNED BY tabla.columna)
+    y las secuencias, de los valores por defecto con nextval() y de las
+    columnas identidad (ALTER TABLE tabla ... ADD GENERATED ... AS IDENTITY).
+
+    Returns:
+        list: Objetos seleccionados, en el orden del backup
+    """
+    entries = dump["entries"]
+    tables = set()
+    for entry in entries:
+        if entry["type"] in TABLE_TYPES and (
+            _in_selected_schema(selection, entry)
+            or table_selected(selection, entry["schema"], entry["name"])
+        ):
+            tables.add(f"{entry['schema']}.{entry['name']}")
+
+    def entry_table(entry):
+        statement = entry["statement"] or ""
+        if entry["type"] == "SEQUENCE":
+            # Las secuencias de las columnas identidad se crean con ALTER TABLE
+            # tabla ALTER COLUMN ... ADD GENERATED ... AS IDENTITY
+            match = TABLE_PATTERN.match(statement)
+            if match:
+                return _unquote(match.group(1))
+        if entry["type"] in TABLE_TYPES + ("TABLE DATA",):
+            return f"{entry['schema']}.{entry['name']}"
+        if entry["type"] in ("SEQUENCE OWNED BY",):
+            match = OWNED_BY_PATTERN.search(statement)
+            return _unquote(match.group(1)) if match else None
+        if entry["type"] == "INDEX" or entry["section"] != SECTION_PRE_DATA:
+            match = TABLE_PATTERN.match(statement)
+            if match and entry["type"] not in ("TRIGGER", "RULE", "POLICY", "ROW SECURITY"):
+                return _unquote(match.group(1))
+        return _owner_table(entry)
+
+    # Secuencias de los valores por defecto, de las columnas identidad y las
+    # asociadas con OWNED BY a las tablas seleccionadas
+    sequences = set()
+    for entry in entries:
+        if entry_table(entry) not in tables:
+            continue
+        if entry["type"] == "DEFAULT":
+            match = NEXTVAL_PATTERN.search(entry["statement"] or "")
+            if match:
+                sequence = _unquote(match.group(1))
+                sequences.add(sequence if "." in sequence else f"{entry['schema']}.{sequence}")
+        elif entry["type"] in ("SEQUENCE", "SEQUENCE OWNED BY"):
+            sequences.add(f"{entry['schema']}.{entry['name']}")
+
+    selected = []
+    for entry in entries:
+        qualified = f"{entry['schema']}.{entry['name']}"
+        if _in_selected_schema(selection, entry):
+            selected.append(entry)
+        elif entry["type"] in ("SEQUENCE", "SEQUENCE SET", "SEQUENCE OWNED BY") and qualified in sequences:
+            selected.append(entry)
+        elif entry["type"] in TABLE_TYPES + tuple(DEPENDENT_TYPES) and entry_table(entry) in tables:
+            selected.append(entry)
+    return selected
+
+def select_drop_statements(header, selection, selected):
+    """
+    Sentencias DROP de un backup plain (pg_dump -c) de los objetos seleccionados
+
+    pg_dump -c escribe todas las sentencias DROP y ALTER TABLE ... DROP antes
+    del primer objeto; se conservan las que nombran un objeto seleccionado o
+    de un esquema seleccionado.
+
+    Args:
+        header (bytes): Inicio del backup, hasta el primer objeto
+        selection (dict): Selección de make_selection
+        selected (list): Objetos seleccionados (ver select_plain_entries)
+
+    Returns:
+        bytes: Sentencias a ejecutar antes de crear los objetos
+    """
+    names = set()
+    for entry in selected:
+        if entry["type"] == "SCHEMA":
+            continue
+        name = entry["name"].split(" ", 1)[0].split("(", 1)[0]
+        names.add(f"{entry['schema']}.{name}")
+
+    statements = []
+    for line in header.splitlines(keepends=True):
+        if not line.startswith((b"DROP ", b"ALTER ")):
+            continue
+        text = line.decode('utf-8', errors='replace')
+        schema = DROP_SCHEMA_PATTERN.match(text)
+        if schema:
+            if schema_selected(selection, _unquote(schema.group(1))):
+                statements.append(line)
+            continue
+        for qualified in QUALIFIED_NAME_PATTERN.findall(text):
+            qualified = _unquote(qualified)
+            if qualified in names or schema_selected(selection, qualified.split(".", 1)[0]):
+                statements.append(line)
+                break
+    return b"".join(statements)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import shutil
+from datetime import datetime
+
+from core.checksums import is_manifest, manifest_path
+from core.dump_index import is_index, index_path
+from core.incremental import required_backups, forget_backups
+from config.settings import RETENTION_POLICY, PARTIAL_SUFFIX
+
+# Nombre generado por BackupManager.create_backup_filename:
+# <base de datos>_backup_<AAAAMMDD_HHMMSS><extensión>
+BACKUP_NAME_PATTERN = re.compile(
+    r'^(?P<database>.+)_backup_(?P<timestamp>\d{8}_\d{6})(?P<extension>(\.[A-Za-z0-9]+)*)$'
+)
+
+# Periodos de retención y cómo se agrupan las fechas en cada uno
+RETENTION_PERIODS = {
+    "hourly": lambda moment: (moment.year, moment.month, moment.day, moment.hour),
+    "daily": lambda moment: moment.date(),
+    "weekly": lambda moment: tuple(moment.isocalendar()[:2]),
+    "monthly": lambda moment: (moment.year, moment.month),
+    "yearly": lambda moment: moment.year
+}
+
+def find_backups(directory):
+    """
+    Busca los backups con timestamp de un directorio
+
+    Usa os.scandir y obtiene la fecha del nombre del archivo, sin consultar los
+    metadatos de cada entrada, por lo que es rápido en directorios grandes. Los
+    backups que todavía se están escribiendo (con PARTIAL_SUFFIX), los
+    manifiestos y los índices se omiten.
+
+    Args:
+        directory (str): Directorio a examinar
+
+    Returns:
+        list: Backups como diccionarios con path, name, database, timestamp e is_dir
+    """
+    backups = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith(PARTIAL_SUFFIX) or is_manifest(entry.name) or is_index(entry.name):
+                continue
+            match = BACKUP_NAME_PATTERN.match(entry.name)
+            if not match:
+                continue
+            try:
+                timestamp = datetime.strptime(match.group("timestamp"), "%Y%m%d_%H%M%S")
+            except ValueError:
+                continue
+            backups.append({
+                "path": entry.path,
+                "name": entry.name,
+                "database": match.group("database"),
+                "timestamp": timestamp,
+                "is_dir": entry.is_dir(follow_symlinks=False)
+            })
+    return backups
+
+def select_retained(backups, policy=None):
+    """
+    Selecciona los backups a conservar con una política abuelo-padre-hijo
+
+    Para cada periodo (hora, día, semana, mes, año) se conserva el backup más
+    reciente de los N periodos más recientes que tienen alguno. El backup más
+    reciente se conserva siempre.
+
+    Args:
+        backups (list): Backups de una misma base de datos (ver find_backups)
+        policy (dict): Periodos a conservar por tipo (por defecto, RETENTION_POLICY)
+
+    Returns:
+        set: Rutas de los backups a conservar
+    """
+    policy = RETENTION_POLICY if policy is None else policy
+    ordered = sorted(backups, key=lambda backup: backup["timestamp"], reverse=True)
+
+    keep = set()
+    if ordered:
+        keep.add(ordered[0]["path"])
+
+    for period, count in policy.items():
+        if period not in RETENTION_PERIODS:
+            raise ValueError(f"Periodo de retención desconocido: {period}")
+        if not count:
+            continue
+
+        bucket_of = RETENTION_PERIODS[period]
+        buckets = set()
+        for backup in ordered:
+            bucket = bucket_of(backup["timestamp"])
+            if bucket in buckets:
+                continue
+            if len(buckets) >= count:
+                break
+            buckets.add(bucket)
+            keep.add(backup["path"])
+
+    return keep
+
+def prune_backups(directory, policy=None, dry_run=False, logger_callback=None):
+    """
+    Elimina los backups de un directorio que no conserva la política de retención
+
+    Cada base de datos se trata por separado. Los backups que se están
+    escribiendo no se tienen en cuenta, y los backups incrementales conservan
+    los backups anteriores de los que toman los datos de sus tablas.
+
+    Args:
+        directory (str): Directorio con los backups
+        policy (dict): Periodos a conservar por tipo (por defecto, RETENTION_POLICY)
+        dry_run (bool): Solo mostrar lo que se eliminaría
+        logger_callback (callable): Función para registrar mensajes
+
+    Returns:
+        list: Rutas eliminadas (o que se eliminarían con dry_run)
+    """
+    log = logger_callback if logger_callback else print
+
+    by_database = {}
+    for backup in find_backups(directory):
+        by_database.setdefault(backup["database"], []).append(backup)
+
+    removed = []
+    for database, backups in sorted(by_database.items()):
+        keep = select_retained(backups, policy)
+        kept_names = {os.path.basename(path) for path in keep}
+        keep.update(
+            os.path.join(directory, name)
+            for name in required_backups(directory, database, kept_names)
+        )
+        keep &= {backup["path"] for backup in backups}
+
+        database_removed = []
+        for backup in backups:
+            if backup["path"] in keep:
+                continue
+            if not dry_run:
+                try:
+                    if backup["is_dir"]:
+                        shutil.rmtree(backup["path"])
+                    else:
+                        os.remove(backup["path"])
+                    for sidecar in (manifest_path(backup["path"]), index_path(backup["path"])):
+                        if os.path.exists(sidecar):
+                            os.remove(sidecar)
+                except OSError as e:
+                    log(f"✗ No se pudo eliminar {backup['path']}: {e}")
+                    continue
+            database_removed.append(backup["path"])
+
+        if database_removed and not dry_run:
+            forget_backups(directory, database, [os.path.basename(path) for path in database_removed])
+        removed += database_removed
+
+        action = "se eliminarían" if dry_run else "eliminados"
+        log(f"Retención {database}: {len(keep)} conservados, "
+            f"{len(backups) - len(keep)} {action}")
+
+    return removed
@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# División de los backups plain de pg_dump en secciones, para restaurarlos en
+# paralelo como hace pg_restore -j con los formatos custom y directorio.
+#
+# pg_dump escribe cada objeto precedido de una cabecera de comentarios:
+#
+#   --
+#   -- Name: clientes; Type: TABLE; Schema: public; Owner: -
+#   --
+#
+# y los ordena por secciones: primero la definición de los objetos (pre-data),
+# luego los datos (TABLE DATA, con COPY ... FROM stdin, y SEQUENCE SET) y al
+# final índices, restricciones y disparadores (post-data). El análisis lee el
+# archivo una vez, sin cargarlo en memoria, y devuelve la posición y longitud
+# en bytes de cada objeto.
+
+import re
+
+from config.settings import STREAM_CHUNK_SIZE
+
+# Secciones de un backup, con los nombres de pg_restore --section
+SECTION_PRE_DATA = "pre-data"
+SECTION_DATA = "data"
+SECTION_POST_DATA = "post-data"
+
+# Tipos de objeto de la sección de datos ("BLOB" es la creación de un objeto
+# grande con lo_create, que pg_dump escribe en pre-data)
+DATA_TYPES = {"TABLE DATA", "SEQUENCE SET", "BLOBS", "BLOB DATA", "LARGE OBJECT", "LARGE OBJECTS"}
+
+# Tipos de objeto que acompañan al objeto anterior y quedan en su sección (el
+# comentario o los permisos de un objeto grande no empiezan la sección post-data)
+ATTACHED_TYPES = {"COMMENT", "SECURITY LABEL", "ACL"}
+
+# Tipos de objeto de la sección post-data (ver pg_dump_sort.c)
+POST_DATA_TYPES = {
+    "CONSTRAINT", "FK CONSTRAINT", "INDEX", "INDEX ATTACH", "STATISTICS", "RULE", "TRIGGER",
+    "EVENT TRIGGER", "POLICY", "ROW SECURITY", "MATERIALIZED VIEW DATA", "PUBLICATION TABLE",
+    "PUBLICATION TABLES IN SCHEMA", "SUBSCRIPTION"
+}
+
+# Cabecera de un objeto: "-- Name: x; Type: y; Schema: z; Owner: w" o
+# "-- Data for Name: ..." en los datos de una tabla
+HEADER_PATTERN = re.compile(rb'^-- (?:Data for )?Name: (.*?); Type: (.*?); Schema: (.*?); Owner: ([^;\n]*)')
+
+# Marca que pg_dump escribe al final de un backup plain completo
+FOOTER_LINE = b"-- PostgreSQL database dump complete"
+
+# Sentencias del inicio del backup que configuran la sesión (se repiten en
+# cada conexión de una restauración en paralelo)
+PREAMBLE_PATTERN = re.compile(rb'^(?:SET |SELECT pg_catalog\.set_config\()')
+
+# Opciones de sesión que pg_dump cambia entre objetos
+SESSION_SETTING_PATTERN = re.compile(rb'^SET (default_tablespace|default_table_access_method|default_with_oids) = ')
+
+# Inicio de un bloque de datos
+COPY_PATTERN = re.compile(rb'^COPY .+ FROM stdin;\r?$')
+
+# Fin de un bloque de datos: la línea "\."
+COPY_END = b"\n\\.\n"
+
+# Tabla de una sentencia de índice o restricción, para no aplicar en paralelo
+# dos objetos de la misma tabla
+TABLE_PATTERN = re.compile(r'^(?:CREATE (?:UNIQUE )?INDEX \S+ ON (?:ONLY )?|ALTER TABLE (?:ONLY )?)(\S+)')
+
+# Longitud máxima de la primera sentencia de cada objeto que se conserva
+STATEMENT_PREVIEW = 200
+
+def _entry_table(entry):
+    """Tabla a la que pertenece un objeto de datos o post-data, o None si no se sabe"""
+    if entry["type"] == "TABLE DATA":
+        return f"{entry['schema']}.{entry['name']}"
+    match = TABLE_PATTERN.match(entry["statement"] or "")
+    return match.group(1) if match else None
+
+class PlainDumpScanner:
+    """
+    Analiza un backup plain de pg_dump a medida que se lee o se escribe
+
+    Recibe el backup por bloques con feed(), de modo que el análisis puede
+    hacerse mientras pg_dump escribe el backup, sin volver a leerlo. Los datos
+    de los bloques COPY no se dividen en líneas: se busca su final en el búfer,
+    que es mucho más rápido. finish() devuelve el resultado (ver scan_plain_dump).
+    """
+
+    def __init__(self):
+        self._buffer = b""
+        self._index = 0
+        self._base = 0
+        self._in_copy = False
+        self._done = False
+        self._size = 0
+        self._preamble = []
+        self._settings = {}
+        self._entries = []
+        self._section = SECTION_PRE_DATA
+        self._data_offset = self._post_data_offset = self._end_offset = None
+        self._serial_only = None
+        self._previous_offset = self._previous_line = None
+        self._current = None
+
+    def feed(self, data):
+        """Analiza el siguiente bloque del backup"""
+        self._size += len(data)
+        if self._done or not data:
+            return
+        # Se descarta lo ya analizado; queda, como mucho, una línea incompleta
+        self._buffer = self._buffer[self._index:] + data
+        self._base += self._index
+        self._index = 0
+        self._scan()
+
+    def finish(self):
+        """
+        Termina el análisis (la última línea puede no tener salto de línea)
+
+        Returns:
+            dict: Resultado del análisis (ver scan_plain_dump)
+        """
+        if not self._done and not self._in_copy and self._index < len(self._buffer):
+            self._line(self._base + self._index, self._buffer[self._index:])
+        self._buffer = b""
+        self._index = 0
+
+        end_offset = self._end_offset if self._end_offset is not None else self._size
+        entries = self._entries
+        for entry, following in zip(entries, entries[1:] + [None]):
+            entry["length"] = (following["offset"] if following else end_offset) - entry["offset"]
+            if entry["section"] != SECTION_PRE_DATA:
+                entry["table"] = _entry_table(entry)
+
+        return {
+            "preamble": b"".join(self._preamble),
+            "entries": entries,
+            "data_offset": self._data_offset if self._data_offset is not None else (
+                self._post_data_offset if self._post_data_offset is not None else end_offset
+            ),
+            "post_data_offset": self._post_data_offset if self._post_data_offset is not None else end_offset,
+            "end_offset": end_offset,
+            "size": self._size,
+            "complete": self._end_offset is not None,
+            "serial_only": self._serial_only
+        }
+
+    def _scan(self):
+        """Analiza las líneas completas del búfer"""
+        buffer = self._buffer
+        while not self._done:
+            if self._in_copy:
+                end = buffer.find(COPY_END, self._index)
+                if end < 0:
+                    # Se conservan los bytes en los que aún podría empezar el
+                    # final, por si cae entre dos bloques
+                    self._index = max(self._index, len(buffer) - len(COPY_END) + 1)
+                    return
+                self._index = end + len(COPY_END)
+                self._in_copy = False
+                if self._current is not None and self._current["copy_offset"] is not None \
+                        and self._current["copy_length"] is None:
+                    self._current["copy_length"] = self._base + self._index - self._current["copy_offset"]
+                continue
+
+            end = buffer.find(b"\n", self._index)
+            if end < 0:
+                return
+            offset = self._base + self._index
+            self._index = end + 1
+            self._line(offset, buffer[offset - self._base:end + 1])
+
+    def _line(self, offset, line):
+        """Analiza una línea completa que empieza en la posición offset"""
+        if line.startswith(b"--"):
+            match = HEADER_PATTERN.match(line) if line.startswith(b"-- ") else None
+            if match and self._previous_line == b"--\n":
+                self._start_entry(match, self._previous_offset)
+            elif line.rstrip(b"\r\n") == FOOTER_LINE and self._previous_line == b"--\n":
+                self._end_offset = self._previous_offset
+                self._done = True
+                return
+        elif line.startswith(b"\\") and not line.startswith((b"\\restrict", b"\\unrestrict")):
+            # \connect (pg_dump -C o pg_dumpall) cambia de base de datos a mitad del archivo
+            command = line.split()[0].decode('utf-8', errors='replace')
+            self._serial_only = self._serial_only or f"usa la orden de psql {command}"
+        elif COPY_PATTERN.match(line):
+            current = self._current
+            if current is not None and current["statement"] is None:
+                current["statement"] = line.rstrip(b"\r\n")[:STATEMENT_PREVIEW].decode('utf-8', errors='replace')
+                current["copy_offset"] = offset
+            # La búsqueda del final incluye el salto de línea de la línea COPY, por si la tabla está vacía
+            self._in_copy = True
+            self._index -= 1
+            line = b""
+        elif line.strip():
+            setting = SESSION_SETTING_PATTERN.match(line)
+            if setting:
+                self._settings[setting.group(1)] = line.rstrip(b"\r\n")
+            elif not self._entries and PREAMBLE_PATTERN.match(line):
+                self._preamble.append(line)
+            elif self._current is not None and self._current["statement"] is None:
+                self._current["statement"] = line.rstrip(b"\r\n")[:STATEMENT_PREVIEW].decode('utf-8', errors='replace')
+
+        self._previous_offset, self._previous_line = offset, line
+
+    def _start_entry(self, match, offset):
+        """Registra el objeto de una cabecera que empieza en la posición offset"""
+        name, entry_type, schema, owner = (value.decode('utf-8', errors='replace') for value in match.groups())
+        if entry_type not in ATTACHED_TYPES:
+            if self._section == SECTION_PRE_DATA and entry_type in DATA_TYPES:
+                self._section = SECTION_DATA
+                self._data_offset = offset
+            if self._section != SECTION_POST_DATA and (
+                entry_type in POST_DATA_TYPES or (self._section == SECTION_DATA and entry_type not in DATA_TYPES)
+            ):
+                self._section = SECTION_POST_DATA
+                self._post_data_offset = offset
+        self._current = {
+            "name": name,
+            "type": entry_type,
+            "schema": "" if schema == "-" else schema,
+            "owner": owner,
+            "section": self._section,
+            "offset": offset,
+            "length": 0,
+            "statement": None,
+            "settings": [setting.decode('utf-8') for setting in self._settings.values()],
+            "table": None,
+            "copy_offset": None,
+            "copy_length": None
+        }
+        self._entries.append(self._current)
+
+def scan_plain_dump(stream, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Analiza un backup plain de pg_dump en una sola pasada
+
+    Args:
+        stream (file): Backup abierto en binario (puede estar descomprimiéndose)
+        chunk_size (int): Bytes leídos en cada bloque
+
+    Returns:
+        dict: preamble (sentencias SET del inicio, bytes), entries (objetos en
+            orden), data_offset y post_data_offset (inicio de las secciones de
+            datos y post-data), end_offset (fin del último objeto), size
+            (bytes leídos), complete (tiene la marca de fin de pg_dump) y
+            serial_only (motivo por el que no se puede restaurar en paralelo, o
+            None). Cada objeto tiene name, type, schema, owner, section, offset,
+            length, statement (inicio de su primera sentencia), settings
+            (sentencias SET de sesión vigentes), table y, si tiene datos,
+            copy_offset y copy_length (bloque COPY, de la sentencia a la línea "\\.")
+    """
+    scanner = PlainDumpScanner()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        scanner.feed(chunk)
+    return scanner.finish()
+
+class RangeReader:
+    """
+    Flujo formado por fragmentos de un archivo y datos intercalados, en orden
+
+    Sirve para enviar a psql uno o varios objetos del backup precedidos de las
+    sentencias SET que configuran la sesión, sin copiarlos a un archivo temporal.
+    """
+
+    def __init__(self, path, parts, on_read=None):
+        """
+        Args:
+            path (str): Archivo del backup
+            parts (list): Datos a enviar (bytes) o fragmentos del archivo
+                (posición, longitud)
+            on_read (callable): Recibe el número de bytes del archivo leídos en cada bloque
+        """
+        self.size = sum(len(part) if isinstance(part, bytes) else part[1] for part in parts)
+        self._file = open(path, 'rb')
+        self._parts = list(parts)
+        self._remaining = 0
+        self._on_read = on_read
+
+    def read(self, size=-1):
+        while self._remaining == 0:
+            if not self._parts:
+                return b""
+            part = self._parts.pop(0)
+            if isinstance(part, bytes):
+                if part:
+                    return part
+                continue
+            offset, self._remaining = part
+            self._file.seek(offset)
+
+        if size is None or size < 0:
+            size = self._remaining
+        data = self._file.read(min(size, self._remaining))
+        if not data:
+            # El archivo es más corto que el índice: se termina el flujo
+            self._remaining = 0
+            self._parts = []
+            return b""
+        self._remaining -= len(data)
+        if self._on_read:
+            self._on_read(len(data))
+        return data
+
+    def close(self):
+        self._file.close()
+
+def entry_prefix(dump, entry):
+    """Sentencias que configuran una sesión nueva antes de aplicar un objeto"""
+    settings = "".join(setting + "\n" for setting in entry["settings"])
+    return dump["preamble"] + settings.encode('utf-8')
@@ -1,8 +1,15 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import re
+import shutil
 import sys
 import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config.settings import TOOL_CACHE_TTL, TOOL_PROBE_TIMEOUT
 
 def get_system_info():
     """Detecta el sistema operativo y devuelve información básica"""
@@ -22,27 +29,191 @@ def get_system_info():
         "is_linux": is_linux
     }
 
+# Herramientas detectadas y comando usado para obtener su versión
+TOOL_PROBES = {
+    "docker": ["docker", "--version"],
+    "pg_dump": ["pg_dump", "--version"],
+    "psql": ["psql", "--version"],
+    "pg_restore": ["pg_restore", "--version"],
+    "pg_basebackup": ["pg_basebackup", "--version"],
+    "pg_receivewal": ["pg_receivewal", "--version"]
+}
+
+# Caché de la detección de herramientas
+_tool_cache = {"tools": None, "timestamp": 0.0}
+_cache_lock = threading.Lock()
+_probe_thread = None
+
+def probe_tool(name):
+    """
+    Detecta una herramienta: ruta absoluta, versión y versión mayor
+
+    Args:
+        name (str): Nombre de la herramienta (clave de TOOL_PROBES)
+
+    Returns:
+        dict: available, path, version y major (None si no se detectan)
+    """
+    info = {"available": False, "path": None, "version": None, "major": None}
+
+    path = shutil.which(TOOL_PROBES[name][0])
+    if not path:
+        return info
+
+    try:
+        process = subprocess.run(
+            [path] + TOOL_PROBES[name][1:],
+            check=True,
+            capture_output=True,
+            text=True,
+            timeout=TOOL_PROBE_TIMEOUT
+        )
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError):
+        return info
+
+    info["available"] = True
+    info["path"] = path
+
+    # Ejemplos: "pg_dump (PostgreSQL) 16.2", "Docker version 24.0.7, build afdd53b"
+    match = re.search(r'(\d+)(?:\.(\d+))?(?:\.(\d+))?', process.stdout)
+    if match:
+        info["version"] = match.group(0)
+        info["major"] = int(match.group(1))
+    return info
+
+def probe_tools():
+    """Detecta todas las herramientas en paralelo y actualiza la caché"""
+    with ThreadPoolExecutor(max_workers=len(TOOL_PROBES)) as executor:
+        results = dict(zip(TOOL_PROBES, executor.map(probe_tool, TOOL_PROBES)))
+
+    tools = {
+        "has_docker": results["docker"]["available"],
+        "has_pg_dump": results["pg_dump"]["available"],
+        "has_psql": results["psql"]["available"],
+        "has_pg_restore": results["pg_restore"]["available"],
+        "has_pg_basebackup": results["pg_basebackup"]["available"],
+        "has_pg_receivewal": results["pg_receivewal"]["available"],
+        "details": results
+    }
+
+    with _cache_lock:
+        _tool_cache["tools"] = tools
+        _tool_cache["timestamp"] = time.monotonic()
+    return tools
+
+def probe_tools_async():
+    """Inicia la detección de herramientas en segundo plano (p. ej. al arrancar la aplicación)"""
+    global _probe_thread
+    with _cache_lock:
+        if _probe_thread and _probe_thread.is_alive():
+            return
+        _probe_thread = threading.Thread(target=probe_tools, daemon=True)
+        _probe_thread.start()
+
+def invalidate_tool_cache():
+    """Descarta la caché para que la siguiente consulta vuelva a detectar las herramientas"""
+    with _cache_lock:
+        _tool_cache["tools"] = None
+        _tool_cache["timestamp"] = 0.0
+
 def check_docker():
     """Verifica si Docker está disponible"""
-    try:
-        subprocess.run(["docker", "--version"], check=True, capture_output=True)
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        return False
+    return get_available_tools()["has_docker"]
 
 def check_pg_dump():
     """Verifica si pg_dump está instalado localmente"""
-    try:
-        subprocess.run(["pg_dump", "--version"], check=True, capture_output=True)
+    return get_available_tools()["has_pg_dump"]
+
+def get_available_tools(max_age=None):
+    """
+    Devuelve información sobre las herramientas disponibles
+
+    Usa la caché mientras no supere max_age segundos. Si hay una detección en
+    segundo plano en curso, espera a que termine en lugar de lanzar otra.
+
+    Args:
+        max_age (float): Antigüedad máxima de la caché (por defecto TOOL_CACHE_TTL)
+
+    Returns:
+        dict: has_docker, has_pg_dump, has_psql, has_pg_restore, has_pg_basebackup,
+            has_pg_receivewal y, en "details", la ruta y la versión de cada herramienta
+    """
+    if max_age is None:
+        max_age = TOOL_CACHE_TTL
+
+    with _cache_lock:
+        tools = _tool_cache["tools"]
+        fresh = tools is not None and time.monotonic() - _tool_cache["timestamp"] < max_age
+        pending = _probe_thread if _probe_thread and _probe_thread.is_alive() else None
+
+    if fresh:
+        return tools
+
+    if pending:
+        pending.join()
+        with _cache_lock:
+            if _tool_cache["tools"] is not None:
+                return _tool_cache["tools"]
+
+    return probe_tools()
+
+def is_pg_dump_compatible(server_major, tools=None):
+    """
+    Indica si el pg_dump local puede hacer backup de un servidor de la versión dada
+
+    pg_dump no admite servidores de una versión mayor superior a la suya.
+
+    Args:
+        server_major (int): Versión mayor del servidor
+        tools (dict): Resultado de get_available_tools (se obtiene si es None)
+
+    Returns:
+        bool: True si es compatible o si alguna versión es desconocida
+    """
+    return is_tool_compatible("pg_dump", server_major, tools)
+
+def is_tool_compatible(tool, server_major, tools=None):
+    """
+    Indica si una herramienta cliente local admite un servidor de la versión dada
+
+    Como pg_dump, pg_basebackup y pg_receivewal no admiten servidores de una
+    versión mayor superior a la suya.
+
+    Args:
+        tool (str): Herramienta (clave de TOOL_PROBES)
+        server_major (int): Versión mayor del servidor
+        tools (dict): Resultado de get_available_tools (se obtiene si es None)
+
+    Returns:
+        bool: True si es compatible o si alguna versión es desconocida
+    """
+    tools = tools or get_available_tools()
+    local_major = tools["details"][tool]["major"]
+    if not server_major or not local_major:
         return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        return False
+    return local_major >= server_major
+
+def get_pitr_tools(server_major=None, tools=None):
+    """
+    Comprueba las herramientas necesarias para el modo de recuperación a un instante
+
+    Args:
+        server_major (int): Versión mayor del servidor (None = no comprobarla)
+        tools (dict): Resultado de get_available_tools (se obtiene si es None)
 
-def get_available_tools():
-    """Devuelve información sobre las herramientas disponibles"""
+    Returns:
+        dict: use_docker (bool) y available (False si no hay herramientas locales
+            compatibles ni Docker)
+    """
+    tools = tools or get_available_tools()
+    local = (
+        tools["has_pg_basebackup"] and tools["has_pg_receivewal"]
+        and is_tool_compatible("pg_basebackup", server_major, tools)
+        and is_tool_compatible("pg_receivewal", server_major, tools)
+    )
     return {
-        "has_docker": check_docker(),
-        "has_pg_dump": check_pg_dump()
+        "use_docker": not local,
+        "available": local or tools["has_docker"]
     }
 
 def get_install_instructions():
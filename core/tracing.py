@@ -0,0 +1,342 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import cProfile
+import collections
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+from config.settings import TRACE_SAMPLING_INTERVAL
+
+class Span:
+    """
+    Fase de un trabajo en curso
+
+    Se obtiene con Tracer.span() o trace_span(). set() añade datos a la fase
+    (bytes procesados, código de salida...) y mark() registra una subfase que
+    empieza con ella, p. ej. la espera hasta el primer byte de pg_dump.
+    """
+
+    def __init__(self, name, args=None):
+        self.name = name
+        self.args = dict(args or {})
+        self.marks = []
+
+    def set(self, **args):
+        """Añade o sustituye datos de la fase"""
+        self.args.update(args)
+
+    def mark(self, name, elapsed):
+        """Registra una subfase desde el inicio de la fase hasta elapsed segundos"""
+        if elapsed is not None:
+            self.marks.append((name, elapsed))
+
+def trace_span(tracer, name, **args):
+    """
+    Fase de un trabajo, o una fase que no se registra si no hay tracer
+
+    Permite instrumentar el código sin comprobar en cada fase si el trabajo
+    tiene traza: with trace_span(self.tracer, "pg_dump") as span: ...
+    """
+    if tracer is None:
+        return contextlib.nullcontext(Span(name, args))
+    return tracer.span(name, **args)
+
+def _children_cpu():
+    """CPU (segundos) de los procesos hijos ya terminados y esperados"""
+    times = os.times()
+    return times.children_user + times.children_system
+
+class Tracer:
+    """
+    Registra la duración, la CPU y los bytes de cada fase de un trabajo
+
+    Cada fase guarda su inicio y duración, la CPU del proceso (todos los hilos,
+    incluidos los que comprimen o descomprimen), la del hilo que la ejecuta, la
+    de los procesos hijos que terminan durante ella (pg_dump, psql... o el
+    cliente de Docker) y los datos añadidos con Span.set(). Las fases pueden
+    anidarse y registrarse desde varios hilos.
+
+    Con profiler, el hilo que llama a start() se perfila hasta stop() con
+    cProfile ("cprofile") o tomando muestras de su pila cada
+    TRACE_SAMPLING_INTERVAL segundos ("sampling"), que apenas lo ralentiza.
+    Si otro trabajo ya usa cProfile, la traza se registra sin perfil.
+    write() guarda la traza en el formato JSON de Chrome (chrome://tracing,
+    https://ui.perfetto.dev) y el perfil junto a ella.
+    """
+
+    def __init__(self, name, profiler=None):
+        """
+        Inicializa la traza
+
+        Args:
+            name (str): Nombre del trabajo (p. ej. "backup midb")
+            profiler (str): None, "cprofile" o "sampling"
+
+        Raises:
+            ValueError: Si el perfilador no existe
+        """
+        if profiler not in (None, "cprofile", "sampling"):
+            raise ValueError(f"Perfilador desconocido: {profiler}")
+        self.name = name
+        self.profiler = profiler
+        self.spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._origin = time.perf_counter()
+        self._created = time.time()
+        self._thread_names = {}
+        self._profile = None
+        self._sampler = None
+
+    def now(self):
+        """Segundos desde el inicio de la traza"""
+        return time.perf_counter() - self._origin
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        """
+        Registra una fase mientras dura el bloque with
+
+        Si el bloque lanza una excepción, la fase se registra con error y la
+        excepción se propaga.
+
+        Yields:
+            Span: Fase en curso
+        """
+        span = Span(name, args)
+        stack = self._stack()
+        depth = len(stack)
+        stack.append(name)
+        thread = threading.current_thread()
+        start = self.now()
+        cpu = time.process_time()
+        thread_cpu = time.thread_time()
+        children_cpu = _children_cpu()
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            stack.pop()
+            record = {
+                "name": name,
+                "start": start,
+                "duration": self.now() - start,
+                "cpu": time.process_time() - cpu,
+                "thread_cpu": time.thread_time() - thread_cpu,
+                "children_cpu": _children_cpu() - children_cpu,
+                "thread": thread.ident,
+                "depth": depth,
+                "args": span.args
+            }
+            if error:
+                record["error"] = error
+            with self._lock:
+                self._thread_names[thread.ident] = thread.name
+                self.spans.append(record)
+                for mark_name, elapsed in span.marks:
+                    self.spans.append({
+                        "name": mark_name, "start": start, "duration": elapsed,
+                        "cpu": None, "thread_cpu": None, "children_cpu": None,
+                        "thread": thread.ident, "depth": depth + 1, "args": {}
+                    })
+
+    def _stack(self):
+        """Fases abiertas en el hilo actual"""
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def start(self):
+        """
+        Empieza a perfilar el hilo actual (si se pidió un perfilador)
+
+        Returns:
+            bool: False si se pidió cProfile y ya hay otro perfilador activo; la
+                traza se registra igualmente, sin perfil
+        """
+        if self.profiler == "cprofile":
+            # Hasta Python 3.11, cProfile solo perfila el hilo en el que se
+            # activa; desde 3.12 usa sys.monitoring, común a todo el intérprete,
+            # y no puede haber dos perfiles activos a la vez (p. ej. dos trabajos
+            # de la interfaz)
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                self.profiler = None
+                return False
+            self._profile = profile
+        elif self.profiler == "sampling":
+            self._sampler = SamplingProfiler(threading.get_ident())
+            self._sampler.start()
+        return True
+
+    def stop(self):
+        """Deja de perfilar; debe llamarse desde el mismo hilo que start()"""
+        if self._profile:
+            self._profile.disable()
+        if self._sampler:
+            self._sampler.stop()
+
+    def summary(self):
+        """
+        Fases de primer nivel y sus subfases, en orden de inicio
+
+        Returns:
+            list: Registros de las fases (name, start, duration, cpu, thread_cpu,
+                children_cpu, thread, depth, args y, si falló, error)
+        """
+        with self._lock:
+            return sorted(self.spans, key=lambda record: (record["start"], record["depth"]))
+
+    def log_summary(self, log):
+        """Registra una línea por fase con su duración, CPU y bytes"""
+        log("\nFases del trabajo:")
+        for record in self.summary():
+            indent = "  " * (record["depth"] + 1)
+            width = max(1, 24 - len(indent))
+            text = f"{indent}{record['name']:<{width}} {record['duration']:8.2f} s"
+            if record["cpu"] is not None:
+                text += f"  CPU {record['cpu']:.2f} s"
+                if record["children_cpu"]:
+                    text += f" (+{record['children_cpu']:.2f} s hijos)"
+            size = record["args"].get("bytes_in", record["args"].get("bytes"))
+            if size:
+                text += f"  {size / (1024 * 1024):.1f} MB"
+            if record.get("error"):
+                text += f"  ✗ {record['error']}"
+            log(text)
+
+    def to_chrome_trace(self):
+        """
+        Traza en el formato JSON de Chrome (Trace Event Format)
+
+        Cada fase es un evento completo ("ph": "X") con la CPU y los datos de
+        la fase en args; los tiempos están en microsegundos desde el inicio.
+        """
+        pid = os.getpid()
+        events = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": self.name}}]
+        with self._lock:
+            thread_names = dict(self._thread_names)
+        for ident, thread_name in thread_names.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": ident,
+                           "args": {"name": thread_name}})
+
+        for record in self.summary():
+            args = dict(record["args"])
+            for key in ("cpu", "thread_cpu", "children_cpu"):
+                if record[key] is not None:
+                    args[key] = round(record[key], 6)
+            if record.get("error"):
+                args["error"] = record["error"]
+            events.append({
+                "name": record["name"],
+                "cat": "job",
+                "ph": "X",
+                "ts": round(record["start"] * 1e6, 1),
+                "dur": round(record["duration"] * 1e6, 1),
+                "pid": pid,
+                "tid": record["thread"],
+                "args": args
+            })
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"job": self.name, "created": self._created, "profiler": self.profiler}
+        }
+
+    def write(self, path):
+        """
+        Guarda la traza y, si se perfiló, el perfil junto a ella
+
+        El perfil de cProfile se guarda en <traza>.prof (pstats, snakeviz) y el
+        del muestreo en <traza>.folded (pilas agrupadas: speedscope, flamegraph.pl).
+
+        Returns:
+            list: Archivos escritos
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_chrome_trace(), f, ensure_ascii=False)
+        written = [path]
+
+        base_path = path[:-len(".json")] if path.endswith(".json") else path
+        if self._profile:
+            self._profile.dump_stats(base_path + ".prof")
+            written.append(base_path + ".prof")
+        if self._sampler:
+            self._sampler.write_folded(base_path + ".folded")
+            written.append(base_path + ".folded")
+        return written
+
+    def finish(self, path, log):
+        """
+        Deja de perfilar, registra las fases y guarda la traza (ver write)
+
+        Args:
+            path (str): Archivo JSON de la traza
+            log (callable): Función para registrar mensajes
+        """
+        self.stop()
+        self.log_summary(log)
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            written = self.write(path)
+        except OSError as e:
+            log(f"✗ Error: No se pudo escribir la traza: {e}")
+            return
+        log(f"✓ Traza guardada en {', '.join(written)}")
+
+class SamplingProfiler:
+    """
+    Perfilador por muestreo de un hilo
+
+    Un hilo auxiliar lee la pila del hilo perfilado cada interval segundos
+    (sys._current_frames) y cuenta cuántas veces aparece cada pila. A
+    diferencia de cProfile, el coste no depende del número de llamadas.
+    """
+
+    def __init__(self, thread_id, interval=TRACE_SAMPLING_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Empieza a tomar muestras en segundo plano"""
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Deja de tomar muestras"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def write_folded(self, path):
+        """Guarda las pilas agrupadas: "marco;marco;marco muestras" por línea"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
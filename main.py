@@ -1,6 +1,10 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import time
+
+START_TIME = time.perf_counter()
+
 import sys
 import os
 
@@ -9,8 +13,13 @@ script_dir = os.path.dirname(os.path.abspath(__file__))
 if script_dir not in sys.path:
     sys.path.append(script_dir)
 
-from ui.app import PostgreSQLBackupApp
-
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Con argumentos se usa la línea de comandos, sin cargar Tk ni customtkinter
+        from cli.commands import main
+        sys.exit(main(sys.argv[1:], START_TIME))
+
+    from ui.app import PostgreSQLBackupApp
+
     app = PostgreSQLBackupApp()
-    app.mainloop()
\ No newline at end of file
+    app.mainloop()
@@ -25,9 +25,10 @@ docker exec -i $ContainerName bash -c "echo 'client_encoding = UTF8;' > /tmp/psq
 docker exec -i $ContainerName bash -c "export PGCLIENTENCODING=UTF8"
 
 Write-Host "Restaurando la base de datos desde $BackupFile..." -ForegroundColor Cyan
-# Método 1: Copiar el archivo al contenedor y restaurar desde allí
-docker cp $BackupFile "${ContainerName}:/tmp/backup.sql"
-$result = docker exec -i $ContainerName bash -c "PGCLIENTENCODING=UTF8 psql -U $Username -d $DatabaseName -f /tmp/backup.sql 2>&1"
+# Enviar el archivo por stdin: sin copia temporal dentro del contenedor
+$OutputEncoding = New-Object System.Text.UTF8Encoding $false
+$result = Get-Content -Path $BackupFile -Encoding UTF8 -ReadCount 1000 |
+    docker exec -i -e PGCLIENTENCODING=UTF8 $ContainerName psql -U $Username -d $DatabaseName 2>&1
 
 if ($LASTEXITCODE -ne 0) {
     Write-Error "Error al restaurar la base de datos:"
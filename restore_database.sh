@@ -104,15 +104,11 @@ restore_with_docker() {
     docker exec -i "$CONTAINER_NAME" bash -c "export PGCLIENTENCODING=UTF8"
 
     echo "Restaurando la base de datos desde $BACKUP_FILE..."
-    # Método 1: Copiar el archivo al contenedor y restaurar desde allí
-    docker cp "$BACKUP_FILE" "${CONTAINER_NAME}:/tmp/backup.sql"
-    
-    if docker exec -i "$CONTAINER_NAME" bash -c "PGCLIENTENCODING=UTF8 psql -U $USERNAME -d $DATABASE_NAME -f /tmp/backup.sql"; then
+    # Enviar el archivo por stdin: sin copia temporal dentro del contenedor
+    if docker exec -i -e PGCLIENTENCODING=UTF8 "$CONTAINER_NAME" psql -U "$USERNAME" -d "$DATABASE_NAME" < "$BACKUP_FILE"; then
         echo "¡Base de datos restaurada exitosamente!"
-        docker exec -i "$CONTAINER_NAME" rm /tmp/backup.sql
     else
         echo "Error al restaurar la base de datos."
-        docker exec -i "$CONTAINER_NAME" rm /tmp/backup.sql
         exit 1
     fi
 }
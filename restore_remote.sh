@@ -79,6 +79,27 @@ parse_connection_url() {
     fi
 }
 
+# Función para detectar la compresión del backup por sus bytes iniciales
+detect_compression() {
+    local magic
+    magic=$(od -An -tx1 -N4 "$1" | tr -d ' \n')
+    case $magic in
+        1f8b*) echo "gzip" ;;
+        28b52ffd) echo "zstd" ;;
+        *) echo "none" ;;
+    esac
+}
+
+# Función para enviar el backup a stdin, descomprimiéndolo al vuelo si es necesario
+read_backup() {
+    local backup_file=$1
+    case $(detect_compression "$backup_file") in
+        gzip) gzip -dc "$backup_file" ;;
+        zstd) zstd -dc "$backup_file" ;;
+        *) cat "$backup_file" ;;
+    esac
+}
+
 # Función para restaurar usando psql
 restore_with_psql() {
     local backup_file=$1
@@ -98,8 +119,19 @@ restore_with_psql() {
     # Establecer codificación UTF-8
     export PGCLIENTENCODING=UTF8
     
-    # Ejecutar restauración
-    if psql -h "$HOST" -p "$PORT" -U "$USERNAME" -d "$DATABASE" < "$backup_file"; then
+    local compression
+    compression=$(detect_compression "$backup_file")
+    if [ "$compression" != "none" ]; then
+        echo "Backup comprimido detectado: $compression (se descomprime al vuelo)"
+        if ! command -v "$compression" &> /dev/null; then
+            echo "Error: $compression no está instalado."
+            return 1
+        fi
+    fi
+    
+    # Ejecutar restauración (pipefail detecta errores al descomprimir)
+    set -o pipefail
+    if read_backup "$backup_file" | psql -h "$HOST" -p "$PORT" -U "$USERNAME" -d "$DATABASE"; then
         echo "¡Base de datos restaurada exitosamente!"
         return 0
     else
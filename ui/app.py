@@ -5,13 +5,17 @@
 import sys
 import os
 import threading
+from datetime import datetime
 import customtkinter as ctk
 
-from config.settings import APP_TITLE, DEFAULT_WIDTH, DEFAULT_HEIGHT, DEFAULT_CONNECTION_URL, DEFAULT_BACKUP_FILENAME, DEFAULT_REMOTE_CONNECTION_URL
-from core.system_utils import get_system_info, get_available_tools, get_install_instructions
+from config.settings import APP_TITLE, DEFAULT_WIDTH, DEFAULT_HEIGHT, DEFAULT_CONNECTION_URL, DEFAULT_BACKUP_FILENAME, DEFAULT_REMOTE_CONNECTION_URL, BACKUP_FORMATS, DEFAULT_BACKUP_FORMAT, DEFAULT_BACKUP_JOBS, COMPRESSION_METHODS, DEFAULT_COMPRESSION, DOCKER_CLIENT_REUSE, TRACE_DIR, TRACE_PROFILER, RESTORE_PROFILES, DEFAULT_RESTORE_PROFILE
+from core.system_utils import get_system_info, get_available_tools, get_install_instructions, probe_tools_async
 from core.backup_manager import BackupManager
 from core.restore_manager import RestoreManager
-from ui.components import ConsoleOutput, ConnectionFrame, ActionButtonsFrame, RestoreFrame
+from core.restore_selection import make_selection, parse_patterns, describe_selection
+from core.job_scheduler import JobScheduler, load_profiles
+from core.tracing import Tracer, trace_span
+from ui.components import ConsoleOutput, ProgressPanel, ConnectionFrame, BackupOptionsFrame, ActionButtonsFrame, RestoreFrame
 
 class PostgreSQLBackupApp(ctk.CTk):
     def __init__(self):
@@ -27,18 +31,35 @@ class PostgreSQLBackupApp(ctk.CTk):
         
         # Variables
         self.connection_var = ctk.StringVar(value=DEFAULT_CONNECTION_URL)
+        self.backup_format_var = ctk.StringVar(value=DEFAULT_BACKUP_FORMAT)
+        self.backup_jobs_var = ctk.StringVar(value=str(DEFAULT_BACKUP_JOBS or "auto"))
+        self.compression_var = ctk.StringVar(value=DEFAULT_COMPRESSION)
+        self.compression_level_var = ctk.StringVar(value="auto")
+        self.reuse_container_var = ctk.BooleanVar(value=DOCKER_CLIENT_REUSE)
         self.backup_file_var = ctk.StringVar(value=DEFAULT_BACKUP_FILENAME)
         self.container_name_var = ctk.StringVar(value="nexus_db")
         self.database_name_var = ctk.StringVar(value="NexusDB")
         self.username_var = ctk.StringVar(value="postgres")
         self.restore_connection_var = ctk.StringVar(value=DEFAULT_REMOTE_CONNECTION_URL)
+        self.restore_schemas_var = ctk.StringVar(value="")
+        self.restore_tables_var = ctk.StringVar(value="")
+        self.restore_profile_var = ctk.StringVar(value=DEFAULT_RESTORE_PROFILE)
+        self.single_transaction_var = ctk.BooleanVar(value=RESTORE_PROFILES[DEFAULT_RESTORE_PROFILE]["single_transaction"])
+        # Al cambiar de perfil, la casilla toma el modo de transacción del perfil
+        self.restore_profile_var.trace_add("write", lambda *args: self.single_transaction_var.set(
+            RESTORE_PROFILES[self.restore_profile_var.get()]["single_transaction"]
+        ))
         
         # Detectar sistema operativo
         self.system_info = get_system_info()
         
+        # Detectar herramientas en segundo plano para que los trabajos empiecen sin esperas
+        probe_tools_async()
+        
         # Inicializar gestores
-        self.backup_manager = BackupManager(logger_callback=self.log)
-        self.restore_manager = RestoreManager(logger_callback=self.log)
+        self.backup_manager = BackupManager(logger_callback=self.log, progress_callback=self.on_progress)
+        self.restore_manager = RestoreManager(logger_callback=self.log, progress_callback=self.on_progress)
+        self.scheduler = None
         
         # Crear interfaz
         self.create_widgets()
@@ -85,13 +106,32 @@ class PostgreSQLBackupApp(ctk.CTk):
         )
         conn_frame.pack(fill="x", padx=10, pady=10)
         
+        # Frame de opciones de backup
+        options_frame = BackupOptionsFrame(
+            self.tab_backup,
+            self.backup_format_var,
+            self.backup_jobs_var,
+            list(BACKUP_FORMATS.keys()),
+            self.compression_var,
+            self.compression_level_var,
+            COMPRESSION_METHODS,
+            self.reuse_container_var
+        )
+        options_frame.pack(fill="x", padx=10, pady=(0, 10))
+        
         # Frame de botones
         button_frame = ActionButtonsFrame(
             self.tab_backup,
-            self.start_backup
+            self.start_backup,
+            self.cancel_backup,
+            self.start_profile_backups
         )
         button_frame.pack(fill="x", padx=10, pady=10)
         
+        # Progreso del backup en curso
+        self.backup_progress = ProgressPanel(self.tab_backup)
+        self.backup_progress.pack(fill="x", padx=10, pady=(0, 10))
+        
         # Panel de salida
         output_label = ctk.CTkLabel(
             self.tab_backup, 
@@ -106,6 +146,10 @@ class PostgreSQLBackupApp(ctk.CTk):
             height=300
         )
         self.backup_output_console.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        # Consola y barra de progreso que reciben los mensajes del trabajo en curso
+        self.active_console = self.backup_output_console
+        self.active_progress = self.backup_progress
     
     def setup_restore_tab(self):
         """Configura la pestaña de restauración"""
@@ -120,10 +164,27 @@ class PostgreSQLBackupApp(ctk.CTk):
             self.restore_connection_var,
             self.browse_backup_file,
             self.start_restore,
-            self.start_remote_restore
+            self.start_remote_restore,
+            self.restore_schemas_var,
+            self.restore_tables_var,
+            self.restore_profile_var,
+            list(RESTORE_PROFILES),
+            self.single_transaction_var
         )
         self.restore_frame.pack(fill="both", expand=True, padx=10, pady=10)
         
+        # Botón para cancelar la restauración en curso
+        cancel_button = ctk.CTkButton(
+            self.tab_restore,
+            text="Cancelar restauración",
+            command=self.cancel_restore
+        )
+        cancel_button.pack(anchor="w", padx=10)
+        
+        # Progreso de la restauración en curso
+        self.restore_progress = ProgressPanel(self.tab_restore)
+        self.restore_progress.pack(fill="x", padx=10, pady=(10, 0))
+        
         # Panel de salida para restauración
         output_label = ctk.CTkLabel(
             self.tab_restore, 
@@ -140,16 +201,28 @@ class PostgreSQLBackupApp(ctk.CTk):
         self.restore_output_console.pack(fill="both", expand=True, padx=10, pady=10)
     
     def log(self, message):
-        """Registra un mensaje en la consola activa"""
-        active_tab = self.tabview.get()
-        if active_tab == "Backup":
-            self.backup_output_console.append(message)
-        else:
-            self.restore_output_console.append(message)
+        """Registra un mensaje en la consola del trabajo en curso (seguro desde cualquier hilo)"""
+        self.active_console.append(message)
+    
+    def on_progress(self, event):
+        """Muestra un evento de progreso en la barra del trabajo en curso (seguro desde cualquier hilo)"""
+        self.active_progress.update_event(event)
+    
+    def _activate_output(self, console, progress):
+        """Limpia la consola y la barra de progreso y las marca como las del trabajo en curso"""
+        console.clear()
+        progress.reset()
+        self.active_console = console
+        self.active_progress = progress
     
     def browse_backup_file(self):
         """Abre un diálogo para seleccionar un archivo de backup"""
-        filetypes = [("SQL Files", "*.sql"), ("All Files", "*.*")]
+        filetypes = [
+            ("SQL Files", "*.sql"),
+            ("Archive Files", "*.dump"),
+            ("Compressed Files", "*.gz *.zst"),
+            ("All Files", "*.*")
+        ]
         filename = ctk.filedialog.askopenfilename(
             title="Seleccionar archivo de backup",
             filetypes=filetypes
@@ -160,7 +233,7 @@ class PostgreSQLBackupApp(ctk.CTk):
     def start_backup(self):
         """Inicia el proceso de backup en un hilo separado"""
         # Limpiar la salida actual
-        self.backup_output_console.clear()
+        self._activate_output(self.backup_output_console, self.backup_progress)
         
         # Iniciar backup en un hilo separado para evitar bloquear la interfaz
         threading.Thread(target=self.perform_backup, daemon=True).start()
@@ -168,7 +241,7 @@ class PostgreSQLBackupApp(ctk.CTk):
     def start_restore(self):
         """Inicia el proceso de restauración en un hilo separado"""
         # Limpiar la salida actual
-        self.restore_output_console.clear()
+        self._activate_output(self.restore_output_console, self.restore_progress)
         
         # Iniciar restauración en un hilo separado
         threading.Thread(target=self.perform_restore, daemon=True).start()
@@ -176,11 +249,65 @@ class PostgreSQLBackupApp(ctk.CTk):
     def start_remote_restore(self):
         """Inicia el proceso de restauración remota en un hilo separado"""
         # Limpiar la salida actual
-        self.restore_output_console.clear()
+        self._activate_output(self.restore_output_console, self.restore_progress)
         
         # Iniciar restauración remota en un hilo separado
         threading.Thread(target=self.perform_remote_restore, daemon=True).start()
     
+    def start_profile_backups(self):
+        """Carga perfiles desde un archivo JSON y los respalda en un hilo separado"""
+        filename = ctk.filedialog.askopenfilename(
+            title="Seleccionar archivo de perfiles",
+            filetypes=[("JSON Files", "*.json"), ("All Files", "*.*")]
+        )
+        if not filename:
+            return
+        
+        # Limpiar la salida actual
+        self._activate_output(self.backup_output_console, self.backup_progress)
+        
+        threading.Thread(target=self.perform_profile_backups, args=(filename,), daemon=True).start()
+    
+    def cancel_backup(self):
+        """Cancela el backup en curso"""
+        self.log("Cancelando backup...")
+        self.backup_manager.cancel()
+        if self.scheduler:
+            self.scheduler.cancel()
+    
+    def cancel_restore(self):
+        """Cancela la restauración en curso"""
+        self.log("Cancelando restauración...")
+        self.restore_manager.cancel()
+    
+    def _describe_tool(self, tools, name):
+        """Describe la disponibilidad, versión y ruta de una herramienta"""
+        info = tools['details'][name]
+        if not info['available']:
+            return '✗ no disponible'
+        return f"✓ disponible ({info['version']}, {info['path']})"
+    
+    def _parse_optional_int(self, value):
+        """Convierte un valor de texto en entero; vacío o "auto" devuelve None"""
+        value = value.strip().lower()
+        if value in ("", "auto"):
+            return None
+        if not value.isdigit():
+            raise ValueError(value)
+        return int(value)
+    
+    def _start_trace(self, operation, manager):
+        """Crea la traza por fases del trabajo si TRACE_DIR está configurado (None si no)"""
+        manager.tracer = Tracer(operation, profiler=TRACE_PROFILER) if TRACE_DIR else None
+        if manager.tracer and not manager.tracer.start():
+            self.log("Advertencia: otro trabajo ya se está perfilando; la traza se guardará sin perfil")
+        return manager.tracer
+    
+    def _finish_trace(self, tracer, operation):
+        """Guarda la traza del trabajo en TRACE_DIR"""
+        if tracer:
+            tracer.finish(os.path.join(TRACE_DIR, f"{operation}_{datetime.now():%Y%m%d_%H%M%S}.trace.json"), self.log)
+    
     def perform_backup(self):
         """Realiza el backup de la base de datos"""
         connection_url = self.connection_var.get()
@@ -190,9 +317,15 @@ class PostgreSQLBackupApp(ctk.CTk):
         if not conn_info:
             return
         
-        # Crear nombre de archivo
-        backup_file = self.backup_manager.create_backup_filename(conn_info['database'])
-        final_backup = DEFAULT_BACKUP_FILENAME
+        # Formato, procesos paralelos y compresión
+        backup_format = self.backup_format_var.get()
+        compression = self.compression_var.get()
+        try:
+            jobs = self._parse_optional_int(self.backup_jobs_var.get())
+            compression_level = self._parse_optional_int(self.compression_level_var.get())
+        except ValueError as e:
+            self.log(f"✗ Error: Valor numérico inválido: {e}")
+            return
         
         # Mostrar cabecera
         self.log("="*50)
@@ -200,35 +333,83 @@ class PostgreSQLBackupApp(ctk.CTk):
         self.log(f"Sistema operativo: {sys.platform}")
         self.log("="*50)
         
-        # Verificar herramientas disponibles
-        tools = get_available_tools()
-        self.log(f"\nVerificación de herramientas:")
-        self.log(f"Docker: {'✓ disponible' if tools['has_docker'] else '✗ no disponible'}")
-        self.log(f"pg_dump: {'✓ disponible' if tools['has_pg_dump'] else '✗ no disponible'}")
-        
-        # Ejecutar backup según las herramientas disponibles
-        backup_successful = False
-        
-        if tools['has_pg_dump'] and not sys.platform.startswith('win'):
-            self.log(f"\n→ Usando pg_dump local...")
-            backup_successful = self.backup_manager.backup_with_local_pg_dump(
-                conn_info, backup_file, final_backup
-            )
-        elif tools['has_docker']:
-            self.log(f"\n→ Usando Docker...")
-            backup_successful = self.backup_manager.backup_with_docker(
-                conn_info, backup_file, final_backup
-            )
-        else:
-            self.log("\n✗ No hay herramientas disponibles para crear el backup.")
-            self.log("\n" + get_install_instructions())
+        tracer = self._start_trace("backup", self.backup_manager)
+        try:
+            # Verificar herramientas disponibles
+            with trace_span(tracer, "probe_tools"):
+                tools = get_available_tools()
+            self.log(f"\nVerificación de herramientas:")
+            self.log(f"Docker: {self._describe_tool(tools, 'docker')}")
+            self.log(f"pg_dump: {self._describe_tool(tools, 'pg_dump')}")
             
+            # Ejecutar backup según las herramientas disponibles
+            self.backup_manager.reuse_container = self.reuse_container_var.get()
+            with trace_span(tracer, "backup", database=conn_info['database'], format=backup_format) as span:
+                result = self.backup_manager.run_backup(
+                    conn_info, backup_format, jobs, compression, compression_level, tools=tools
+                )
+                span.set(success=result["success"], method=result["method"], bytes=result["size"])
+        finally:
+            self._finish_trace(tracer, "backup")
+        backup_successful = result["success"]
+        final_backup = os.path.basename(result["final_backup"])
+        
         # Mostrar instrucciones de restauración si el backup fue exitoso
         if backup_successful:
-            instructions = self.backup_manager.get_restore_instructions(conn_info, final_backup)
+            instructions = self.backup_manager.get_restore_instructions(
+                conn_info, final_backup, backup_format, compression
+            )
             for line in instructions:
                 self.log(line)
     
+    def perform_profile_backups(self, profiles_file):
+        """Realiza el backup de todos los perfiles de un archivo JSON"""
+        try:
+            profiles = load_profiles(profiles_file)
+        except (OSError, ValueError) as e:
+            self.log(f"✗ Error al cargar los perfiles: {e}")
+            return
+        
+        # Las opciones de la interfaz se usan para los perfiles que no las indican
+        try:
+            defaults = {
+                "format": self.backup_format_var.get(),
+                "jobs": self._parse_optional_int(self.backup_jobs_var.get()),
+                "compression": self.compression_var.get(),
+                "compression_level": self._parse_optional_int(self.compression_level_var.get())
+            }
+        except ValueError as e:
+            self.log(f"✗ Error: Valor numérico inválido: {e}")
+            return
+        
+        scheduler = JobScheduler(
+            reuse_container=self.reuse_container_var.get(),
+            logger_callback=self.log
+        )
+        for profile in profiles:
+            options = dict(defaults)
+            options.update(profile)
+            scheduler.add_job(options)
+        
+        self.scheduler = scheduler
+        try:
+            scheduler.run()
+        finally:
+            self.scheduler = None
+    
+    def _restore_selection(self):
+        """Esquemas y tablas a restaurar de los campos de la pestaña, o None para restaurar todo"""
+        return make_selection(
+            parse_patterns(self.restore_schemas_var.get()),
+            parse_patterns(self.restore_tables_var.get())
+        )
+    
+    def _apply_restore_profile(self):
+        """Aplica al gestor de restauración el perfil y el modo de transacción elegidos"""
+        self.restore_manager.set_profile(
+            self.restore_profile_var.get(), single_transaction=self.single_transaction_var.get()
+        )
+    
     def perform_restore(self):
         """Realiza la restauración de la base de datos"""
         # Obtener parámetros
@@ -236,9 +417,11 @@ class PostgreSQLBackupApp(ctk.CTk):
         container_name = self.container_name_var.get()
         database_name = self.database_name_var.get()
         username = self.username_var.get()
+        selection = self._restore_selection()
+        self._apply_restore_profile()
         
         # Verificar que el archivo existe
-        if not os.path.isfile(backup_file):
+        if not os.path.exists(backup_file):
             self.log(f"✗ Error: El archivo de backup {backup_file} no existe.")
             return
         
@@ -247,34 +430,41 @@ class PostgreSQLBackupApp(ctk.CTk):
         self.log(f"INICIANDO RESTAURACIÓN DE BASE DE DATOS (DOCKER LOCAL)")
         self.log(f"Sistema operativo: {sys.platform}")
         self.log(f"Archivo de backup: {backup_file}")
+        if selection:
+            self.log(f"Restaurar solo: {describe_selection(selection)}")
         self.log("="*50)
         
-        # Verificar herramientas disponibles
-        tools = get_available_tools()
-        self.log(f"\nVerificación de herramientas:")
-        self.log(f"Docker: {'✓ disponible' if tools['has_docker'] else '✗ no disponible'}")
-        self.log(f"psql: {'✓ disponible' if tools['has_pg_dump'] else '✗ no disponible'}")
-        
-        # Ejecutar restauración según el sistema operativo
-        if self.system_info["is_windows"]:
-            self.log("\n→ Usando script de PowerShell para Windows...")
-            self.restore_manager.restore_with_powershell(
-                backup_file, container_name, database_name, username
-            )
-        else:  # macOS o Linux
-            self.log("\n→ Usando script Bash para macOS/Linux...")
-            self.restore_manager.restore_with_bash(
-                backup_file, container_name, database_name, username
-            )
+        tracer = self._start_trace("restore", self.restore_manager)
+        try:
+            # Verificar herramientas disponibles
+            with trace_span(tracer, "probe_tools"):
+                tools = get_available_tools()
+            self.log(f"\nVerificación de herramientas:")
+            self.log(f"Docker: {self._describe_tool(tools, 'docker')}")
+            self.log(f"psql: {self._describe_tool(tools, 'psql')}")
+            
+            if not tools['has_docker']:
+                self.log("\n✗ Docker es necesario para restaurar en un contenedor local.")
+                self.log("\n" + get_install_instructions())
+                return
+            
+            with trace_span(tracer, "restore", backup=backup_file) as span:
+                span.set(success=self.restore_manager.restore_to_container(
+                    backup_file, container_name, database_name, username, selection=selection
+                ))
+        finally:
+            self._finish_trace(tracer, "restore")
     
     def perform_remote_restore(self):
         """Realiza la restauración de la base de datos a un servidor remoto"""
         # Obtener parámetros
         backup_file = self.backup_file_var.get()
         connection_url = self.restore_connection_var.get()
+        selection = self._restore_selection()
+        self._apply_restore_profile()
         
         # Verificar que el archivo existe
-        if not os.path.isfile(backup_file):
+        if not os.path.exists(backup_file):
             self.log(f"✗ Error: El archivo de backup {backup_file} no existe.")
             return
         
@@ -289,18 +479,33 @@ class PostgreSQLBackupApp(ctk.CTk):
         self.log(f"Sistema operativo: {sys.platform}")
         self.log(f"Archivo de backup: {backup_file}")
         self.log(f"URL de conexión: {connection_url}")
+        if selection:
+            self.log(f"Restaurar solo: {describe_selection(selection)}")
         self.log("="*50)
         
-        # Verificar herramientas disponibles
-        tools = get_available_tools()
-        self.log(f"\nVerificación de herramientas:")
-        self.log(f"psql: {'✓ disponible' if tools['has_pg_dump'] else '✗ no disponible'}")
-        
-        if not tools['has_pg_dump']:
-            self.log("\n✗ No hay herramientas disponibles para realizar la restauración remota.")
-            self.log("\n" + get_install_instructions())
-            return
-        
-        # Ejecutar restauración remota
-        self.log("\n→ Iniciando restauración remota...")
-        self.restore_manager.restore_with_connection_url(backup_file, connection_url)
\ No newline at end of file
+        tracer = self._start_trace("restore", self.restore_manager)
+        try:
+            # Verificar herramientas disponibles
+            with trace_span(tracer, "probe_tools"):
+                tools = get_available_tools()
+            self.log(f"\nVerificación de herramientas:")
+            self.log(f"psql: {self._describe_tool(tools, 'psql')}")
+            
+            # Los backups en formato custom o directorio, los comprimidos y las
+            # restauraciones selectivas también pueden hacerse con Docker
+            is_archive = self.restore_manager.detect_backup_format(backup_file) in ("custom", "directory")
+            is_compressed = self.restore_manager.detect_backup_compression(backup_file) != "none"
+            
+            if not tools['has_psql'] and not ((is_archive or is_compressed or selection) and tools['has_docker']):
+                self.log("\n✗ No hay herramientas disponibles para realizar la restauración remota.")
+                self.log("\n" + get_install_instructions())
+                return
+            
+            # Ejecutar restauración remota
+            self.log("\n→ Iniciando restauración remota...")
+            with trace_span(tracer, "restore", backup=backup_file) as span:
+                span.set(success=self.restore_manager.restore_with_connection_url(
+                    backup_file, connection_url, selection=selection
+                ))
+        finally:
+            self._finish_trace(tracer, "restore")
\ No newline at end of file